@@ -0,0 +1,215 @@
+# attacks/dedup.py
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+
+from runner.profiling import add_profile_argument, profiling
+
+_STRIP_RE = re.compile(r"[\s#@%]+")
+
+
+def normalize_prompt(text):
+    # lowercase and drop whitespace plus the characters char_inject adds
+    return _STRIP_RE.sub("", (text or "").lower())
+
+
+def _shingle_hashes(texts, k):
+    """
+    Hash the character k-shingles of many texts in one pass.
+
+    Returns:
+        Tuple of (hashes, owner) where owner[i] is the text index of hashes[i].
+        Texts shorter than k contribute a single zero-padded shingle.
+    """
+    padded = [t.ljust(k, "\0") for t in texts]
+    lengths = np.fromiter((len(t) for t in padded), dtype=np.int64, count=len(padded))
+    codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    windows = np.lib.stride_tricks.sliding_window_view(codes, k)
+    powers = np.uint64(1_000_003) ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+    # polynomial rolling hash, wrapping mod 2**64
+    hashes = (windows * powers).sum(axis=1, dtype=np.uint64)
+    counts = lengths - k + 1
+    owner = np.repeat(np.arange(len(padded)), counts)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return hashes[np.repeat(starts, counts) + offsets], owner
+
+
+def choose_bands(num_perm, threshold):
+    """Pick (bands, rows) whose LSH S-curve midpoint is closest to `threshold`."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if bands < 1:
+            break
+        midpoint = (1.0 / bands) ** (1.0 / rows)
+        err = abs(midpoint - threshold)
+        if best is None or err < best[0]:
+            best = (err, bands, rows)
+    return best[1], best[2]
+
+
+class MinHashDeduper:
+    """
+    Near-duplicate detection for attack prompts with MinHash signatures and LSH.
+
+    Prompts are normalized (lowercased, whitespace and injected `#@%` removed),
+    split into character shingles and reduced to `num_perm` MinHash values.
+    LSH banding only compares prompts that share a band, so the whole pass is
+    near-linear in the number of prompts.
+
+    Args:
+        threshold: Estimated Jaccard similarity at or above which prompts are duplicates
+        num_perm: Number of MinHash permutations
+        shingle_size: Character shingle length
+        seed: Seed for the permutation coefficients
+    """
+
+    def __init__(self, threshold=0.9, num_perm=128, shingle_size=5, seed=1):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # multiply-add hashing mod 2**64 with odd multipliers
+        self._a = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+    def signatures(self, prompts, chunk_size=256):
+        """Return an (n, num_perm) array of MinHash signatures for `prompts`."""
+        sigs = np.empty((len(prompts), self.num_perm), dtype=np.uint64)
+        # process prompts in chunks so the (shingles x perms) block stays small
+        for start in range(0, len(prompts), chunk_size):
+            texts = [normalize_prompt(p) for p in prompts[start:start + chunk_size]]
+            hashes, owner = _shingle_hashes(texts, self.shingle_size)
+            # every text owns at least one shingle and owners are contiguous
+            bounds = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+            block = self._a[:, None] * hashes + self._b[:, None]
+            sigs[start:start + len(texts)] = np.minimum.reduceat(block, bounds, axis=1).T
+        return sigs
+
+    def signature(self, text):
+        return self.signatures([text])[0]
+
+    def cluster(self, prompts):
+        """
+        Group prompts into near-duplicate clusters.
+
+        Returns:
+            List where entry i is the index of the cluster representative
+            (the first prompt of the cluster) for prompt i.
+        """
+        parent = list(range(len(prompts)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        sigs = self.signatures(prompts)
+        # fold each band's rows into one 64-bit key
+        width = self.bands * self.rows
+        mix = np.uint64(0x9E3779B97F4A7C15) ** np.arange(1, self.rows + 1, dtype=np.uint64)
+        band_keys = (sigs[:, :width].reshape(len(prompts), self.bands, self.rows) * mix).sum(
+            axis=2, dtype=np.uint64).tolist()
+        buckets = {}
+        for i, keys in enumerate(band_keys):
+            for band, key in enumerate(keys):
+                j = buckets.setdefault((band, key), i)
+                if j == i:
+                    continue
+                ri, rj = find(i), find(j)
+                if ri == rj:
+                    continue
+                if np.mean(sigs[i] == sigs[j]) >= self.threshold:
+                    # keep the earliest prompt as representative
+                    parent[max(ri, rj)] = min(ri, rj)
+        return [find(i) for i in range(len(prompts))]
+
+    def dedupe(self, items, mode="drop"):
+        """
+        Deduplicate attack cases by prompt.
+
+        Args:
+            items: Attack case dicts (see data/schema.md)
+            mode: "drop" keeps one case per cluster and lists the dropped ids in
+                  `metadata.near_duplicates`; "cluster" keeps every case and
+                  sets `metadata.dup_of` on non-representatives
+
+        Returns:
+            Tuple of (items, report)
+        """
+        if mode not in ("drop", "cluster"):
+            raise ValueError(f"Unknown dedupe mode: {mode}")
+        reps = self.cluster([it.get("prompt", "") for it in items])
+        dups = {}
+        for i, rep in enumerate(reps):
+            if rep != i:
+                dups.setdefault(rep, []).append(items[i].get("attack_id"))
+        out = []
+        for i, it in enumerate(items):
+            rep = reps[i]
+            if rep != i:
+                if mode == "cluster":
+                    dup_of = items[rep].get("attack_id")
+                    out.append({**it, "metadata": {**it.get("metadata", {}), "dup_of": dup_of}})
+            elif mode == "drop" and i in dups:
+                out.append({**it, "metadata": {**it.get("metadata", {}), "near_duplicates": dups[i]}})
+            else:
+                out.append(it)
+        duplicates = sum(len(v) for v in dups.values())
+        report = {
+            "input": len(items),
+            "output": len(out),
+            "clusters": len(items) - duplicates,
+            "duplicates": duplicates,
+            "api_calls_saved": duplicates,
+            "threshold": self.threshold,
+            "mode": mode,
+        }
+        return out, report
+
+
+def load_cases(path):
+    with open(path, "r", encoding="utf8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def save_cases(path, items):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf8") as f:
+        if path.endswith(".jsonl"):
+            for it in items:
+                f.write(json.dumps(it) + "\n")
+        else:
+            json.dump(items, f, indent=2)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Drop or cluster near-duplicate attack prompts")
+    p.add_argument("--in", dest="in_path", default="data/sample_attack_cases.json")
+    p.add_argument("--out", default=None, help="output path (defaults to overwriting --in)")
+    p.add_argument("--threshold", type=float, default=0.9)
+    p.add_argument("--num-perm", type=int, default=128)
+    p.add_argument("--mode", default="drop", choices=["drop", "cluster"])
+    add_profile_argument(p)
+    args = p.parse_args()
+
+    with profiling(args.profile):
+        items = load_cases(args.in_path)
+        deduper = MinHashDeduper(threshold=args.threshold, num_perm=args.num_perm)
+        out, report = deduper.dedupe(items, mode=args.mode)
+        save_cases(args.out or args.in_path, out)
+    print(f"Dedup: {report['input']} -> {report['output']} attack cases, "
+          f"{report['api_calls_saved']} API calls saved")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+# attacks/evolve.py
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from attacks.dedup import load_cases, save_cases
+from attacks.perturbations import PerturbationEngine
+from attacks.templates import TEMPLATES
+from runner.profiling import add_profile_argument, profiling
+
+MUTATIONS = ("paraphrase", "whitespace", "char_inject", "crossover")
+
+
+def seed_population(templates=TEMPLATES):
+    """Attack cases for the templates, as attacks.generator writes them."""
+    return [{
+        "attack_id": t["id"],
+        "prompt": t["prompt_template"],
+        "tags": list(t["tags"]),
+        "metadata": {"severity": t["severity"], "source": "template"},
+    } for t in templates]
+
+
+def crossover(a, b, rnd):
+    """First part of prompt `a` (cut at a word boundary) joined to the rest of `b`."""
+    wa, wb = a.split(), b.split()
+    if len(wa) < 2 or len(wb) < 2:
+        return a
+    return " ".join(wa[:rnd.randint(1, len(wa) - 1)] + wb[rnd.randint(1, len(wb) - 1):])
+
+
+class ResponseCache:
+    """
+    Responses and fitness by exact prompt text.
+
+    Mutations often reproduce a prompt seen before (paraphrase is a no-op on
+    prompts without synonym keys, crossover can rebuild a parent); those are
+    answered from here instead of re-querying the model.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, prompt):
+        with self._lock:
+            entry = self._entries.get(prompt)
+            if entry is not None:
+                self.hits += 1
+            return entry
+
+    def put(self, prompt, entry):
+        with self._lock:
+            self._entries.setdefault(prompt, entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class EvolutionarySearch:
+    """
+    Score-guided (mu + lambda) evolutionary search over attack prompts.
+
+    Each generation mutates survivors with the attacks.perturbations
+    operators (plus crossover between two survivors), queries all new prompts
+    concurrently, scores each response inline with eval.heuristics and keeps
+    the `population` fittest of survivors and children. Fitness is the
+    severity score, ties broken by the amount of evidence.
+
+    Children keep their lineage's root attack_id for the model call (so call
+    logs and the mock provider see the original attack), and get their own
+    `attack_id` in the output.
+
+    Args:
+        model_client: ModelClient (or anything with query(attack_id, prompt))
+        population: Survivors kept per generation
+        children: New prompts evaluated per generation
+        max_workers: Concurrent model calls
+        seed: Seed for selection and mutation
+        target_fitness: Stop once a survivor reaches this fitness
+        max_queries: Stop before exceeding this many model calls
+    """
+
+    def __init__(self, model_client, population=20, children=40, max_workers=8, seed=0,
+                 target_fitness=None, max_queries=None):
+        self.model_client = model_client
+        self.population = population
+        self.children = children
+        self.max_workers = max_workers
+        self.rnd = random.Random(seed)
+        self.engine = PerturbationEngine(seed=seed)
+        self.target_fitness = target_fitness
+        self.max_queries = max_queries
+        self.cache = ResponseCache()
+        self.queries = 0
+        self.generations = []
+
+    def _evaluate_one(self, case):
+        from eval.heuristics import calculate_severity_score, detect_instruction_leakage, detect_jailbreak
+        from runner.runner import safe_query
+
+        prompt = case["prompt"]
+        cached = self.cache.get(prompt)
+        if cached is not None:
+            return cached, True
+        root = case["metadata"].get("root", case["attack_id"])
+        try:
+            res = safe_query(self.model_client, root, prompt)
+        except Exception as e:
+            return {"response": "", "fitness": 0.0, "evidence_count": 0, "error": str(e)}, False
+        text = res.get("text") or ""
+        _, evidence = detect_jailbreak(text)
+        _, leakage = detect_instruction_leakage(text)
+        evidence = evidence + leakage
+        entry = {
+            "response": text,
+            "fitness": calculate_severity_score(evidence, text),
+            "evidence_count": len(evidence),
+            "error": None,
+        }
+        self.cache.put(prompt, entry)
+        return entry, False
+
+    def evaluate(self, cases):
+        """
+        Query and score cases concurrently; duplicate prompts are sent once.
+
+        Returns:
+            Dict with the generation's counters (cache hits, queries, errors)
+        """
+        start = time.perf_counter()
+        unique = {}
+        for case in cases:
+            unique.setdefault(case["prompt"], case)
+        hits_before = self.cache.hits
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            outcomes = dict(zip(unique, ex.map(self._evaluate_one, unique.values())))
+        queries = sum(1 for _, hit in outcomes.values() if not hit)
+        errors = sum(1 for entry, _ in outcomes.values() if entry["error"])
+        for case in cases:
+            entry, _ = outcomes[case["prompt"]]
+            case["metadata"]["fitness"] = entry["fitness"]
+            case["metadata"]["evidence_count"] = entry["evidence_count"]
+        self.queries += queries
+        wall = time.perf_counter() - start
+        return {
+            "evaluated": len(cases),
+            "unique_prompts": len(unique),
+            "queries": queries,
+            "cache_hits": (self.cache.hits - hits_before) + len(cases) - len(unique),
+            "errors": errors,
+            "wall_s": round(wall, 4),
+            "queries_per_s": round(queries / wall, 2) if wall > 0 else None,
+            "evaluations_per_s": round(len(cases) / wall, 2) if wall > 0 else None,
+        }
+
+    def _select(self, survivors):
+        # binary tournament on fitness
+        a, b = self.rnd.choice(survivors), self.rnd.choice(survivors)
+        return a if _rank(a) >= _rank(b) else b
+
+    def _mutate(self, survivors, generation, index):
+        parent = self._select(survivors)
+        op = self.rnd.choice(MUTATIONS)
+        child_id = f"{parent['metadata'].get('root', parent['attack_id'])}-g{generation}-{index}"
+        if op == "crossover":
+            other = self._select(survivors)
+            prompt = crossover(parent["prompt"], other["prompt"], self.rnd)
+        else:
+            prompt = self.engine.apply(op, parent["prompt"], case_id=child_id)
+        meta = parent["metadata"]
+        return {
+            "attack_id": child_id,
+            "prompt": prompt,
+            "tags": list(dict.fromkeys(list(parent.get("tags", [])) + ["evolved"])),
+            "metadata": {
+                "severity": meta.get("severity"),
+                "source": "evolved",
+                "root": meta.get("root", parent["attack_id"]),
+                "parent": parent["attack_id"],
+                "generation": generation,
+                "operators": list(meta.get("operators", [])) + [op],
+            },
+        }
+
+    def _keep(self, cases):
+        # stable sort: on ties older cases (listed first) win; one case per prompt
+        kept, seen = [], set()
+        for case in sorted(cases, key=_rank, reverse=True):
+            if case["prompt"] not in seen:
+                seen.add(case["prompt"])
+                kept.append(case)
+        return kept[:self.population]
+
+    def run(self, seeds, generations=5):
+        """
+        Evolve from seed attack cases.
+
+        Returns:
+            Final survivors, fittest first (attack cases with fitness in metadata)
+        """
+        survivors = [{**s, "metadata": {**(s.get("metadata") or {})}} for s in seeds]
+        if self.max_queries is not None:
+            # the seeds count against the query budget like any generation
+            survivors = survivors[:max(self.max_queries - self.queries, 0)]
+        stats = self.evaluate(survivors)
+        survivors = self._keep(survivors)
+        self._record(0, stats, survivors)
+        for generation in range(1, generations + 1):
+            if self._done(survivors):
+                break
+            n = self.children
+            if self.max_queries is not None:
+                n = min(n, self.max_queries - self.queries)
+            children = [self._mutate(survivors, generation, i) for i in range(n)]
+            stats = self.evaluate(children)
+            survivors = self._keep(survivors + children)
+            self._record(generation, stats, survivors)
+        return survivors
+
+    def _done(self, survivors):
+        if self.target_fitness is not None and survivors and _rank(survivors[0])[0] >= self.target_fitness:
+            return True
+        return self.max_queries is not None and self.queries >= self.max_queries
+
+    def _record(self, generation, stats, survivors):
+        fitness = [s["metadata"]["fitness"] for s in survivors]
+        self.generations.append({
+            "generation": generation,
+            **stats,
+            "survivors": len(survivors),
+            "best_fitness": max(fitness, default=0.0),
+            "mean_fitness": round(sum(fitness) / len(fitness), 4) if fitness else 0.0,
+            "new_survivors": sum(1 for s in survivors if s["metadata"].get("generation") == generation),
+        })
+
+    def report(self):
+        return {
+            "population": self.population,
+            "children": self.children,
+            "max_workers": self.max_workers,
+            "total_queries": self.queries,
+            "cache_entries": len(self.cache),
+            "cache_hits": self.cache.hits,
+            "generations": self.generations,
+        }
+
+
+def _rank(case):
+    meta = case["metadata"]
+    return meta.get("fitness", 0.0), meta.get("evidence_count", 0)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Score-guided evolutionary attack search")
+    p.add_argument("--model", default="mock", choices=["mock", "openai"])
+    p.add_argument("--api-key", default=None)
+    p.add_argument("--attacks-file", default=None,
+                   help="seed attack cases (JSON/JSONL); defaults to attacks.templates")
+    p.add_argument("--generations", type=int, default=5)
+    p.add_argument("--population", type=int, default=20)
+    p.add_argument("--children", type=int, default=40, help="new prompts evaluated per generation")
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--target-fitness", type=float, default=None)
+    p.add_argument("--max-queries", type=int, default=None)
+    p.add_argument("--out", default="data/evolved_attack_cases.json")
+    p.add_argument("--report", default="data/evolution_report.json")
+    add_profile_argument(p)
+    args = p.parse_args()
+
+    from models.client import ModelClient
+
+    seeds = load_cases(args.attacks_file) if args.attacks_file else seed_population()
+    client = ModelClient(provider=args.model, api_key=args.api_key)
+    search = EvolutionarySearch(client, population=args.population, children=args.children,
+                                max_workers=args.workers, seed=args.seed,
+                                target_fitness=args.target_fitness, max_queries=args.max_queries)
+    with profiling(args.profile):
+        survivors = search.run(seeds, generations=args.generations)
+    save_cases(args.out, survivors)
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w", encoding="utf8") as f:
+        json.dump(search.report(), f, indent=2)
+    for g in search.generations:
+        print(f"gen {g['generation']}: {g['evaluated']} evaluated, {g['queries']} queries, "
+              f"{g['cache_hits']} cache hits, {g['queries_per_s']} q/s, best {g['best_fitness']}, "
+              f"mean {g['mean_fitness']}")
+    print(f"Wrote {len(survivors)} evolved attack cases to {args.out} (report -> {args.report})")
+
+if __name__ == "__main__":
+    main()
@@ -2,39 +2,54 @@
 import json
 import os
 from attacks.templates import TEMPLATES
-from attacks.perturbations import paraphrase_simple, whitespace_obfuscate, char_inject
+from attacks.perturbations import PerturbationEngine
+from attacks.dedup import MinHashDeduper
 
 OUT = os.path.join("data", "sample_attack_cases.json")
 
-def generate_variants(base_templates, out_path=OUT):
+def _case(template, attack_id, prompt, tags, source):
+    case = {
+        "attack_id": attack_id,
+        "prompt": prompt,
+        "tags": tags,
+        "metadata": {"severity": template["severity"], "source": source}
+    }
+    if template.get("turns"):
+        turns = list(template["turns"])
+        if source != "template":
+            turns[-1] = prompt
+        # `prompt` holds the whole conversation for single-prompt tooling
+        case["prompt"] = " ".join(turns)
+        case["turns"] = turns
+    return case
+
+def generate_variants(base_templates, out_path=OUT, seed=0, dedupe_threshold=None):
+    engine = PerturbationEngine(seed=seed)
+    # conversation templates only vary their last turn, so all variants share
+    # the opening turns (and the runner sends them once)
+    prompts = [t["turns"][-1] if t.get("turns") else t["prompt_template"] for t in base_templates]
+    ids = [t["id"] for t in base_templates]
+    paraphrased = engine.apply_batch("paraphrase", prompts, case_ids=ids)
+    obfuscated = engine.apply_batch("whitespace", prompts, case_ids=ids)
     items = []
-    for t in base_templates:
-        items.append({
-            "attack_id": t["id"],
-            "prompt": t["prompt_template"],
-            "tags": t["tags"],
-            "metadata": {"severity": t["severity"], "source": "template"}
-        })
+    for t, para, obf in zip(base_templates, paraphrased, obfuscated):
+        items.append(_case(t, t["id"], t["prompt_template"], t["tags"], "template"))
         # add paraphrase variant
-        items.append({
-            "attack_id": t["id"] + "-paraphrase",
-            "prompt": paraphrase_simple(t["prompt_template"]),
-            "tags": t["tags"] + ["paraphrase"],
-            "metadata": {"severity": t["severity"], "source": "paraphrase"}
-        })
-        items.append({
-            "attack_id": t["id"] + "-obf",
-            "prompt": whitespace_obfuscate(t["prompt_template"]),
-            "tags": t["tags"] + ["obfuscation"],
-            "metadata": {"severity": t["severity"], "source": "obfuscation"}
-        })
+        items.append(_case(t, t["id"] + "-paraphrase", para, t["tags"] + ["paraphrase"], "paraphrase"))
+        items.append(_case(t, t["id"] + "-obf", obf, t["tags"] + ["obfuscation"], "obfuscation"))
     # dedupe by attack_id
     unique = {}
     for it in items:
         unique[it["attack_id"]] = it
+    cases = list(unique.values())
+    if dedupe_threshold is not None:
+        # drop near-duplicate prompts so they aren't sent to the API separately
+        cases, report = MinHashDeduper(threshold=dedupe_threshold).dedupe(cases)
+        print(f"Dropped {report['duplicates']} near-duplicate prompts "
+              f"({report['api_calls_saved']} API calls saved)")
     with open(out_path, "w", encoding="utf8") as f:
-        json.dump(list(unique.values()), f, indent=2)
-    print(f"Wrote {len(unique)} attack cases to {out_path}")
+        json.dump(cases, f, indent=2)
+    print(f"Wrote {len(cases)} attack cases to {out_path}")
 
 if __name__ == "__main__":
     os.makedirs("data", exist_ok=True)
@@ -1,5 +1,9 @@
 # attacks/perturbations.py
+import hashlib
 import random
+import re
+
+import numpy as np
 
 SYN_DICT = {
     "ignore": ["disregard", "omit", "skip"],
@@ -8,27 +12,162 @@ SYN_DICT = {
     "API_KEY": ["SECRET_KEY", "TOKEN"],
 }
 
+INJECT_CHARS = ["#", "@", "%"]
+_INJECT_CODES = np.array([ord(c) for c in INJECT_CHARS], dtype=np.uint32)
+
+
+def _compile_synonyms(syn_dict):
+    # longest keys first so overlapping keys prefer the longer match
+    keys = sorted(syn_dict, key=len, reverse=True)
+    return re.compile("|".join(re.escape(k) for k in keys))
+
+
+_SYN_RE = _compile_synonyms(SYN_DICT)
+
+
+def case_seed(case_id, base_seed=0):
+    """Stable 64-bit seed for a case id, independent of PYTHONHASHSEED."""
+    digest = hashlib.blake2b(f"{base_seed}:{case_id}".encode("utf8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _to_codes(text):
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+def _from_codes(codes):
+    return codes.astype(np.uint32, copy=False).tobytes().decode("utf-32-le")
+
+
+def _alpha_mask(text, codes):
+    # ASCII letters vectorised; only non-ASCII code points fall back to str.isalpha
+    mask = ((codes | 32) - 97) < 26
+    wide = np.flatnonzero(codes >= 128)
+    for i in wide:
+        mask[i] = text[i].isalpha()
+    return mask
+
+
+class PerturbationEngine:
+    """
+    Precompiled perturbation operators with reproducible, batched randomness.
+
+    The synonym dictionary is compiled into a single alternation regex, and
+    character-level perturbations draw all their random numbers in one NumPy
+    call per prompt (or per batch) instead of one `random.random()` per char.
+
+    Args:
+        syn_dict: Synonym dictionary (defaults to SYN_DICT)
+        seed: Base seed mixed into every per-case seed
+    """
+
+    def __init__(self, syn_dict=None, seed=0):
+        self.syn_dict = SYN_DICT if syn_dict is None else syn_dict
+        self.seed = seed
+        self._syn_re = _SYN_RE if syn_dict is None else _compile_synonyms(self.syn_dict)
+
+    def _rng(self, seed):
+        return np.random.default_rng(seed)
+
+    def paraphrase(self, text, rnd):
+        """Swap every occurrence of a SYN_DICT key for one synonym drawn from `rnd`."""
+        chosen = {}
+
+        def _sub(m):
+            k = m.group(0)
+            if k not in chosen:
+                chosen[k] = rnd.choice(self.syn_dict[k])
+            return chosen[k]
+
+        return self._syn_re.sub(_sub, text)
+
+    def whitespace_obfuscate(self, text, rng, rate=0.05):
+        if not text:
+            return text
+        codes = _to_codes(text)
+        hits = np.flatnonzero(_alpha_mask(text, codes) & (rng.random(len(codes)) < rate))
+        if not len(hits):
+            return text
+        return _from_codes(np.insert(codes, hits + 1, 32))
+
+    def char_inject(self, text, rng, n=3):
+        if not text:
+            return text
+        codes = _to_codes(text)
+        pos = rng.integers(0, len(codes), size=n)
+        syms = _INJECT_CODES[rng.integers(0, len(_INJECT_CODES), size=n)]
+        # np.insert sorts indices stably, so repeated positions keep draw order
+        return _from_codes(np.insert(codes, pos + 1, syms))
+
+    def apply(self, op, text, case_id=None, **kwargs):
+        """
+        Apply one operator to one prompt.
+
+        Args:
+            op: "paraphrase", "whitespace" or "char_inject"
+            text: Prompt text
+            case_id: Case identifier; the same id always yields the same output
+            **kwargs: Operator options (`rate` for whitespace, `n` for char_inject)
+        """
+        seed = case_seed(case_id if case_id is not None else text, self.seed)
+        if op == "paraphrase":
+            return self.paraphrase(text, random.Random(seed))
+        if op == "whitespace":
+            return self.whitespace_obfuscate(text, self._rng(seed), **kwargs)
+        if op == "char_inject":
+            return self.char_inject(text, self._rng(seed), **kwargs)
+        raise ValueError(f"Unknown perturbation: {op}")
+
+    def apply_batch(self, op, texts, case_ids=None, **kwargs):
+        """
+        Apply one operator to a list of prompts.
+
+        With `case_ids` each prompt gets its own seeded stream, so output for a
+        case does not depend on the rest of the batch. Without them the whole
+        batch shares one random draw over the concatenated text.
+        """
+        if case_ids is not None:
+            return [self.apply(op, t, cid, **kwargs) for t, cid in zip(texts, case_ids)]
+        if op == "paraphrase":
+            rnd = random.Random(self.seed)
+            return [self.paraphrase(t, rnd) for t in texts]
+        if op not in ("whitespace", "char_inject"):
+            raise ValueError(f"Unknown perturbation: {op}")
+        if not texts:
+            return []
+        rng = self._rng(self.seed)
+        joined = "".join(texts)
+        codes = _to_codes(joined)
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        starts = np.concatenate(([0], np.cumsum(lengths)))
+        if op == "whitespace":
+            rate = kwargs.get("rate", 0.05)
+            pos = np.flatnonzero(_alpha_mask(joined, codes) & (rng.random(len(codes)) < rate))
+            vals = np.full(len(pos), 32, dtype=np.uint32)
+        else:
+            n = kwargs.get("n", 3)
+            nonempty = np.flatnonzero(lengths)
+            case = np.repeat(nonempty, n)
+            pos = starts[case] + (rng.random(len(case)) * lengths[case]).astype(np.int64)
+            vals = _INJECT_CODES[rng.integers(0, len(_INJECT_CODES), size=len(case))]
+        # shift the split points by the number of insertions before each boundary
+        out = np.insert(codes, pos + 1, vals)
+        shifted = starts + np.searchsorted(np.sort(pos), starts, side="left")
+        text_out = _from_codes(out)
+        return [text_out[shifted[i]:shifted[i + 1]] for i in range(len(texts))]
+
+
+_DEFAULT_ENGINE = PerturbationEngine()
+
+
 def paraphrase_simple(text):
     # very small synonym swap heuristic
-    for k, vals in SYN_DICT.items():
-        if k in text:
-            text = text.replace(k, random.choice(vals))
-    return text
+    return _DEFAULT_ENGINE.paraphrase(text, random)
 
 def whitespace_obfuscate(text, rate=0.05):
     # insert occasional double spaces
-    out_chars = []
-    for ch in text:
-        out_chars.append(ch)
-        if ch.isalpha() and random.random() < rate:
-            out_chars.append(" ")
-    return "".join(out_chars)
+    return _DEFAULT_ENGINE.whitespace_obfuscate(text, np.random.default_rng(random.getrandbits(64)), rate)
 
 def char_inject(text, n=3):
     # inject random punctuation in n positions
-    import string
-    chars = list(text)
-    for _ in range(n):
-        i = random.randrange(len(chars))
-        chars[i] = chars[i] + random.choice(["#", "@", "%"])
-    return "".join(chars)
+    return _DEFAULT_ENGINE.char_inject(text, np.random.default_rng(random.getrandbits(64)), n)
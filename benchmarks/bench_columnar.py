@@ -0,0 +1,89 @@
+"""
+Load-time benchmark: score_report.json vs the columnar format.
+
+Generates a synthetic score report with --rows rows, writes it in both
+formats and times:
+  - json.load of the whole report
+  - opening the columnar file and reading the severity/vulnerable columns
+  - decoding every columnar row back to a dict
+
+Usage:
+    python -m benchmarks.bench_columnar --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from eval.columnar import ColumnarTable, write_columnar
+
+REASONS = ["secret_exposure", "instruction_leakage", "safety_bypass", "harmful_content", "pattern_detection"]
+TAGS = ["jailbreak", "exfiltration", "harmful_instructions", "roleplay", "chain", "injection", "control"]
+
+
+def make_scores(n, seed=0):
+    rnd = random.Random(seed)
+    ts = "2025-10-19T23:16:46.986697"
+    for i in range(n):
+        vulnerable = rnd.random() < 0.2
+        yield {
+            "attack_id": f"case-{i}",
+            "vulnerable": vulnerable,
+            "vulnerability_reasons": rnd.sample(REASONS, 2) if vulnerable else ["unknown"],
+            "severity_score": round(rnd.random(), 2) if vulnerable else 0.0,
+            "evidence_count": 2 if vulnerable else 0,
+            "evidence": ["Keyword match: 'api key:'"] if vulnerable else [],
+            "notes": "CRITICAL: High severity vulnerability detected." if vulnerable
+                     else "No vulnerabilities detected. Response appears safe.",
+            "tags": rnd.sample(TAGS, 2),
+            "response_length": rnd.randint(10, 2000),
+            "timestamp": ts,
+        }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark columnar vs JSON score report loading")
+    p.add_argument("--rows", type=int, default=200000)
+    args = p.parse_args()
+
+    scores = list(make_scores(args.rows))
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "score_report.json")
+        col_path = os.path.join(tmp, "score_report.rtcol")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"metadata": {"total_attacks": len(scores)}, "scores": scores}, f, indent=2)
+        write_columnar(col_path, scores, "scores", {"total_attacks": len(scores)})
+        del scores
+
+        start = time.perf_counter()
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        vulnerable = sum(1 for s in data["scores"] if s["vulnerable"])
+        t_json = time.perf_counter() - start
+        del data
+
+        start = time.perf_counter()
+        with ColumnarTable(col_path) as table:
+            sev = table.column("severity_score")
+            col_vulnerable = sum(table.column("vulnerable"))
+            avg = sum(sev) / len(sev)
+        t_cols = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ColumnarTable(col_path) as table:
+            rows = table.to_dicts()
+        t_rows = time.perf_counter() - start
+
+        print(f"rows:              {args.rows}")
+        print(f"json size:         {os.path.getsize(json_path) / 1e6:.1f} MB")
+        print(f"columnar size:     {os.path.getsize(col_path) / 1e6:.1f} MB")
+        print(f"json.load:         {t_json:.3f}s")
+        print(f"columnar columns:  {t_cols:.3f}s ({t_json / t_cols:.0f}x)")
+        print(f"columnar all rows: {t_rows:.3f}s")
+        assert vulnerable == col_vulnerable and len(rows) == args.rows and avg >= 0
+
+
+if __name__ == "__main__":
+    main()
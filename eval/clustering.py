@@ -0,0 +1,264 @@
+"""
+Incremental clustering of model responses for triage.
+
+Most responses of a large run are near-identical refusals. Grouping them lets
+a reviewer look at one exemplar per distinct behavior instead of every row.
+
+Responses are embedded as hashed TF-IDF vectors (word unigrams and bigrams,
+signed feature hashing, sublinear term frequency) in NumPy, so no vocabulary
+has to be built up front. Clustering is online k-means with a growing k:
+each response joins the most similar cluster centroid if the cosine
+similarity reaches `threshold`, moving that centroid towards it, and starts
+a new cluster otherwise. SimHash signatures of the centroids are banded into
+an LSH index, so a response is only compared with the few clusters that share
+a band, and exact repeats of a response skip the vector step entirely.
+"""
+import re
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_FEATURES = 2 ** 11
+DEFAULT_THRESHOLD = 0.6
+SIGNATURE_BITS = 128
+BAND_BITS = 8
+
+_TOKEN_RE = re.compile(r"\w+")
+_SPACE_RE = re.compile(r"\s+")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def normalize_response(text: str) -> str:
+    """
+    Lowercase, collapse whitespace and replace digit runs with 0.
+
+    Responses equal after this (e.g. the same leak with a different key or
+    count) share a cluster.
+    """
+    return _SPACE_RE.sub(" ", _DIGITS_RE.sub("0", (text or "").lower())).strip()
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature(token: str, n_features: int) -> Tuple[int, float]:
+    h = zlib.crc32(token.encode("utf8"))
+    # the top bit picks the sign, so colliding features tend to cancel out
+    return h % n_features, -1.0 if h & 0x80000000 else 1.0
+
+
+def _tokens(text: str) -> List[str]:
+    words = _TOKEN_RE.findall(text)
+    return words + [a + " " + b for a, b in zip(words, words[1:])]
+
+
+class HashedTfidf:
+    """
+    Hashed TF-IDF vectorizer with document frequencies updated as it goes.
+
+    Args:
+        n_features: Vector width (number of hash buckets)
+    """
+
+    def __init__(self, n_features: int = DEFAULT_FEATURES):
+        self.n_features = n_features
+        self.doc_freq = np.zeros(n_features, dtype=np.float64)
+        self.n_docs = 0
+
+    def transform(self, texts: Sequence[str], update: bool = True) -> np.ndarray:
+        """
+        Return L2-normalized TF-IDF rows for `texts` (already normalized).
+
+        Args:
+            texts: Response texts
+            update: Count the texts into the document frequencies first
+        """
+        rows, cols, vals = [], [], []
+        for i, text in enumerate(texts):
+            for token in _tokens(text):
+                col, sign = _feature(token, self.n_features)
+                rows.append(i)
+                cols.append(col)
+                vals.append(sign)
+        counts = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        np.add.at(counts, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)),
+                  np.asarray(vals, dtype=np.float32))
+        if update:
+            self.doc_freq += (counts != 0).sum(axis=0)
+            self.n_docs += len(texts)
+        idf = np.log((1.0 + self.n_docs) / (1.0 + self.doc_freq)) + 1.0
+        vectors = np.sign(counts) * np.log1p(np.abs(counts)) * idf.astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class ResponseClusterer:
+    """
+    Online clustering of responses into groups of near-identical behavior.
+
+    Feed responses with `add` as results arrive; `assignments`, `clusters`
+    and `annotate` read the current state at any point. Cluster ids are
+    stable: a response never moves once assigned.
+
+    Args:
+        threshold: Cosine similarity to a centroid needed to join its cluster
+        n_features: Hashed TF-IDF width
+        seed: Seed for the SimHash projections
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, n_features: int = DEFAULT_FEATURES, seed: int = 0):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.vectorizer = HashedTfidf(n_features)
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((n_features, SIGNATURE_BITS)).astype(np.float32)
+        self._band_weights = (1 << np.arange(BAND_BITS, dtype=np.int64))
+        self._centroids = np.zeros((16, n_features), dtype=np.float32)
+        self._norms = np.ones(16, dtype=np.float32)
+        self._sizes: List[int] = []
+        self._representatives: List[Tuple[str, str, float]] = []  # (item id, text, similarity)
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+        self._exact: Dict[str, int] = {}
+        self._assigned: Dict[str, int] = {}
+        self.exact_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def _band_keys(self, vectors: np.ndarray) -> np.ndarray:
+        bits = (vectors @ self._planes) > 0
+        bands = bits.reshape(len(vectors), -1, BAND_BITS)
+        return bands @ self._band_weights
+
+    def _index(self, cluster: int, keys: Iterable[int]):
+        for band, key in enumerate(keys):
+            members = self._buckets.setdefault((band, int(key)), [])
+            if not members or members[-1] != cluster:
+                members.append(cluster)
+
+    def _new_cluster(self, vector: np.ndarray, item_id: str, text: str, keys: np.ndarray) -> int:
+        cluster = len(self._sizes)
+        if cluster == len(self._centroids):
+            grown = np.zeros((2 * cluster, self._centroids.shape[1]), dtype=np.float32)
+            grown[:cluster] = self._centroids
+            self._centroids = grown
+            self._norms = np.concatenate([self._norms, np.ones(cluster, dtype=np.float32)])
+        self._centroids[cluster] = vector
+        self._norms[cluster] = float(np.linalg.norm(vector)) or 1.0
+        self._sizes.append(1)
+        self._representatives.append((item_id, text, 1.0))
+        self._index(cluster, keys)
+        return cluster
+
+    def add(self, items: Iterable[Tuple[str, str]]) -> List[int]:
+        """
+        Assign a batch of (item id, response text) pairs to clusters.
+
+        Returns:
+            Cluster id of each item
+        """
+        items = list(items)
+        out: List[Optional[int]] = [None] * len(items)
+        todo = []
+        for i, (item_id, text) in enumerate(items):
+            key = normalize_response(text)
+            cluster = self._exact.get(key)
+            if cluster is not None:
+                self.exact_hits += 1
+                self._sizes[cluster] += 1
+                self._assigned[item_id] = out[i] = cluster
+            else:
+                todo.append((i, item_id, text, key))
+        if not todo:
+            return out
+
+        vectors = self.vectorizer.transform([key for _, _, _, key in todo])
+        band_keys = self._band_keys(vectors)
+        for (i, item_id, text, key), vector, keys in zip(todo, vectors, band_keys):
+            cluster = self._exact.get(key)  # repeated within this batch
+            if cluster is None:
+                cluster = self._nearest(vector, keys)
+                if cluster is None:
+                    cluster = self._new_cluster(vector, item_id, text, keys)
+                else:
+                    self._join(cluster, vector, item_id, text)
+                self._exact[key] = cluster
+            else:
+                self.exact_hits += 1
+                self._sizes[cluster] += 1
+            self._assigned[item_id] = out[i] = cluster
+        return out
+
+    def _nearest(self, vector: np.ndarray, keys: np.ndarray) -> Optional[int]:
+        candidates = set()
+        for band, key in enumerate(keys.tolist()):
+            candidates.update(self._buckets.get((band, key), ()))
+        if not candidates:
+            return None
+        ids = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+        sims = (self._centroids[ids] @ vector) / self._norms[ids]
+        best = int(np.argmax(sims))
+        return int(ids[best]) if sims[best] >= self.threshold else None
+
+    def _join(self, cluster: int, vector: np.ndarray, item_id: str, text: str):
+        self._sizes[cluster] += 1
+        centroid = self._centroids[cluster]
+        # running mean, as in mini-batch k-means with a per-center learning rate
+        centroid += (vector - centroid) / self._sizes[cluster]
+        norm = self._norms[cluster] = float(np.linalg.norm(centroid)) or 1.0
+        sim = float(vector @ centroid) / norm
+        if sim > self._representatives[cluster][2]:
+            self._representatives[cluster] = (item_id, text, sim)
+        # the centroid drifted: make it findable under its new signature too
+        self._index(cluster, self._band_keys(centroid[None, :] / norm)[0])
+
+    def assignments(self) -> Dict[str, int]:
+        """Item id -> cluster id for everything added so far."""
+        return dict(self._assigned)
+
+    def clusters(self) -> List[Dict[str, Any]]:
+        """Clusters, largest first, each with its size and representative."""
+        out = [
+            {"cluster_id": c, "size": size, "representative": rep[0], "representative_text": rep[1]}
+            for c, (size, rep) in enumerate(zip(self._sizes, self._representatives))
+        ]
+        out.sort(key=lambda c: (-c["size"], c["cluster_id"]))
+        return out
+
+    def annotate(self, item_id: str) -> Dict[str, Any]:
+        """cluster_id / cluster_size / cluster_representative of an added item (empty if unknown)."""
+        cluster = self._assigned.get(item_id)
+        if cluster is None:
+            return {}
+        return {
+            "cluster_id": cluster,
+            "cluster_size": self._sizes[cluster],
+            "cluster_representative": self._representatives[cluster][0],
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "clusters": len(self._sizes),
+            "responses": sum(self._sizes),
+            "exact_repeats": self.exact_hits,
+            "threshold": self.threshold,
+        }
+
+
+def cluster_responses(
+    items: Iterable[Tuple[str, str]],
+    threshold: float = DEFAULT_THRESHOLD,
+    batch_size: int = 1024,
+) -> ResponseClusterer:
+    """Cluster (item id, response text) pairs in batches and return the clusterer."""
+    clusterer = ResponseClusterer(threshold=threshold)
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            clusterer.add(batch)
+            batch = []
+    if batch:
+        clusterer.add(batch)
+    return clusterer
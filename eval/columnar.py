@@ -0,0 +1,435 @@
+"""
+Compact columnar on-disk format for results and score reports.
+
+Layout of a `.rtcol` file:
+
+    MAGIC | u64 header length | JSON header | 8-byte aligned column sections
+
+Every column has a presence byte per row (so absent keys round-trip) and a
+type-specific payload:
+
+    f64       float64 per row
+    i64       int64 per row
+    bool      int8 per row
+    str/json  u64 offsets (rows + 1) into a UTF-8 blob; json values are encoded
+    dict      u32 code per row into a dictionary stored in the header
+    dictlist  u64 offsets (rows + 1) into a u32 code array, plus a dictionary
+
+Keys not covered by the schema are kept in a trailing json column. Files are
+read through `mmap`, and a column is decoded only when accessed.
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+MAGIC = b"RTCOL1\n\0"
+EXTENSION = ".rtcol"
+
+RESULT_COLUMNS = [
+    ("attack_id", "str"),
+    ("prompt", "str"),
+    ("response", "str"),
+    ("error", "str"),
+    ("model_meta", "json"),
+    ("timestamp", "str"),
+    ("latency_s", "f64"),
+    ("tags", "dictlist"),
+    ("turns", "json"),
+]
+
+SCORE_COLUMNS = [
+    ("attack_id", "str"),
+    ("vulnerable", "bool"),
+    ("vulnerability_reasons", "dictlist"),
+    ("severity_score", "f64"),
+    ("evidence_count", "i64"),
+    ("evidence", "json"),
+    ("notes", "dict"),
+    ("tags", "dictlist"),
+    ("response_length", "i64"),
+    ("timestamp", "dict"),
+    ("scan_truncated", "bool"),
+    ("rule_pack_version", "dict"),
+    ("turn_scores", "json"),
+    ("cluster_id", "i64"),
+    ("cluster_size", "i64"),
+    ("cluster_representative", "str"),
+]
+
+SCHEMAS = {"results": RESULT_COLUMNS, "scores": SCORE_COLUMNS}
+_EXTRA = "_extra"
+_FIXED = {"f64": "d", "i64": "q", "bool": "b"}
+
+
+def is_columnar(path) -> bool:
+    """Return True if `path` is a columnar file (checked by magic bytes)."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _fits(ctype: str, value: Any) -> bool:
+    if ctype == "json":
+        return True
+    if ctype == "f64":
+        # ints would come back as floats; they round-trip via the extra column
+        return isinstance(value, float)
+    if ctype == "i64":
+        return isinstance(value, int) and not isinstance(value, bool) and -2**63 <= value < 2**63
+    if ctype == "bool":
+        return isinstance(value, bool)
+    if ctype in ("str", "dict"):
+        return isinstance(value, str)
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def _pad(buf: bytearray):
+    buf.extend(b"\0" * (-len(buf) % 8))
+
+
+def _encode_column(ctype: str, values: List[Any], present: bytearray):
+    """Return (payload sections, header extras) for one column."""
+    if ctype in _FIXED:
+        fill = float("nan") if ctype == "f64" else 0
+        data = array(_FIXED[ctype], (fill if v is None else v for v in values))
+        return [data.tobytes()], {}
+    if ctype in ("str", "json"):
+        offsets = array("Q", [0])
+        blob = bytearray()
+        for v, p in zip(values, present):
+            if p:
+                s = json.dumps(v, ensure_ascii=False) if ctype == "json" else v
+                blob.extend(s.encode("utf8"))
+            offsets.append(len(blob))
+        return [offsets.tobytes(), bytes(blob)], {}
+    if ctype == "dict":
+        lookup: Dict[str, int] = {}
+        codes = array("I", (lookup.setdefault(v, len(lookup)) if v is not None else 0 for v in values))
+        return [codes.tobytes()], {"dictionary": list(lookup)}
+    if ctype == "dictlist":
+        lookup = {}
+        offsets = array("Q", [0])
+        codes = array("I")
+        for v in values:
+            for s in v or ():
+                codes.append(lookup.setdefault(s, len(lookup)))
+            offsets.append(len(codes))
+        return [offsets.tobytes(), codes.tobytes()], {"dictionary": list(lookup)}
+    raise ValueError(f"Unknown column type: {ctype}")
+
+
+def write_columnar(path, rows: Iterable[Dict[str, Any]], kind: str,
+                   metadata: Optional[Dict[str, Any]] = None) -> Path:
+    """
+    Write result or score rows to a columnar file.
+
+    Args:
+        path: Output path (conventionally ending in .rtcol)
+        rows: Result items or score items (see data/schema.md)
+        kind: "results" or "scores"
+        metadata: Report-level metadata (e.g. score_report.json "metadata")
+    """
+    schema = SCHEMAS[kind] + [(_EXTRA, "json")]
+    typed = SCHEMAS[kind]
+    known = set(name for name, _ in typed)
+    columns: Dict[str, List[Any]] = {name: [] for name, _ in schema}
+    presence = {name: bytearray() for name, _ in schema}
+    n = 0
+    for row in rows:
+        n += 1
+        extra = {k: v for k, v in row.items() if k not in known}
+        for name, ctype in typed:
+            has = name in row
+            value = row[name] if has else None
+            if has and not _fits(ctype, value):
+                # values of an unexpected type (e.g. null) round-trip via the extra column
+                extra[name] = value
+                has, value = False, None
+            presence[name].append(1 if has else 0)
+            columns[name].append(value)
+        presence[_EXTRA].append(1 if extra else 0)
+        columns[_EXTRA].append(extra or None)
+
+    body = bytearray()
+    col_headers = []
+    for name, ctype in schema:
+        sections, extras = _encode_column(ctype, columns[name], presence[name])
+        spans = []
+        for section in [bytes(presence[name])] + sections:
+            spans.append([len(body), len(section)])
+            body.extend(section)
+            _pad(body)
+        col_headers.append({"name": name, "type": ctype, "sections": spans, **extras})
+
+    header = json.dumps({
+        "kind": kind,
+        "rows": n,
+        "metadata": metadata or {},
+        "columns": col_headers,
+    }, ensure_ascii=False).encode("utf8")
+    prefix = bytearray(MAGIC + struct.pack("<Q", len(header)) + header)
+    _pad(prefix)
+
+    out = Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        f.write(body)
+    os.replace(tmp, out)
+    return out
+
+
+class Row(Mapping):
+    """Read-only dict view of one row; fields are decoded on access."""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "ColumnarTable", index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._table._get(key, self._index)
+
+    def __iter__(self):
+        return iter(self._table._keys(self._index))
+
+    def __len__(self):
+        return len(self._table._keys(self._index))
+
+    def __repr__(self):
+        return f"Row({dict(self)!r})"
+
+
+class ColumnarTable:
+    """
+    Memory-mapped reader for columnar result/score files.
+
+    Args:
+        path: Path to a .rtcol file
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a columnar file: {self.path}")
+        (hlen,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self._mm[start:start + hlen].decode("utf8"))
+        data_start = start + hlen + (-(start + hlen) % 8)
+        self.kind = header["kind"]
+        self.metadata = header["metadata"]
+        self._rows = header["rows"]
+        self._columns = {}
+        for col in header["columns"]:
+            col["sections"] = [(data_start + off, length) for off, length in col["sections"]]
+            self._columns[col["name"]] = col
+        self._decoded: Dict[str, Any] = {}
+        self._names = [c["name"] for c in header["columns"] if c["name"] != _EXTRA]
+
+    def close(self):
+        self._decoded.clear()
+        if getattr(self, "_mm", None) is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                # a caller still holds a column view; the map closes with it
+                pass
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Row(self, i) for i in range(*index.indices(self._rows))]
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError(index)
+        return Row(self, index)
+
+    def __iter__(self):
+        return (Row(self, i) for i in range(self._rows))
+
+    def _view(self, section, fmt):
+        off, length = section
+        return memoryview(self._mm)[off:off + length].cast(fmt)
+
+    def _load(self, name):
+        if name in self._decoded:
+            return self._decoded[name]
+        col = self._columns[name]
+        ctype = col["type"]
+        sections = col["sections"]
+        present = self._view(sections[0], "B")
+        if ctype in _FIXED:
+            payload = self._view(sections[1], _FIXED[ctype])
+        elif ctype in ("str", "json"):
+            payload = (self._view(sections[1], "Q"), sections[2][0])
+        elif ctype == "dict":
+            payload = (self._view(sections[1], "I"), col["dictionary"])
+        else:
+            payload = (self._view(sections[1], "Q"), self._view(sections[2], "I"), col["dictionary"])
+        self._decoded[name] = (ctype, present, payload)
+        return self._decoded[name]
+
+    def _get(self, name, i):
+        if name not in self._columns or name == _EXTRA:
+            extra = self._extra(i)
+            if name in extra:
+                return extra[name]
+            raise KeyError(name)
+        ctype, present, payload = self._load(name)
+        if not present[i]:
+            extra = self._extra(i)
+            if name in extra:
+                return extra[name]
+            raise KeyError(name)
+        if ctype in _FIXED:
+            value = payload[i]
+            return bool(value) if ctype == "bool" else value
+        if ctype in ("str", "json"):
+            offsets, base = payload
+            raw = self._mm[base + offsets[i]:base + offsets[i + 1]].decode("utf8")
+            return json.loads(raw) if ctype == "json" else raw
+        if ctype == "dict":
+            codes, dictionary = payload
+            return dictionary[codes[i]]
+        offsets, codes, dictionary = payload
+        return [dictionary[c] for c in codes[offsets[i]:offsets[i + 1]]]
+
+    def _extra(self, i):
+        ctype, present, payload = self._load(_EXTRA)
+        if not present[i]:
+            return {}
+        offsets, base = payload
+        return json.loads(self._mm[base + offsets[i]:base + offsets[i + 1]].decode("utf8"))
+
+    def _keys(self, i):
+        keys = [n for n in self._names if self._load(n)[1][i]]
+        keys.extend(k for k in self._extra(i) if k not in keys)
+        return keys
+
+    def _decode_column(self, name):
+        """Return (present, values) for a whole column, decoded in bulk."""
+        ctype, present, payload = self._load(name)
+        present = present.tolist()
+        if ctype in _FIXED:
+            values = payload.tolist()
+            if ctype == "bool":
+                values = [bool(v) for v in values]
+        elif ctype in ("str", "json"):
+            offsets, base = payload
+            offsets = offsets.tolist()
+            blob = self._mm[base:base + offsets[-1]]
+            values = [blob[a:b].decode("utf8") for a, b in zip(offsets, offsets[1:])]
+            if ctype == "json":
+                values = [json.loads(v) if p else None for v, p in zip(values, present)]
+        elif ctype == "dict":
+            codes, dictionary = payload
+            values = [dictionary[c] for c in codes.tolist()]
+        else:
+            offsets, codes, dictionary = payload
+            offsets = offsets.tolist()
+            words = [dictionary[c] for c in codes.tolist()]
+            values = [words[a:b] for a, b in zip(offsets, offsets[1:])]
+        return present, values
+
+    def column(self, name) -> List[Any]:
+        """Decode a whole column; rows missing the key give None."""
+        present, values = self._decode_column(name)
+        # values that did not fit the column type (ints in f64) sit in the extra column
+        return [v if p else self._extra(i).get(name) for i, (v, p) in enumerate(zip(values, present))]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Decode every row to a plain dict (column by column)."""
+        cols = [(name, *self._decode_column(name)) for name in self._names]
+        extra_present, extras = self._decode_column(_EXTRA)
+        out = []
+        for i in range(self._rows):
+            row = {name: values[i] for name, present, values in cols if present[i]}
+            if extra_present[i]:
+                row.update(extras[i])
+            out.append(row)
+        return out
+
+
+def load_json_rows(path):
+    """
+    Load a results JSONL file or a score report JSON file.
+
+    Returns:
+        Tuple of (kind, rows, metadata)
+    """
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            return "results", [json.loads(line) for line in f if line.strip()], {}
+        data = json.load(f)
+    if isinstance(data, dict) and "scores" in data:
+        return "scores", data["scores"], data.get("metadata", {})
+    return "scores", data, {}
+
+
+def json_to_columnar(src, dst) -> Path:
+    """Convert results.jsonl or score_report.json to the columnar format."""
+    kind, rows, metadata = load_json_rows(src)
+    return write_columnar(dst, rows, kind, metadata)
+
+
+def columnar_to_json(src, dst) -> Path:
+    """Convert a columnar file back to results JSONL or score report JSON."""
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with ColumnarTable(src) as table, open(dst, "w", encoding="utf-8") as f:
+        if table.kind == "results":
+            for row in table:
+                f.write(json.dumps(dict(row)) + "\n")
+        else:
+            json.dump({"metadata": table.metadata, "scores": table.to_dicts()},
+                      f, indent=2, ensure_ascii=False)
+    return dst
+
+
+def main():
+    """Convert between the JSON formats and the columnar format."""
+    import argparse
+    from runner.profiling import add_profile_argument, profiling
+
+    parser = argparse.ArgumentParser(description="Convert results/score reports to and from columnar format")
+    parser.add_argument("command", choices=["to-columnar", "to-json"])
+    parser.add_argument("src", help="Input file")
+    parser.add_argument("dst", help="Output file")
+
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    with profiling(args.profile):
+        if args.command == "to-columnar":
+            out = json_to_columnar(args.src, args.dst)
+        else:
+            out = columnar_to_json(args.src, args.dst)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Run-over-run diffing of score reports for regression tracking.
+"""
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+from eval.columnar import ColumnarTable, is_columnar
+
+
+def _iter_json_array(f, buf: str = "", chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Yield the elements of a JSON array one at a time.
+
+    The array starts at the first non-whitespace character of `buf` followed
+    by the rest of file `f`; only one element is held in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            more = f.read(chunk_size)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # element spans the chunk boundary
+            if eof:
+                raise
+            more = f.read(chunk_size)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield value
+        pos = end
+
+
+def _iter_report_scores(f, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Yield score items from a score_report.json without loading it whole."""
+    # metadata is small and written first, so scan forward to the "scores" key
+    buf = ""
+    while True:
+        idx = buf.find('"scores"')
+        colon = buf.find(":", idx) if idx >= 0 else -1
+        if colon >= 0:
+            break
+        more = f.read(chunk_size)
+        if not more:
+            return
+        buf += more
+    yield from _iter_json_array(f, buf[colon + 1:], chunk_size)
+
+
+def iter_scores(path) -> Iterator[Dict[str, Any]]:
+    """
+    Stream score items from a score report or result store.
+
+    Supports score_report.json (streamed without loading it whole), a bare
+    JSON array, JSONL files with one score item per line, and columnar .rtcol
+    files.
+    """
+    path = Path(path)
+    if is_columnar(path):
+        with ColumnarTable(path) as table:
+            yield from table
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            return
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == "[":
+            yield from _iter_json_array(f, head)
+        else:
+            yield from _iter_report_scores(f)
+
+
+def _iter_scored(path) -> Iterator[Dict[str, Any]]:
+    """Like iter_scores, but scores raw result items (no `vulnerable` field) on the fly."""
+    scorer = None
+    for item in iter_scores(path):
+        if "vulnerable" not in item and "response" in item:
+            if scorer is None:
+                from eval.scorer import AttackScorer
+                scorer = AttackScorer(str(path))
+            item = scorer.score_single_result(item)
+        yield item
+
+
+def _compact(score) -> Tuple[bool, float, Tuple[str, ...]]:
+    return (
+        bool(score.get("vulnerable", False)),
+        float(score.get("severity_score", 0.0) or 0.0),
+        tuple(score.get("tags") or ("untagged",)),
+    )
+
+
+class RunDiff:
+    """
+    Compare two runs of the same attack suite by attack_id.
+
+    Hash join: the smaller report (by file size) is the build side and is
+    held as compact (vulnerable, severity, tags) tuples; the larger report
+    is streamed as the probe side, so it is never fully loaded.
+
+    Args:
+        base_report: Score report (or result store) of the earlier run
+        new_report: Score report (or result store) of the later run
+        severity_threshold: Minimum absolute change reported as a severity shift
+    """
+
+    def __init__(self, base_report: str, new_report: str, severity_threshold: float = 0.1):
+        self.base_report = Path(base_report)
+        self.new_report = Path(new_report)
+        self.severity_threshold = severity_threshold
+
+    def compute(self) -> Dict[str, Any]:
+        """
+        Compute the diff.
+
+        Returns:
+            Dictionary with newly_vulnerable, newly_fixed, severity_shifts,
+            added/removed attack ids, per-tag rate deltas and a summary
+        """
+        base_is_build = os.path.getsize(self.base_report) <= os.path.getsize(self.new_report)
+        build_path, probe_path = (
+            (self.base_report, self.new_report) if base_is_build else (self.new_report, self.base_report)
+        )
+
+        # an attack_id repeated within one report counts once: its first row is kept on both sides
+        build = {}
+        for score in _iter_scored(build_path):
+            build.setdefault(score.get("attack_id"), _compact(score))
+
+        # per-tag [total, vulnerable] for each side
+        tag_counts = {"base": defaultdict(lambda: [0, 0]), "new": defaultdict(lambda: [0, 0])}
+        build_side, probe_side = ("base", "new") if base_is_build else ("new", "base")
+
+        def count(side, tags, vulnerable):
+            for tag in tags:
+                tag_counts[side][tag][0] += 1
+                tag_counts[side][tag][1] += int(vulnerable)
+
+        for vulnerable, _, tags in build.values():
+            count(build_side, tags, vulnerable)
+
+        newly_vulnerable, newly_fixed, shifts, only_probe = [], [], [], []
+        unchanged = 0
+        seen = set()
+        for score in _iter_scored(probe_path):
+            attack_id = score.get("attack_id")
+            if attack_id in seen:
+                continue
+            seen.add(attack_id)
+            probe = _compact(score)
+            count(probe_side, probe[2], probe[0])
+            other = build.pop(attack_id, None)
+            if other is None:
+                only_probe.append(attack_id)
+                continue
+            base, new = (other, probe) if base_is_build else (probe, other)
+            if new[0] and not base[0]:
+                newly_vulnerable.append({"attack_id": attack_id, "severity_score": new[1]})
+            elif base[0] and not new[0]:
+                newly_fixed.append({"attack_id": attack_id, "severity_score": base[1]})
+            else:
+                unchanged += 1
+            delta = round(new[1] - base[1], 3)
+            if abs(delta) >= self.severity_threshold:
+                shifts.append({"attack_id": attack_id, "base": base[1], "new": new[1], "delta": delta})
+        only_build = list(build)
+
+        added, removed = (only_probe, only_build) if base_is_build else (only_build, only_probe)
+        tag_deltas = {}
+        for tag in set(tag_counts["base"]) | set(tag_counts["new"]):
+            b_total, b_vuln = tag_counts["base"].get(tag, (0, 0))
+            n_total, n_vuln = tag_counts["new"].get(tag, (0, 0))
+            b_rate = b_vuln / b_total if b_total else 0.0
+            n_rate = n_vuln / n_total if n_total else 0.0
+            tag_deltas[tag] = {
+                "base_rate": round(b_rate, 3),
+                "new_rate": round(n_rate, 3),
+                "delta": round(n_rate - b_rate, 3),
+                "base_total": b_total,
+                "new_total": n_total,
+            }
+
+        shifts.sort(key=lambda s: abs(s["delta"]), reverse=True)
+        return {
+            "summary": {
+                "newly_vulnerable": len(newly_vulnerable),
+                "newly_fixed": len(newly_fixed),
+                "severity_shifts": len(shifts),
+                "unchanged": unchanged,
+                "added": len(added),
+                "removed": len(removed),
+            },
+            "newly_vulnerable": newly_vulnerable,
+            "newly_fixed": newly_fixed,
+            "severity_shifts": shifts,
+            "added": added,
+            "removed": removed,
+            "tag_rate_deltas": tag_deltas,
+            "metadata": {
+                "base_report": str(self.base_report),
+                "new_report": str(self.new_report),
+                "severity_threshold": self.severity_threshold,
+            },
+        }
+
+    def save(self, output_file: str = "data/run_diff.json") -> Path:
+        """Compute the diff and save it to a JSON file."""
+        output_path = Path(output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        diff = self.compute()
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(diff, f, indent=2, ensure_ascii=False)
+        s = diff["summary"]
+        print(f"Run diff saved to: {output_path}")
+        print(f"Newly vulnerable: {s['newly_vulnerable']}  Newly fixed: {s['newly_fixed']}  "
+              f"Severity shifts: {s['severity_shifts']}  Added: {s['added']}  Removed: {s['removed']}")
+        return output_path
+
+
+def main():
+    """Main entry point for run diffing."""
+    import argparse
+    from runner.profiling import add_profile_argument, profiling
+
+    parser = argparse.ArgumentParser(description="Diff two score reports")
+    parser.add_argument("--base", required=True, help="Score report of the earlier run")
+    parser.add_argument("--new", required=True, help="Score report of the later run")
+    parser.add_argument(
+        "--output",
+        default="data/run_diff.json",
+        help="Path to output diff file"
+    )
+    parser.add_argument(
+        "--severity-threshold",
+        type=float,
+        default=0.1,
+        help="Minimum severity change reported as a shift"
+    )
+
+    add_profile_argument(parser)
+
+    args = parser.parse_args()
+
+    with profiling(args.profile):
+        RunDiff(args.base, args.new, severity_threshold=args.severity_threshold).save(args.output)
+
+
+if __name__ == "__main__":
+    main()
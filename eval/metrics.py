@@ -2,35 +2,97 @@
 Metrics computation and aggregation for red-teaming evaluation.
 """
 import json
+import math
 from pathlib import Path
-from typing import Dict, List, Any
+from statistics import NormalDist
+from typing import Dict, List, Any, Optional, Tuple
 from collections import defaultdict, Counter
 from datetime import datetime
 
+from eval.columnar import ColumnarTable, is_columnar
+from eval.records import ScoreItem
+from eval.shards import is_sharded, iter_scores, read_manifest
+
+
+def wilson_interval(successes: int, total: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """
+    Wilson score interval for a binomial proportion.
+
+    Unlike the normal approximation it stays inside [0, 1] and behaves at
+    rates near 0 or 1, which is where most per-tag vulnerability rates sit.
+
+    Args:
+        successes: Number of vulnerable attacks
+        total: Number of attacks
+        confidence: Two-sided confidence level
+
+    Returns:
+        Tuple of (low, high); (0.0, 1.0) when total is 0
+    """
+    if total <= 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / total
+    denom = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denom
+    half = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
 
 class MetricsComputer:
     """Computes aggregate metrics from scored results."""
     
-    def __init__(self, score_report_file: str = "data/score_report.json"):
+    def __init__(
+        self,
+        score_report_file: str = "data/score_report.json",
+        adaptive_report_file: Optional[str] = None,
+        confidence: float = 0.95,
+        scores: Optional[List[Any]] = None,
+        budget_report_file: Optional[str] = None
+    ):
         """
         Initialize metrics computer.
         
         Args:
             score_report_file: Path to score report JSON
+            adaptive_report_file: Optional adaptive sampling report written by
+                                  `runner.cli --adaptive`, included in the metrics
+            confidence: Confidence level of the per-tag success rate intervals
+            scores: Score items already in memory; the report file is then not read
+            budget_report_file: Optional token/cost report written by
+                                `runner.cli --budget-report`; adds cost metrics
         """
         self.score_report_file = Path(score_report_file)
-        self.scores = []
+        self.adaptive_report_file = Path(adaptive_report_file) if adaptive_report_file else None
+        self.budget_report_file = Path(budget_report_file) if budget_report_file else None
+        self.confidence = confidence
+        self._preloaded = scores is not None
+        self.scores = list(scores) if scores is not None else []
         self.metadata = {}
     
     def load_scores(self):
-        """Load scores from report file."""
+        """Load scores from report file (JSON, memory-mapped columnar or a shard directory)."""
         if not self.score_report_file.exists():
             raise FileNotFoundError(f"Score report not found: {self.score_report_file}")
         
+        if is_sharded(self.score_report_file):
+            self.metadata = read_manifest(self.score_report_file)["metadata"]
+            self.scores = [ScoreItem.from_dict(s) for s in iter_scores(self.score_report_file)]
+            print(f"Loaded {len(self.scores)} scored results.")
+            return
+        
+        if is_columnar(self.score_report_file):
+            # decoded column by column; the map is closed before returning
+            with ColumnarTable(self.score_report_file) as table:
+                self.metadata = table.metadata
+                self.scores = [ScoreItem.from_dict(s) for s in table.to_dicts()]
+            print(f"Loaded {len(self.scores)} scored results.")
+            return
+        
         with open(self.score_report_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
             self.metadata = data.get("metadata", {})
-            self.scores = data.get("scores", [])
+            self.scores = [ScoreItem.from_dict(s) for s in data.get("scores", [])]
         
         print(f"Loaded {len(self.scores)} scored results.")
     
@@ -62,10 +124,13 @@ class MetricsComputer:
                 if stats["severities"] else 0.0
             )
             
+            ci_low, ci_high = wilson_interval(stats["vulnerable"], stats["total"], self.confidence)
+            
             result[tag] = {
                 "total_attacks": stats["total"],
                 "successful_attacks": stats["vulnerable"],
                 "success_rate": round(success_rate, 3),
+                "confidence_interval": [round(ci_low, 3), round(ci_high, 3)],
                 "average_severity": round(avg_severity, 3),
                 "max_severity": round(max(stats["severities"], default=0.0), 3)
             }
@@ -95,9 +160,9 @@ class MetricsComputer:
             top_attacks.append({
                 "attack_id": score.get("attack_id"),
                 "severity_score": score.get("severity_score"),
-                "vulnerability_reasons": score.get("vulnerability_reasons", []),
+                "vulnerability_reasons": list(score.get("vulnerability_reasons", [])),
                 "evidence_count": score.get("evidence_count", 0),
-                "tags": score.get("tags", []),
+                "tags": list(score.get("tags", [])),
                 "notes": score.get("notes", "")
             })
         
@@ -151,6 +216,58 @@ class MetricsComputer:
         
         return severity_buckets
     
+    def compute_cost_metrics(self, budget: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cost per tag and per vulnerable finding from a budget report.
+
+        An attack's cost (all of its calls) is counted once for each of its
+        tags, as in compute_success_rate_per_tag, and an attack scored
+        several times counts as one finding if any of its scores is vulnerable.
+
+        Args:
+            budget: Report of a models.budget.BudgetLedger
+
+        Returns:
+            Dictionary with run totals, cost per finding and per-tag costs
+        """
+        attack_costs = budget.get("attacks", {})
+        attacks = {}
+        for score in self.scores:
+            entry = attacks.setdefault(score.get("attack_id"), {"tags": set(), "vulnerable": False})
+            entry["tags"].update(score.get("tags") or ["untagged"])
+            entry["vulnerable"] = entry["vulnerable"] or bool(score.get("vulnerable"))
+
+        tag_stats = defaultdict(lambda: {"attacks": 0, "vulnerable": 0, "cost": 0.0, "tokens": 0})
+        for attack_id, entry in attacks.items():
+            usage = attack_costs.get(attack_id, {})
+            for tag in entry["tags"]:
+                stats = tag_stats[tag]
+                stats["attacks"] += 1
+                stats["vulnerable"] += entry["vulnerable"]
+                stats["cost"] += usage.get("cost", 0.0)
+                stats["tokens"] += usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+
+        findings = sum(1 for entry in attacks.values() if entry["vulnerable"])
+        total = budget.get("cost", 0.0)
+        return {
+            "total_cost": round(total, 6),
+            "total_tokens": budget.get("tokens", 0),
+            "calls": budget.get("calls", 0),
+            "rejected_calls": budget.get("rejected_calls", 0),
+            "skipped_attacks": budget.get("skipped_attacks", 0),
+            "vulnerable_findings": findings,
+            "cost_per_finding": round(total / findings, 6) if findings else None,
+            "per_tag": {
+                tag: {
+                    **stats,
+                    "cost": round(stats["cost"], 6),
+                    "cost_per_attack": round(stats["cost"] / stats["attacks"], 6),
+                    "cost_per_finding": round(stats["cost"] / stats["vulnerable"], 6) if stats["vulnerable"] else None,
+                }
+                for tag, stats in sorted(tag_stats.items())
+            },
+        }
+
     def compute_all_metrics(self) -> Dict[str, Any]:
         """
         Compute all metrics.
@@ -158,7 +275,8 @@ class MetricsComputer:
         Returns:
             Dictionary containing all computed metrics
         """
-        self.load_scores()
+        if not self._preloaded:
+            self.load_scores()
         
         metrics = {
             "summary": {
@@ -177,10 +295,19 @@ class MetricsComputer:
             "severity_distribution": self.compute_severity_distribution(),
             "metadata": {
                 "computed_at": datetime.now().isoformat(),
-                "source_report": str(self.score_report_file)
+                "source_report": None if self._preloaded else str(self.score_report_file),
+                "confidence": self.confidence
             }
         }
         
+        if self.adaptive_report_file is not None:
+            with open(self.adaptive_report_file, 'r', encoding='utf-8') as f:
+                metrics["adaptive_sampling"] = json.load(f)
+        
+        if self.budget_report_file is not None:
+            with open(self.budget_report_file, 'r', encoding='utf-8') as f:
+                metrics["cost"] = self.compute_cost_metrics(json.load(f))
+        
         return metrics
     
     def save_metrics(self, output_file: str = "data/metrics.json"):
@@ -220,7 +347,20 @@ class MetricsComputer:
             key=lambda x: x[1]["success_rate"],
             reverse=True
         )[:10]:
-            print(f"{tag}: {stats['success_rate']:.1%} ({stats['successful_attacks']}/{stats['total_attacks']})")
+            low, high = stats["confidence_interval"]
+            print(f"{tag}: {stats['success_rate']:.1%} ({stats['successful_attacks']}/{stats['total_attacks']}) "
+                  f"[{low:.1%}, {high:.1%}]")
+        
+        adaptive = metrics.get("adaptive_sampling")
+        if adaptive:
+            print(f"\nAdaptive sampling: {adaptive['api_calls']} calls, "
+                  f"{adaptive['api_calls_saved']} saved")
+        
+        cost = metrics.get("cost")
+        if cost:
+            per_finding = f"${cost['cost_per_finding']:.6f}" if cost["cost_per_finding"] is not None else "n/a"
+            print(f"\nCost: ${cost['total_cost']:.6f} for {cost['total_tokens']} tokens, "
+                  f"{per_finding} per vulnerable finding")
         
         print("\n" + "=" * 60)
 
@@ -228,23 +368,48 @@ class MetricsComputer:
 def main():
     """Main entry point for metrics computation."""
     import argparse
+    from runner.profiling import add_profile_argument, profiling
     
     parser = argparse.ArgumentParser(description="Compute evaluation metrics")
     parser.add_argument(
         "--report",
         default="data/score_report.json",
-        help="Path to score report JSON"
+        help="Path to score report (JSON, .rtcol or an eval.scorer --shards directory)"
     )
     parser.add_argument(
         "--output",
         default="data/metrics.json",
         help="Path to output metrics file"
     )
+    parser.add_argument(
+        "--adaptive-report",
+        default=None,
+        help="Adaptive sampling report from runner.cli --adaptive"
+    )
+    parser.add_argument(
+        "--budget-report",
+        default=None,
+        help="Token/cost report from runner.cli --budget-report"
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Confidence level of per-tag success rate intervals"
+    )
+    
+    add_profile_argument(parser)
     
     args = parser.parse_args()
     
-    computer = MetricsComputer(score_report_file=args.report)
-    computer.save_metrics(output_file=args.output)
+    with profiling(args.profile):
+        computer = MetricsComputer(
+            score_report_file=args.report,
+            adaptive_report_file=args.adaptive_report,
+            confidence=args.confidence,
+            budget_report_file=args.budget_report
+        )
+        computer.save_metrics(output_file=args.output)
 
 
 if __name__ == "__main__":
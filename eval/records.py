@@ -0,0 +1,210 @@
+"""
+Compact typed records for attack cases, result items and score items.
+
+Pipelines hold millions of these, so they are slotted dataclasses instead of
+dicts: no per-object key table, shared (interned) tag, reason and evidence
+strings, and one run-level timestamp string shared by every score item.
+
+Records are read-only Mappings over the schema in data/schema.md, so code
+written against the dict form (`item["attack_id"]`, `item.get("tags")`) keeps
+working. Optional fields set to None are treated as absent keys. `to_dict`
+gives back the exact JSON form, with tuples as lists.
+"""
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+_INTERNED_TUPLES: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_strings(values) -> Tuple[str, ...]:
+    """
+    Return a shared tuple of interned strings for `values`.
+
+    Equal tag or reason lists across records map to the same tuple object.
+    """
+    key = tuple(values)
+    shared = _INTERNED_TUPLES.get(key)
+    if shared is None:
+        shared = _INTERNED_TUPLES.setdefault(key, tuple(sys.intern(v) if isinstance(v, str) else v for v in key))
+    return shared
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _slotted(cls):
+    """
+    dataclass(eq=False) with `__slots__` for every field.
+
+    Same result as dataclass(slots=True), which needs Python 3.10: the class
+    is rebuilt with slots once the dataclass machinery has read its defaults.
+    """
+    cls = dataclass(eq=False)(cls)
+    names = tuple(f.name for f in fields(cls))
+    namespace = {k: v for k, v in cls.__dict__.items() if k not in names + ("__dict__", "__weakref__")}
+    namespace["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+class _Record(Mapping):
+    """Dict-style read access shared by all record types."""
+
+    __slots__ = ()
+    _FIELDS: Tuple[str, ...] = ()
+    _OPTIONAL: Tuple[str, ...] = ()
+
+    def __getitem__(self, key):
+        if key in self._FIELDS:
+            value = getattr(self, key)
+            if value is None and key in self._OPTIONAL:
+                raise KeyError(key)
+            return value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        for name in self._FIELDS:
+            if name in self._OPTIONAL and getattr(self, name) is None:
+                continue
+            yield name
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON (data/schema.md) form of the record."""
+        return {k: list(v) if isinstance(v, tuple) else v for k, v in self.items()}
+
+    @classmethod
+    def _split(cls, data: Mapping) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        known = {k: data[k] for k in cls._FIELDS if k in data}
+        extra = {k: v for k, v in data.items() if k not in known}
+        return known, extra or None
+
+
+@_slotted
+class AttackCase(_Record):
+    """An attack case (data/schema.md `attack_case`)."""
+
+    attack_id: str
+    prompt: str
+    tags: Optional[Tuple[str, ...]] = None
+    metadata: Optional[Dict[str, Any]] = None
+    turns: Optional[Tuple[str, ...]] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    _FIELDS = ("attack_id", "prompt", "turns", "tags", "metadata")
+    _OPTIONAL = ("turns", "tags", "metadata")
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "AttackCase":
+        known, extra = cls._split(data)
+        tags = known.get("tags")
+        return cls(
+            attack_id=known.get("attack_id"),
+            prompt=known.get("prompt"),
+            tags=intern_strings(tags) if tags is not None else None,
+            metadata=known.get("metadata"),
+            turns=tuple(known["turns"]) if known.get("turns") is not None else None,
+            extra=extra,
+        )
+
+
+@_slotted
+class ResultItem(_Record):
+    """One model call (data/schema.md `result_item`)."""
+
+    attack_id: str
+    prompt: str
+    response: str
+    model_meta: Dict[str, Any]
+    timestamp: str
+    tags: Optional[Tuple[str, ...]] = None
+    latency_s: Optional[float] = None
+    error: Optional[str] = None
+    turns: Optional[List[Dict[str, Any]]] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    _FIELDS = ("attack_id", "prompt", "tags", "response", "error", "model_meta", "timestamp", "latency_s", "turns")
+    _OPTIONAL = ("tags", "error", "latency_s", "turns")
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "ResultItem":
+        known, extra = cls._split(data)
+        tags = known.get("tags")
+        return cls(
+            attack_id=known.get("attack_id"),
+            prompt=known.get("prompt"),
+            response=known.get("response", ""),
+            model_meta=known.get("model_meta", {}),
+            timestamp=known.get("timestamp"),
+            tags=intern_strings(tags) if tags is not None else None,
+            latency_s=known.get("latency_s"),
+            error=known.get("error"),
+            turns=known.get("turns"),
+            extra=extra,
+        )
+
+
+@_slotted
+class ScoreItem(_Record):
+    """Scored result (data/schema.md `score_item`)."""
+
+    attack_id: str
+    vulnerable: bool
+    vulnerability_reasons: Tuple[str, ...]
+    severity_score: float
+    evidence_count: int
+    evidence: Tuple[str, ...]
+    notes: str
+    timestamp: str
+    tags: Optional[Tuple[str, ...]] = None
+    response_length: int = 0
+    scan_truncated: Optional[bool] = None
+    rule_pack_version: Optional[str] = None
+    turn_scores: Optional[List[Dict[str, Any]]] = None
+    cluster_id: Optional[int] = None
+    cluster_size: Optional[int] = None
+    cluster_representative: Optional[str] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    _FIELDS = (
+        "attack_id", "vulnerable", "vulnerability_reasons", "severity_score", "evidence_count",
+        "evidence", "notes", "tags", "response_length", "scan_truncated", "rule_pack_version",
+        "turn_scores", "cluster_id", "cluster_size", "cluster_representative", "timestamp",
+    )
+    _OPTIONAL = (
+        "tags", "scan_truncated", "rule_pack_version", "turn_scores",
+        "cluster_id", "cluster_size", "cluster_representative",
+    )
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "ScoreItem":
+        known, extra = cls._split(data)
+        tags = known.get("tags")
+        return cls(
+            attack_id=known.get("attack_id"),
+            vulnerable=known.get("vulnerable", False),
+            vulnerability_reasons=intern_strings(known.get("vulnerability_reasons", ())),
+            severity_score=known.get("severity_score", 0.0),
+            evidence_count=known.get("evidence_count", 0),
+            # evidence quotes response text, so only the strings are shared
+            evidence=tuple(map(_intern, known.get("evidence", ()))),
+            notes=_intern(known.get("notes", "")),
+            timestamp=_intern(known.get("timestamp")),
+            tags=intern_strings(tags) if tags is not None else None,
+            response_length=known.get("response_length", 0),
+            scan_truncated=known.get("scan_truncated"),
+            rule_pack_version=_intern(known.get("rule_pack_version")),
+            turn_scores=known.get("turn_scores"),
+            cluster_id=known.get("cluster_id"),
+            cluster_size=known.get("cluster_size"),
+            cluster_representative=known.get("cluster_representative"),
+            extra=extra,
+        )
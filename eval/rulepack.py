@@ -0,0 +1,429 @@
+"""
+Versioned, hot-reloadable rule packs for the heuristics.
+
+A rule pack is a JSON file (or YAML, with PyYAML installed) holding the
+keyword lists and regex rules that eval.heuristics runs; the built-in pack is
+eval/rules/default.json. A pack may `extend` other packs, whose lists it
+appends to:
+
+    {
+      "name": "internal",
+      "version": "2024.06.1",
+      "extends": "../../eval/rules/default.json",
+      "jailbreak_keywords": ["..."],
+      "harmful_patterns": [
+        {"pattern": "(?i)wire the funds to", "flags": ["IGNORECASE"], "triggers": ["wire the funds"]}
+      ]
+    }
+
+`triggers` are lowercase literals at least one of which occurs in any text the
+rule matches; they feed the prefilter (see heuristics.could_match). A rule
+without triggers turns the prefilter off for the whole pack.
+
+Compiling a pack checks and compiles every regex (see heuristics.compile_rules)
+and builds the literal matchers. The matcher and prefilter patterns are cached
+on disk under the pack's content hash, so a warm start skips building them.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from eval import heuristics
+from eval.heuristics import DEFAULT_MAX_SCAN_CHARS, CompiledRule, compile_rules
+
+DEFAULT_RULE_PACK = Path(__file__).parent / "rules" / "default.json"
+# under the package root, like DEFAULT_RULE_PACK, whatever the working directory
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / ".rule_cache"
+RELOAD_INTERVAL_S = 2.0
+# bump whenever the cache layout or what is derived from a pack changes
+CACHE_FORMAT = 2
+
+LIST_FIELDS = (
+    "jailbreak_keywords",
+    "system_indicators",
+    "special_tokens",
+    "critical_keywords",
+    "high_severity_keywords",
+    "medium_severity_keywords",
+)
+RULE_FIELDS = {"instruction_patterns": "instruction", "harmful_patterns": "harmful"}
+_FLAGS = {name: getattr(re, name) for name in ("IGNORECASE", "MULTILINE", "DOTALL", "VERBOSE", "ASCII")}
+
+
+def _trie_pattern(words) -> str:
+    """
+    Build a regex that finds any of `words`, factored as a prefix trie.
+
+    sre tries alternatives one by one at every position, so a flat
+    alternation of ~80 literals is slower than the scan it guards; with a trie
+    each position fails after a single character test for most text. Only
+    existence matters, so a word that is a prefix of others ends its branch.
+    """
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        if "" in node:
+            return ""
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+
+    return build(trie)
+
+
+class LiteralMatcher:
+    """
+    Report which of many literals occur in a text.
+
+    Equivalent to `[i for i, lit in enumerate(literals) if lit in text]`, but
+    one trie regex finds every position where some literal starts and only the
+    literals sharing that position's first two characters are compared, so
+    the cost hardly grows with the number of literals.
+    """
+
+    def __init__(self, literals: Iterable[str], pattern: Optional[str] = None):
+        self.literals = list(literals)
+        self._buckets: Dict[str, List[int]] = {}
+        for i, literal in enumerate(self.literals):
+            self._buckets.setdefault(literal[:2], []).append(i)
+        if pattern is None:
+            pattern = self.build_pattern(self.literals)
+        self.pattern = pattern
+        self._regex = re.compile(pattern) if pattern else None
+
+    @staticmethod
+    def build_pattern(literals) -> str:
+        literals = set(literals)
+        if not literals:
+            return ""
+        if "" in literals:
+            # the empty string is in every text
+            return "(?=)"
+        return "(?=" + _trie_pattern(literals) + ")"
+
+    def find(self, text: str) -> List[int]:
+        """Indices of the literals occurring in `text`, in list order."""
+        if self._regex is None:
+            return []
+        buckets = self._buckets
+        literals = self.literals
+        hits = set()
+        for m in self._regex.finditer(text):
+            p = m.start()
+            pair = text[p:p + 2]
+            keys = (pair, pair[:1], "") if len(pair) == 2 else (pair, "")
+            for key in keys:
+                for i in buckets.get(key, ()):
+                    if i not in hits and text.startswith(literals[i], p):
+                        hits.add(i)
+        return sorted(hits)
+
+
+def read_pack_file(path) -> Dict[str, Any]:
+    """Parse one pack file (.json, or .yaml/.yml with PyYAML)."""
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix in (".yaml", ".yml"):
+            import yaml
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f"Invalid YAML in rule pack {path}: {e}") from e
+        else:
+            data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Rule pack {path} must be a mapping")
+    return data
+
+
+def _merge(base: Dict[str, Any], child: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in child.items():
+        if key in LIST_FIELDS or key in RULE_FIELDS:
+            merged[key] = list(merged.get(key, []))
+            seen = {json.dumps(v, sort_keys=True) for v in merged[key]}
+            for item in value:
+                text = json.dumps(item, sort_keys=True)
+                if text not in seen:
+                    seen.add(text)
+                    merged[key].append(item)
+        else:
+            merged[key] = value
+    return merged
+
+
+def resolve_pack(path, _chain: Tuple[Path, ...] = ()) -> Tuple[Dict[str, Any], List[Path]]:
+    """
+    Read a pack and everything it extends.
+
+    Returns:
+        Tuple of (merged pack data, every file it was built from)
+    """
+    path = Path(path).resolve()
+    if path in _chain:
+        raise ValueError(f"Rule pack {path} extends itself")
+    data = read_pack_file(path)
+    parents = data.pop("extends", None) or []
+    if isinstance(parents, str):
+        parents = [parents]
+    merged: Dict[str, Any] = {}
+    sources = []
+    for parent in parents:
+        parent_data, parent_sources = resolve_pack(path.parent / parent, _chain + (path,))
+        merged = _merge(merged, parent_data)
+        sources.extend(s for s in parent_sources if s not in sources)
+    sources.append(path)
+    data.setdefault("name", path.stem)
+    return _merge(merged, data), sources
+
+
+def _validate(data: Dict[str, Any]):
+    if not isinstance(data.get("version"), (str, int, float)):
+        raise ValueError(f"Rule pack {data.get('name')!r} has no version")
+    for key in LIST_FIELDS:
+        values = data.get(key, [])
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"Rule pack field {key!r} must be a list of strings")
+    for key in RULE_FIELDS:
+        for rule in data.get(key, []):
+            if not isinstance(rule, dict) or not isinstance(rule.get("pattern"), str):
+                raise ValueError(f"Every entry of {key!r} needs a 'pattern' string")
+            unknown = set(rule.get("flags", [])) - set(_FLAGS)
+            if unknown:
+                raise ValueError(f"Unknown regex flags {sorted(unknown)} in {rule['pattern']!r}")
+            try:
+                re.compile(rule["pattern"], _flags(rule))
+            except re.error as e:
+                raise ValueError(f"Invalid pattern {rule['pattern']!r}: {e}") from e
+
+
+def _flags(rule: Dict[str, Any]) -> int:
+    flags = 0
+    for name in rule.get("flags", []):
+        flags |= _FLAGS[name]
+    return flags
+
+
+def pack_digest(data: Dict[str, Any]) -> str:
+    """Content hash of merged pack data and of everything compiling it depends on."""
+    compiler = [CACHE_FORMAT, sys.version_info[:2], heuristics.SAFE_REWRITES]
+    blob = json.dumps([data, compiler], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf8")).hexdigest()
+
+
+class RulePack:
+    """
+    A compiled rule pack, as used by the eval.heuristics detectors.
+
+    Attributes:
+        name, version: From the pack file
+        digest: Content hash of the merged pack
+        sources: Files the pack was built from (watched for hot reload)
+        rules: CompiledRules, instruction rules first
+        prefilter: Trie regex over every trigger literal, or None if a rule
+                   has no triggers
+        long_token: Whether a rule is gated by the long-token check instead
+    """
+
+    def __init__(self, data: Dict[str, Any], digest: str, sources=(), cache: Optional[Dict[str, Any]] = None):
+        self.data = data
+        self.name = str(data.get("name", "rules"))
+        self.version = str(data["version"])
+        self.digest = digest
+        self.sources = tuple(sources)
+        self.max_scan_chars = int(data.get("max_scan_chars", DEFAULT_MAX_SCAN_CHARS))
+        for key in LIST_FIELDS:
+            setattr(self, key, list(data.get(key, [])))
+        cache = cache or {}
+        matchers = cache.get("matchers", {})
+
+        self.rules: List[CompiledRule] = []
+        triggers: Dict[str, List[Optional[List[str]]]] = {}
+        for key, category in RULE_FIELDS.items():
+            entries = data.get(key, [])
+            self.rules.extend(compile_rules(
+                [(r["pattern"], _flags(r)) for r in entries], category, self.max_scan_chars))
+            # [] marks a rule gated by the long-token check; None a rule with no triggers
+            triggers[category] = [
+                [] if r.get("prefilter") == "long_token" else r.get("triggers")
+                for r in entries
+            ]
+        self.instruction_triggers = triggers["instruction"]
+        self.harmful_triggers = triggers["harmful"]
+        self.long_token = any(
+            r.get("prefilter") == "long_token" for key in RULE_FIELDS for r in data.get(key, []))
+
+        self.keyword_matcher = LiteralMatcher(
+            [k.lower() for k in self.jailbreak_keywords], matchers.get("keywords"))
+        self.indicator_matcher = LiteralMatcher(self.system_indicators, matchers.get("indicators"))
+        self.token_matcher = LiteralMatcher(self.special_tokens, matchers.get("tokens"))
+
+        if any(t is None for t in self.instruction_triggers + self.harmful_triggers):
+            self.prefilter_pattern = None
+        elif "prefilter" in cache:
+            self.prefilter_pattern = cache["prefilter"]
+        else:
+            literals = set(k.lower() for k in self.jailbreak_keywords)
+            literals.update(i.lower() for i in self.system_indicators)
+            literals.update(t.lower() for t in self.special_tokens)
+            for t in self.instruction_triggers + self.harmful_triggers:
+                literals.update(x.lower() for x in t)
+            self.prefilter_pattern = _trie_pattern(literals)
+        self.prefilter: Optional[Pattern] = (
+            re.compile(self.prefilter_pattern) if self.prefilter_pattern is not None else None)
+
+    @property
+    def version_tag(self) -> str:
+        """`name@version+hash`, stamped into score items as rule_pack_version."""
+        return f"{self.name}@{self.version}+{self.digest[:8]}"
+
+    @property
+    def instruction_patterns(self) -> List[Pattern]:
+        return [r.regex for r in self.rules if r.category == "instruction"]
+
+    @property
+    def harmful_patterns(self) -> List[Pattern]:
+        return [r.regex for r in self.rules if r.category == "harmful"]
+
+    def cache_entry(self) -> Dict[str, Any]:
+        return {
+            "format": CACHE_FORMAT,
+            "digest": self.digest,
+            "prefilter": self.prefilter_pattern,
+            "matchers": {
+                "keywords": self.keyword_matcher.pattern,
+                "indicators": self.indicator_matcher.pattern,
+                "tokens": self.token_matcher.pattern,
+            },
+        }
+
+
+
+def _cache_path(cache_dir, digest: str) -> Path:
+    return Path(cache_dir) / f"{digest}.json"
+
+
+def _read_cache(cache_dir, digest: str) -> Optional[Dict[str, Any]]:
+    if cache_dir is None:
+        return None
+    try:
+        with open(_cache_path(cache_dir, digest), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("format") != CACHE_FORMAT or entry.get("digest") != digest:
+        return None
+    return entry
+
+
+def _write_cache(cache_dir, pack: RulePack):
+    if cache_dir is None:
+        return
+    path = _cache_path(cache_dir, pack.digest)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(pack.cache_entry(), f)
+        os.replace(tmp, path)
+    except OSError:
+        # a read-only checkout still works, just without warm starts
+        pass
+
+
+def compile_rule_pack(data: Dict[str, Any], sources=(), cache_dir=None) -> RulePack:
+    """
+    Compile merged pack data into a RulePack.
+
+    Args:
+        data: Pack data as in a pack file (without `extends`)
+        sources: Files the data came from
+        cache_dir: Directory of the compile cache, None to disable it
+    """
+    _validate(data)
+    digest = pack_digest(data)
+    cache = _read_cache(cache_dir, digest)
+    pack = RulePack(data, digest, sources, cache)
+    if cache is None:
+        _write_cache(cache_dir, pack)
+    return pack
+
+
+def load_rule_pack(path=DEFAULT_RULE_PACK, cache_dir=DEFAULT_CACHE_DIR) -> RulePack:
+    """Load, validate and compile a rule pack file and the packs it extends."""
+    data, sources = resolve_pack(path)
+    return compile_rule_pack(data, sources, cache_dir)
+
+
+class RulePackWatcher:
+    """
+    Keeps a rule pack current while a run is going.
+
+    `current()` stats the pack's files at most once per `check_interval_s`
+    and recompiles when one of them changed. A pack that fails to load (say,
+    a half-written file) leaves the previous pack in place.
+
+    Args:
+        path: Pack file
+        check_interval_s: Minimum time between file checks (0 checks on every call)
+        cache_dir: Directory of the compile cache, None to disable it
+    """
+
+    def __init__(self, path=DEFAULT_RULE_PACK, check_interval_s: float = RELOAD_INTERVAL_S,
+                 cache_dir=DEFAULT_CACHE_DIR):
+        self.path = Path(path)
+        self.check_interval_s = check_interval_s
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self.pack = load_rule_pack(self.path, cache_dir)
+        self._stamp = self._stat()
+        self._checked = time.monotonic()
+        self.reloads = 0
+
+    def _stat(self):
+        stamp = []
+        for source in self.pack.sources:
+            try:
+                st = os.stat(source)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return stamp
+
+    def current(self) -> RulePack:
+        """Return the pack, reloading it first if its files changed."""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval_s:
+            return self.pack
+        with self._lock:
+            if now - self._checked < self.check_interval_s:
+                return self.pack
+            self._checked = now
+            stamp = self._stat()
+            if stamp != self._stamp:
+                self._stamp = stamp
+                self._reload()
+        return self.pack
+
+    def _reload(self):
+        try:
+            pack = load_rule_pack(self.path, self.cache_dir)
+        except (OSError, ValueError) as e:
+            warnings.warn(f"Keeping rule pack {self.pack.version_tag}: reloading {self.path} failed: {e}")
+            return
+        if pack.digest != self.pack.digest:
+            print(f"Rule pack reloaded: {self.pack.version_tag} -> {pack.version_tag}")
+            self.pack = pack
+            self.reloads += 1
+        self._stamp = self._stat()
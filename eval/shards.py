@@ -0,0 +1,258 @@
+"""
+Sharded score reports: per-worker JSONL shards plus a small manifest.
+
+Layout of a shard directory:
+
+    manifest.json             format, generation, report metadata, per-shard counts
+    shard-1-0000.jsonl[.gz]   score items, one JSON object per line
+    ...
+
+Score items are dealt round-robin to the shards and every line carries the
+item's position in the report (`_seq`), so each shard is sorted by position
+and a k-way merge over the shards restores the order of the single-file
+report. Every write is a new generation whose shard names appear only in
+the new manifest, which is replaced atomically, so a reader that opens the
+manifest afresh sees either the old report or the new one, never a mix.
+The previous generation's shards are deleted after the swap; a reader
+still streaming them keeps its open files, but one that loaded the old
+manifest and has not opened a shard yet should re-read the manifest.
+Consumers that only need totals read the manifest; `iter_scores` streams the merged items and `merge_shards`
+writes the legacy score_report.json (or .rtcol) on demand.
+"""
+import gzip
+import heapq
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from eval.columnar import EXTENSION, write_columnar
+from eval.records import ScoreItem
+
+FORMAT = "score-shards/1"
+MANIFEST_NAME = "manifest.json"
+SEQ_KEY = "_seq"
+_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", None: ""}
+
+
+def manifest_path(path) -> Path:
+    """Manifest of a shard directory (or the manifest path itself)."""
+    path = Path(path)
+    return path / MANIFEST_NAME if path.is_dir() or path.suffix != ".json" else path
+
+
+def is_sharded(path) -> bool:
+    """True if path is a shard directory or its manifest."""
+    path = Path(path)
+    if path.is_dir():
+        return (path / MANIFEST_NAME).exists()
+    return path.name == MANIFEST_NAME and path.exists()
+
+
+def _open(path: Path, mode: str):
+    if path.suffix == ".gz":
+        # level 6 is several times faster than gzip's default 9 for ~the same size
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+    if path.suffix == ".zst":
+        import zstandard
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor().stream_writer(raw)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _write_shard(path: Path, name: str, positions: range, scores: List[Any]) -> Dict[str, Any]:
+    count = vulnerable = 0
+    severity = 0.0
+    with _open(path, "w") as f:
+        for seq in positions:
+            score = scores[seq]
+            row = score.to_dict() if isinstance(score, ScoreItem) else dict(score)
+            f.write(json.dumps({SEQ_KEY: seq, **row}, ensure_ascii=False) + "\n")
+            count += 1
+            vulnerable += bool(row.get("vulnerable"))
+            severity += row.get("severity_score") or 0.0
+    return {
+        "file": name,
+        "count": count,
+        "vulnerable_count": vulnerable,
+        "severity_sum": round(severity, 6),
+        "bytes": path.stat().st_size,
+    }
+
+
+def write_shards(
+    out_dir,
+    scores: List[Any],
+    metadata: Dict[str, Any],
+    workers: int = 4,
+    compression: Optional[str] = None
+) -> Path:
+    """
+    Write score items as one shard per worker plus a manifest.
+
+    Shards are encoded and written concurrently (compression and file I/O
+    release the GIL) to temporary files, which are renamed to this
+    generation's shard names once every thread has finished. No manifest
+    refers to those names until the new one replaces the old; the previous
+    generation's shards are removed after that.
+
+    Args:
+        out_dir: Shard directory (created if missing)
+        scores: Score items (ScoreItems or dicts), in report order
+        metadata: Report metadata stored in the manifest (score_report.json "metadata")
+        workers: Number of shards, each written by its own thread
+        compression: "gzip", "zstd" (needs the zstandard package) or None
+
+    Returns:
+        Path of the manifest
+    """
+    if compression not in _SUFFIXES:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "zstd":
+        import zstandard  # noqa: F401  fail fast if the optional dependency is missing
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n = max(1, min(workers, len(scores)))
+    generation = _generation(out_dir) + 1
+    names = [out_dir / f"shard-{generation}-{i:04d}.jsonl{_SUFFIXES[compression]}" for i in range(n)]
+    # same suffix as the final name (it selects the codec), but outside the shard-* glob
+    tmps = [out_dir / f".tmp-{os.getpid()}-{p.name}" for p in names]
+    try:
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            shards = list(ex.map(
+                lambda i: _write_shard(tmps[i], names[i].name, range(i, len(scores), n), scores), range(n)
+            ))
+    except BaseException:
+        for tmp in tmps:
+            _remove(tmp)
+        raise
+
+    manifest = {
+        "format": FORMAT,
+        "generation": generation,
+        "compression": compression,
+        "metadata": metadata,
+        "shards": shards,
+    }
+    path = out_dir / MANIFEST_NAME
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    for shard_tmp, name in zip(tmps, names):
+        os.replace(shard_tmp, name)
+    os.replace(tmp, path)
+
+    keep = {p.name for p in names}
+    for stale in out_dir.glob("shard-*.jsonl*"):
+        if stale.name not in keep:
+            _remove(stale)
+    return path
+
+
+def _generation(out_dir: Path) -> int:
+    """Generation of the shards currently in out_dir (0 if there are none)."""
+    try:
+        return int(read_manifest(out_dir).get("generation", 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def _remove(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def read_manifest(path) -> Dict[str, Any]:
+    """Load the manifest of a shard directory."""
+    with open(manifest_path(path), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT:
+        raise ValueError(f"Not a score shard manifest: {manifest_path(path)}")
+    return manifest
+
+
+def _iter_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_shard(path, index: int) -> Iterator[Dict[str, Any]]:
+    """Score items of one shard, in report order."""
+    manifest = read_manifest(path)
+    shard = manifest_path(path).parent / manifest["shards"][index]["file"]
+    for row in _iter_rows(shard):
+        row.pop(SEQ_KEY, None)
+        yield row
+
+
+def iter_scores(path) -> Iterator[Dict[str, Any]]:
+    """
+    All score items in report order, by k-way merge of the shards.
+
+    Only one line per shard is held in memory at a time.
+    """
+    manifest = read_manifest(path)
+    root = manifest_path(path).parent
+    streams = [_iter_rows(root / shard["file"]) for shard in manifest["shards"]]
+    for row in heapq.merge(*streams, key=lambda r: r[SEQ_KEY]):
+        row.pop(SEQ_KEY, None)
+        yield row
+
+
+def merge_shards(path, output_file) -> Path:
+    """
+    Write the single-file score report of a shard directory.
+
+    Args:
+        path: Shard directory or its manifest
+        output_file: score_report.json path, or .rtcol for the columnar format
+
+    Returns:
+        Path of the written report
+    """
+    # lazy: eval.scorer imports this module
+    from eval.scorer import _dump_report
+
+    metadata = read_manifest(path)["metadata"]
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if output_path.suffix == EXTENSION:
+        return write_columnar(output_path, iter_scores(path), "scores", metadata)
+    with open(output_path, "w", encoding="utf-8") as f:
+        _dump_report(f, metadata, iter_scores(path))
+    return output_path
+
+
+def main():
+    """Merge a shard directory into a single-file score report."""
+    import argparse
+    from runner.profiling import add_profile_argument, profiling
+
+    parser = argparse.ArgumentParser(description="Merge score report shards written by eval.scorer --shards")
+    parser.add_argument("shards", help="Shard directory (or its manifest.json)")
+    parser.add_argument(
+        "--output",
+        default="data/score_report.json",
+        help="Merged report path (.rtcol for the columnar format)"
+    )
+
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    with profiling(args.profile):
+        out = merge_shards(args.shards, args.output)
+    print(f"Merged {read_manifest(args.shards)['metadata']['total_attacks']} scores -> {out}")
+
+
+if __name__ == "__main__":
+    main()
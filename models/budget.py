@@ -0,0 +1,301 @@
+# models/budget.py
+import functools
+import json
+import math
+import os
+import threading
+from contextlib import contextmanager
+
+# USD per 1000 (prompt, completion) tokens of the model each provider uses (models.client)
+PRICES = {
+    "mock": (0.0, 0.0),
+    "openai": (0.00015, 0.0006),
+    "gemini": (0.0003, 0.0025),
+}
+# tiktoken encoding of each provider's model; others are estimated from length
+ENCODINGS = {"openai": "o200k_base"}
+CHARS_PER_TOKEN = 4
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised instead of sending a call the budget cannot pay for."""
+
+
+@functools.lru_cache(maxsize=None)
+def _encoder(name):
+    # tiktoken is optional and its tables load slowly, so only on first use
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def estimate_tokens(text, provider=None):
+    """Token count of `text` with the provider's tokenizer, or ~4 characters per token."""
+    name = ENCODINGS.get(provider)
+    encoder = _encoder(name) if name else None
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+def usage_from_response(response):
+    """(prompt_tokens, completion_tokens) reported by a LangChain message, or None."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage")
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return None
+
+
+@contextmanager
+def _file_lock(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _bucket():
+    return {"calls": 0, "cost": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+
+
+class BudgetLedger:
+    """
+    Token and cost accounting with per-run and per-provider caps.
+
+    Before each provider call the client reserves the worst-case cost: the
+    estimated prompt tokens plus `max_tokens` of completion. When the
+    remaining budget only covers a shorter completion, the call's
+    `max_tokens` is lowered (throttled); when it cannot cover
+    `min_output_tokens`, BudgetExceeded is raised and nothing is sent. After
+    the call the reservation is settled with the usage the provider
+    reported, or an estimate from the prompt and response text.
+
+    All operations hold a lock, so one ledger can be shared by every worker
+    thread. With `path`, operations are also appended to a JSON-lines journal
+    under a file lock and replayed by every ledger using the same file, so
+    the caps hold across processes.
+
+    Args:
+        max_cost: Cap on the run's total cost in USD
+        provider_caps: {provider: max cost in USD}
+        max_total_tokens: Cap on prompt + completion tokens over the run
+        prices: {provider: (USD per 1k prompt tokens, USD per 1k completion tokens)}, merged over PRICES
+        min_output_tokens: Smallest completion worth sending
+        throttle_at: Fraction of a cap after which runner.run_all issues one call at a time
+        path: Journal file shared between processes
+    """
+
+    def __init__(self, max_cost=None, provider_caps=None, max_total_tokens=None, prices=None,
+                 min_output_tokens=16, throttle_at=0.9, path=None):
+        self.max_cost = max_cost
+        self.provider_caps = dict(provider_caps or {})
+        self.max_total_tokens = max_total_tokens
+        self.prices = {**PRICES, **(prices or {})}
+        self.min_output_tokens = min_output_tokens
+        self.throttle_at = throttle_at
+        self.path = path
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._next_id = 0
+        self._reserved = {}  # id -> (provider, cost, tokens)
+        self.providers = {}
+        self.attacks = {}
+        self.rejected = 0
+        self.throttled = 0
+        self.skipped_attacks = 0
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            open(path, "a", encoding="utf8").close()
+
+    @property
+    def capped(self):
+        """True if any cap is set; an uncapped ledger only does accounting."""
+        return self.max_cost is not None or bool(self.provider_caps) or self.max_total_tokens is not None
+
+    def price(self, provider):
+        return self.prices.get(provider, (0.0, 0.0))
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the ledger (and journal) lock with state replayed from the journal."""
+        with self._lock:
+            if not self.path:
+                yield None
+                return
+            with open(self.path, "r+", encoding="utf8") as f, _file_lock(f):
+                f.seek(self._offset)
+                for line in f:
+                    self._apply(json.loads(line))
+                self._offset = f.tell()
+                yield f
+
+    def _write(self, journal, entry):
+        # every entry is applied once: directly, or when replayed from the journal
+        if journal is not None:
+            journal.seek(0, os.SEEK_END)
+            journal.write(json.dumps(entry) + "\n")
+            journal.flush()
+            self._offset = journal.tell()
+        self._apply(entry)
+
+    def _apply(self, entry):
+        op = entry["op"]
+        if op == "reserve":
+            self._reserved[entry["id"]] = (entry["provider"], entry["cost"], entry["tokens"])
+            return
+        self._reserved.pop(entry["id"], None)
+        if op == "settle":
+            for key, bucket in ((entry["provider"], self.providers), (entry["attack_id"], self.attacks)):
+                totals = bucket.setdefault(key, _bucket())
+                totals["calls"] += 1
+                totals["cost"] += entry["cost"]
+                totals["prompt_tokens"] += entry["prompt_tokens"]
+                totals["completion_tokens"] += entry["completion_tokens"]
+
+    def _committed(self, provider=None):
+        cost = tokens = 0.0
+        for p, totals in self.providers.items():
+            if provider is None or p == provider:
+                cost += totals["cost"]
+                tokens += totals["prompt_tokens"] + totals["completion_tokens"]
+        for p, c, t in self._reserved.values():
+            if provider is None or p == provider:
+                cost += c
+                tokens += t
+        return cost, tokens
+
+    def _headroom(self, provider):
+        """(remaining cost, remaining tokens) under the caps that apply; None when uncapped."""
+        run_cost, run_tokens = self._committed()
+        cost_left = None if self.max_cost is None else self.max_cost - run_cost
+        if provider in self.provider_caps:
+            left = self.provider_caps[provider] - self._committed(provider)[0]
+            cost_left = left if cost_left is None else min(cost_left, left)
+        tokens_left = None if self.max_total_tokens is None else self.max_total_tokens - run_tokens
+        return cost_left, tokens_left
+
+    def _affordable(self, provider, prompt_tokens, max_tokens):
+        in_price, out_price = self.price(provider)
+        cost_left, tokens_left = self._headroom(provider)
+        allowed = max_tokens
+        if cost_left is not None:
+            left = cost_left - prompt_tokens * in_price / 1000
+            if left < 0:
+                return -1
+            if out_price > 0:
+                allowed = min(allowed, int(left * 1000 / out_price))
+        if tokens_left is not None:
+            allowed = min(allowed, int(tokens_left - prompt_tokens))
+        return allowed
+
+    def reserve(self, provider, prompt, max_tokens):
+        """
+        Reserve the cost of one call before it is sent.
+
+        Returns:
+            (reservation id, max_tokens to send, estimated prompt tokens)
+
+        Raises:
+            BudgetExceeded: The remaining budget cannot pay for the call
+        """
+        prompt_tokens = estimate_tokens(prompt, provider)
+        in_price, out_price = self.price(provider)
+        with self._transaction() as journal:
+            allowed = self._affordable(provider, prompt_tokens, max_tokens)
+            if allowed < min(self.min_output_tokens, max_tokens):
+                self.rejected += 1
+                raise BudgetExceeded(f"budget exhausted for {provider}: {self._describe(provider)}")
+            if allowed < max_tokens:
+                self.throttled += 1
+            self._next_id += 1
+            rid = f"{os.getpid()}-{id(self)}-{self._next_id}"
+            cost = (prompt_tokens * in_price + allowed * out_price) / 1000
+            self._write(journal, {"op": "reserve", "id": rid, "provider": provider, "cost": cost,
+                                  "tokens": prompt_tokens + allowed})
+        return rid, allowed, prompt_tokens
+
+    def settle(self, rid, provider, attack_id, prompt_tokens, completion_tokens):
+        """Replace a reservation with the call's actual usage; returns its cost."""
+        in_price, out_price = self.price(provider)
+        cost = (prompt_tokens * in_price + completion_tokens * out_price) / 1000
+        with self._transaction() as journal:
+            self._write(journal, {"op": "settle", "id": rid, "provider": provider, "attack_id": attack_id,
+                                  "cost": cost, "prompt_tokens": prompt_tokens,
+                                  "completion_tokens": completion_tokens})
+        return cost
+
+    def release(self, rid):
+        """Drop the reservation of a call that failed."""
+        with self._transaction() as journal:
+            self._write(journal, {"op": "release", "id": rid})
+
+    def exhausted(self, provider=None):
+        """True when not even a minimal call fits the remaining budget."""
+        with self._transaction():
+            return self._affordable(provider, 0, self.min_output_tokens) < self.min_output_tokens
+
+    def near_limit(self, provider=None):
+        """True once any applicable cap is at least `throttle_at` used (or reserved)."""
+        with self._transaction():
+            run_cost, run_tokens = self._committed()
+            used = []
+            if self.max_cost:
+                used.append(run_cost / self.max_cost)
+            if provider in self.provider_caps and self.provider_caps[provider]:
+                used.append(self._committed(provider)[0] / self.provider_caps[provider])
+            if self.max_total_tokens:
+                used.append(run_tokens / self.max_total_tokens)
+            return any(u >= self.throttle_at for u in used)
+
+    def skip(self, n):
+        """Count attacks the runner never submitted because the budget ran out."""
+        with self._lock:
+            self.skipped_attacks += n
+
+    def _describe(self, provider):
+        cost_left, tokens_left = self._headroom(provider)
+        parts = []
+        if cost_left is not None:
+            parts.append(f"${max(cost_left, 0):.6f} left")
+        if tokens_left is not None:
+            parts.append(f"{max(int(tokens_left), 0)} tokens left")
+        return ", ".join(parts) or "no cap"
+
+    def report(self):
+        with self._transaction():
+            cost, tokens = self._committed()
+            return {
+                "caps": {"max_cost": self.max_cost, "provider_caps": self.provider_caps,
+                         "max_total_tokens": self.max_total_tokens},
+                "cost": round(cost, 6),
+                "tokens": int(tokens),
+                "calls": sum(t["calls"] for t in self.providers.values()),
+                "rejected_calls": self.rejected,
+                "throttled_calls": self.throttled,
+                "skipped_attacks": self.skipped_attacks,
+                "providers": {p: {**t, "cost": round(t["cost"], 6)} for p, t in sorted(self.providers.items())},
+                "attacks": {a: {**t, "cost": round(t["cost"], 6)} for a, t in sorted(self.attacks.items())},
+            }
+
+    def save_report(self, path="data/budget.json"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
@@ -0,0 +1,174 @@
+# models/calllog.py
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import re
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueListener, RotatingFileHandler
+
+_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", None: ""}
+
+
+def _open_segment(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf8")
+    if path.endswith(".zst"):
+        import io
+        import zstandard
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf8")
+    return open(path, "r", encoding="utf8")
+
+
+class _CompressingRotatingHandler(RotatingFileHandler):
+    """RotatingFileHandler that also rotates by age and compresses rotated segments."""
+
+    def __init__(self, path, max_bytes, backup_count, rotate_interval_s=None, compression="gzip"):
+        super().__init__(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf8", delay=True)
+        if compression not in _SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd":
+            import zstandard  # noqa: F401  fail fast if the optional dependency is missing
+        self.compression = compression
+        self.rotate_interval_s = rotate_interval_s
+        self._opened_at = time.time()
+        self.namer = lambda name: name + _SUFFIXES[compression]
+        self.rotator = self._compress
+
+    def _compress(self, source, dest):
+        if self.compression == "gzip":
+            with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        elif self.compression == "zstd":
+            import zstandard
+            with open(source, "rb") as src, open(dest, "wb") as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+        else:
+            os.replace(source, dest)
+            return
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.rotate_interval_s and time.time() - self._opened_at >= self.rotate_interval_s:
+            if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                return True
+            self._opened_at = time.time()
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._opened_at = time.time()
+
+    def format(self, record):
+        attack_id, prompt, meta = record.entry
+        ts = datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+        return json.dumps({
+            "ts": ts,
+            "attack_id": attack_id,
+            "prompt_trunc": (prompt or "")[:400],
+            "meta": meta or {},
+        })
+
+
+class CallLogger:
+    """
+    Non-blocking, rotating, compressed log of model calls.
+
+    `log` only builds a record and puts it on a queue; a background listener
+    formats and writes entries, rotates the file by size and/or age and
+    compresses rotated segments (`model_calls.log.1.gz`, ...).
+
+    Args:
+        path: Active log file path
+        max_bytes: Rotate once the active file would exceed this size (0 disables)
+        backup_count: Number of rotated segments to keep
+        rotate_interval_s: Also rotate when the active file is older than this
+        compression: "gzip", "zstd" (needs the zstandard package) or None
+        sample_rate: Fraction of successful calls to log; errors are always logged
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, backup_count=10, rotate_interval_s=None,
+                 compression="gzip", sample_rate=1.0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.sample_rate = sample_rate
+        self.handler = _CompressingRotatingHandler(path, max_bytes, backup_count, rotate_interval_s, compression)
+        self._queue = queue.Queue()
+        self._listener = QueueListener(self._queue, self.handler)
+        self._listener.start()
+        self._closed = False
+        self.dropped = 0
+
+    def log(self, attack_id, prompt, meta=None, error=False):
+        if not error and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.dropped += 1
+            return
+        record = logging.LogRecord("model_calls", logging.INFO, "", 0, "", None, None)
+        # callers keep using their meta dict (e.g. runner.defense_ab tags it), so
+        # the listener thread formats a copy taken now
+        record.entry = (attack_id, prompt, dict(meta) if meta else {})
+        self._queue.put_nowait(record)
+
+    def flush(self):
+        """Block until every queued entry has been written."""
+        self._queue.join()
+        self.handler.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._listener.stop()
+        self.handler.close()
+
+
+_LOGGERS = {}
+_LOGGERS_LOCK = threading.Lock()
+
+
+def get_call_logger(path, **options):
+    """
+    Return the shared CallLogger for `path`, creating it on first use.
+
+    One logger (and one writer thread) per file, so every ModelClient writing
+    to the same log shares rotation state. `options` only apply on creation.
+    """
+    key = os.path.abspath(path)
+    with _LOGGERS_LOCK:
+        logger = _LOGGERS.get(key)
+        if logger is None or logger._closed:
+            logger = CallLogger(path, **options)
+            _LOGGERS[key] = logger
+            atexit.register(logger.close)
+        return logger
+
+
+def call_log_segments(path):
+    """Return the log's segments, oldest first, ending with the active file."""
+    pattern = re.compile(re.escape(os.path.basename(path)) + r"\.(\d+)(?:\.gz|\.zst)?$")
+    rotated = []
+    for name in glob.glob(glob.escape(path) + ".*"):
+        m = pattern.match(os.path.basename(name))
+        if m:
+            rotated.append((int(m.group(1)), name))
+    segments = [name for _, name in sorted(rotated, reverse=True)]
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+
+def iter_call_log(path):
+    """Stream entries across rotated (compressed) segments and the active file."""
+    for segment in call_log_segments(path):
+        with _open_segment(segment) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
@@ -0,0 +1,92 @@
+# models/canonical.py
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from attacks.perturbations import SYN_DICT, INJECT_CHARS
+
+_INJECTED_RE = re.compile("[" + re.escape("".join(INJECT_CHARS)) + "]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _compile_back_map(syn_dict):
+    back = {}
+    for key, vals in syn_dict.items():
+        for v in vals:
+            back.setdefault(v, key)
+    words = sorted(back, key=len, reverse=True)
+    # whole words only: "give" must not match inside "forgive"
+    return back, re.compile(r"\b(?:" + "|".join(re.escape(w) for w in words) + r")\b")
+
+
+_BACK_MAP, _BACK_RE = _compile_back_map(SYN_DICT)
+
+
+def canonicalize(prompt):
+    """
+    Map a prompt to the form shared by all its perturbed variants.
+
+    Undoes the operators in attacks.perturbations that cannot change the
+    meaning: injected `#@%` characters are stripped, runs of whitespace are
+    collapsed to one space and whole-word synonyms are mapped back to their
+    SYN_DICT key. Spaces inserted inside words are kept, since removing all
+    whitespace would merge distinct prompts ("the rapist" and "therapist").
+    """
+    text = _SPACE_RE.sub(" ", _INJECTED_RE.sub("", prompt or "")).strip()
+    return _BACK_RE.sub(lambda m: _BACK_MAP[m.group(0)], text)
+
+
+class CanonicalResponseCache:
+    """
+    Shared in-flight/complete table of responses keyed by canonical prompt.
+
+    The first caller for a key runs the provider call; concurrent and later
+    callers with the same key wait on and reuse its result. Failed calls are
+    evicted so a retry goes back to the provider. At most `max_entries` keys
+    are kept; the least recently used are dropped first.
+    """
+
+    def __init__(self, max_entries=4096):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_call(self, key, fn):
+        """
+        Return (value, hit) for `key`, calling `fn()` only if nobody has yet.
+        """
+        with self._lock:
+            fut = self._entries.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._entries[key] = fut
+                self.misses += 1
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if not owner:
+            return fut.result(), True
+        try:
+            value = fn()
+        except BaseException as e:
+            self.discard(key, fut)
+            fut.set_exception(e)
+            raise
+        fut.set_result(value)
+        return value, False
+
+    def discard(self, key, fut=None):
+        """Drop `key` (only if it still holds `fut`, when given) so the next caller calls again."""
+        with self._lock:
+            if fut is None or self._entries.get(key) is fut:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -1,39 +1,66 @@
 # models/client.py
+import copy
 import time
-import json
 import os
-from datetime import datetime
+import re
+
+from models.budget import estimate_tokens, usage_from_response
+from models.calllog import get_call_logger
+from runner.profiling import PROFILER
+
+
+def _openai_chat(**kwargs):
+    # provider SDKs take seconds to import, so only load the one that is used
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(**kwargs)
+
+
+def _gemini_chat(**kwargs):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(**kwargs)
 
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 class ModelClient:
-    def __init__(self, provider="mock", api_key=None, sanitize=False):
+    def __init__(self, provider="mock", api_key=None, sanitize=False, canonical_cache=None, call_log=None,
+                 budget=None, max_tokens=200):
         self.provider = provider
         self.api_key = api_key
+        # default completion limit; a budget may lower it per call
+        self.max_tokens = max_tokens
+        # budget: a models.budget.BudgetLedger charged for every provider call
+        self.budget = budget
+        # sanitize: True for the built-in phrase replacement, or a
+        # models.sanitizers.SanitizerPipeline (or defense name) run on every prompt
+        if isinstance(sanitize, str):
+            from models.sanitizers import build_pipeline
+            sanitize = build_pipeline(sanitize)
         self.sanitize = sanitize
+        # canonical_cache: True for a private table, or a CanonicalResponseCache
+        # shared between clients; canonically-equal prompts reuse one response
+        if canonical_cache is True:
+            from models.canonical import CanonicalResponseCache
+            canonical_cache = CanonicalResponseCache()
+        elif canonical_cache is False:
+            canonical_cache = None
+        self.canonical_cache = canonical_cache
         os.makedirs("data", exist_ok=True)
         self.log_path = os.path.join("data", "model_calls.log")
+        # call_log: a CallLogger; defaults to the shared rotating log at log_path
+        self.call_log = call_log or get_call_logger(self.log_path)
 
-    def _log(self, attack_id, prompt, meta=None):
-        entry = {
-            "ts": datetime.utcnow().isoformat()+"Z",
-            "attack_id": attack_id,
-            "prompt_trunc": prompt[:400],
-            "meta": meta or {}
-        }
-        with open(self.log_path, "a", encoding="utf8") as f:
-            f.write(json.dumps(entry) + "\n")
+    def _log(self, attack_id, prompt, meta=None, error=False):
+        # queued; formatting and disk writes happen on the logger's thread
+        self.call_log.log(attack_id, prompt, meta, error=error)
 
     def _get_llm(self, temperature, max_tokens):
         models = {
-            "openai": lambda: ChatOpenAI(
+            "openai": lambda: _openai_chat(
                 model="gpt-4o-mini",
                 temperature=1.0,
                 max_tokens=max_tokens,
                 api_key=self.api_key
             ),
-            "gemini": lambda: ChatGoogleGenerativeAI(
+            "gemini": lambda: _gemini_chat(
                 model='gemini-2.5-flash',
                 temperature=temperature,
                 max_tokens=max_tokens,
@@ -44,34 +71,237 @@ class ModelClient:
         model = models.get(self.provider)
         if not model:
             raise ValueError(f"Unkown or unsupported provider: {self.provider}")
-        return model
+        return model()
+
+    def with_sanitizer(self, sanitize):
+        """Copy of this client (sharing its log and caches) with another input defense."""
+        clone = copy.copy(self)
+        if isinstance(sanitize, str):
+            from models.sanitizers import build_pipeline
+            sanitize = build_pipeline(sanitize)
+        clone.sanitize = sanitize
+        return clone
 
     def sanitize_input(self, prompt):
         if not self.sanitize:
             return prompt, {}
+        if self.sanitize is not True:
+            replaced, smeta = self.sanitize.sanitize(prompt)
+            return replaced, {"sanitized": smeta["changed"], "sanitizer": smeta}
         # simple sanitization: remove 'ignore previous' phrases
         replaced = prompt.replace("Ignore previous instructions", "[sanitized]")
         meta = {"sanitized": True}
         return replaced, meta
 
-    def query(self, attack_id, prompt, max_tokens=200, temperature=1.0, **kwargs):
+    def _blocked(self, attack_id, prompt, smeta):
+        # a defense refused the prompt: nothing is sent to the provider
+        meta = {"blocked": True, **smeta}
+        self._log(attack_id, prompt, meta)
+        from models.sanitizers import BLOCKED_RESPONSE
+        return {"text": BLOCKED_RESPONSE, "meta": meta}
+
+    def _reserve(self, prompt, max_tokens):
+        if self.budget is None:
+            return None, max_tokens, None
+        return self.budget.reserve(self.provider, prompt, max_tokens)
+
+    def _release(self, rid):
+        if rid is not None:
+            self.budget.release(rid)
+
+    def _settle(self, rid, attack_id, meta, prompt_tokens, max_tokens, text, response=None):
+        # usage as reported by the provider, else (only when budgeted) estimated from the text
+        usage = usage_from_response(response)
+        estimated = usage is None
+        if estimated:
+            if self.budget is None:
+                return
+            usage = (prompt_tokens, estimate_tokens(text, self.provider))
+        meta["usage"] = {"prompt_tokens": usage[0], "completion_tokens": usage[1], "estimated": estimated}
+        if self.budget is not None:
+            cost = self.budget.settle(rid, self.provider, attack_id, *usage)
+            meta["usage"].update({"max_tokens": max_tokens, "cost": round(cost, 8)})
+
+    @staticmethod
+    def _with_sanitizer_meta(res, smeta):
+        if not smeta:
+            return res
+        return {"text": res["text"], "meta": {**res["meta"], **smeta}}
+
+    @PROFILER.timed("model_query")
+    def query(self, attack_id, prompt, max_tokens=None, temperature=1.0, **kwargs):
+        max_tokens = max_tokens or self.max_tokens
         if self.sanitize:
             prompt, smeta = self.sanitize_input(prompt)
+            if smeta.get("sanitizer", {}).get("blocked"):
+                return self._blocked(attack_id, prompt, smeta)
         else:
             smeta = {}
+        if self.canonical_cache is None:
+            return self._with_sanitizer_meta(self._query_provider(attack_id, prompt, max_tokens, temperature), smeta)
+
+        from models.canonical import canonicalize
+        # the completion limit and temperature change the response, so they are part of the key
+        key = (canonicalize(prompt), max_tokens, temperature)
+        (source_id, res), hit = self.canonical_cache.get_or_call(
+            key,
+            lambda: (attack_id, self._query_provider(attack_id, prompt, max_tokens, temperature))
+        )
+        if not hit:
+            if res["meta"].get("usage", {}).get("max_tokens", max_tokens) < max_tokens:
+                # a budget-throttled (possibly cut short) response must not answer full-length requests
+                self.canonical_cache.discard(key)
+            return self._with_sanitizer_meta(res, smeta)
+        meta = {**res["meta"], "canonical_hit": True, "canonical_source": source_id}
+        self._log(attack_id, prompt, meta)
+        return self._with_sanitizer_meta({"text": res["text"], "meta": meta}, smeta)
+
+    @PROFILER.timed("provider_call")
+    def _query_provider(self, attack_id, prompt, max_tokens, temperature):
         if self.provider == "mock":
             from models.mock import mock_response_for_attack
+            rid, max_tokens, prompt_tokens = self._reserve(prompt, max_tokens)
             resp = mock_response_for_attack(attack_id, prompt)
             meta = {"mock": True}
+            self._settle(rid, attack_id, meta, prompt_tokens, max_tokens, resp)
             self._log(attack_id, prompt, meta)
             return {"text": resp, "meta": meta}
     
         if not self.api_key:
             raise RuntimeError(f"{self.provider} provider requested but no API key provided")
 
+        rid, max_tokens, prompt_tokens = self._reserve(prompt, max_tokens)
         llm = self._get_llm(temperature=temperature, max_tokens=max_tokens)
-        response = llm.invoke(prompt)
+        try:
+            response = llm.invoke(prompt)
+        except Exception as e:
+            self._release(rid)
+            self._log(attack_id, prompt, {"mock": False, "provider": self.provider, "error": str(e)}, error=True)
+            raise
         text = response.content
         meta = {"mock": False, "provider": self.provider}
+        self._settle(rid, attack_id, meta, prompt_tokens, max_tokens, text, response)
+        self._log(attack_id, prompt, meta)
+        return {"text": text, "meta": meta}
+
+    @PROFILER.timed("model_query")
+    def query_conversation(self, attack_id, messages, max_tokens=None, temperature=1.0, **kwargs):
+        """
+        Send a multi-turn conversation and return the reply to its last turn.
+
+        Args:
+            messages: Conversation so far as {"role": "user"|"assistant",
+                      "content"} dicts, ending with the user turn to answer
+
+        Returns:
+            dict: {"text", "meta"}; meta records the `turn` number answered
+        """
+        max_tokens = max_tokens or self.max_tokens
+        smeta = {}
+        if self.sanitize:
+            sanitized = []
+            for m in messages:
+                if m["role"] == "user":
+                    content, smeta = self.sanitize_input(m["content"])
+                    m = {**m, "content": content}
+                sanitized.append(m)
+            messages = sanitized
+        prompt = messages[-1]["content"]
+        turn = sum(1 for m in messages if m["role"] == "user")
+        # smeta is that of the last user turn, the one being answered
+        if smeta.get("sanitizer", {}).get("blocked"):
+            return self._blocked(attack_id, prompt, {"turn": turn, **smeta})
+        # the whole history is sent, so all of it is charged
+        sent = "\n".join(m["content"] for m in messages)
+        if self.provider == "mock":
+            from models.mock import mock_response_for_conversation
+            rid, max_tokens, prompt_tokens = self._reserve(sent, max_tokens)
+            with PROFILER.timer("provider_call"):
+                resp = mock_response_for_conversation(attack_id, messages)
+            meta = {"mock": True, "turn": turn}
+            self._settle(rid, attack_id, meta, prompt_tokens, max_tokens, resp)
+            self._log(attack_id, prompt, meta)
+            return self._with_sanitizer_meta({"text": resp, "meta": meta}, smeta)
+
+        if not self.api_key:
+            raise RuntimeError(f"{self.provider} provider requested but no API key provided")
+
+        rid, max_tokens, prompt_tokens = self._reserve(sent, max_tokens)
+        llm = self._get_llm(temperature=temperature, max_tokens=max_tokens)
+        meta = {"mock": False, "provider": self.provider, "turn": turn}
+        try:
+            with PROFILER.timer("provider_call"):
+                response = llm.invoke([(m["role"], m["content"]) for m in messages])
+        except Exception as e:
+            self._release(rid)
+            self._log(attack_id, prompt, {**meta, "error": str(e)}, error=True)
+            raise
+        self._settle(rid, attack_id, meta, prompt_tokens, max_tokens, response.content, response)
+        self._log(attack_id, prompt, meta)
+        return self._with_sanitizer_meta({"text": response.content, "meta": meta}, smeta)
+
+    def query_stream(self, attack_id, prompt, max_tokens=None, temperature=1.0, stop_when=None, **kwargs):
+        """
+        Stream a completion chunk by chunk, optionally stopping early.
+
+        Args:
+            stop_when: Callable receiving each text chunk; returning True stops
+                       generation and returns the partial response
+
+        Returns:
+            dict: {"text", "meta"} where meta records `stream`, `chunks` and
+            whether generation was `stopped_early`
+        """
+        max_tokens = max_tokens or self.max_tokens
+        smeta = {}
+        if self.sanitize:
+            prompt, smeta = self.sanitize_input(prompt)
+            if smeta.get("sanitizer", {}).get("blocked"):
+                return self._blocked(attack_id, prompt, smeta)
+        # the chunk carrying the provider's usage, when it reports one
+        usage_chunk = []
+        if self.provider == "mock":
+            from models.mock import mock_response_for_attack
+            rid, max_tokens, prompt_tokens = self._reserve(prompt, max_tokens)
+            source = None
+            chunks = iter(re.findall(r"\S+\s*|\s+", mock_response_for_attack(attack_id, prompt)))
+            meta = {"mock": True}
+        else:
+            if not self.api_key:
+                raise RuntimeError(f"{self.provider} provider requested but no API key provided")
+            rid, max_tokens, prompt_tokens = self._reserve(prompt, max_tokens)
+            llm = self._get_llm(temperature=temperature, max_tokens=max_tokens)
+            source = llm.stream(prompt)
+
+            def read(source):
+                for c in source:
+                    if getattr(c, "usage_metadata", None):
+                        usage_chunk[:] = [c]
+                    yield c.content
+
+            chunks = read(source)
+            meta = {"mock": False, "provider": self.provider}
+
+        parts = []
+        stopped = False
+        try:
+            for piece in chunks:
+                if not piece:
+                    continue
+                parts.append(piece)
+                if stop_when is not None and stop_when(piece):
+                    stopped = True
+                    break
+        except Exception as e:
+            self._release(rid)
+            self._log(attack_id, prompt, {**meta, "stream": True, "error": str(e)}, error=True)
+            raise
+        finally:
+            # closing the stream stops generation on the provider side
+            if source is not None and hasattr(source, "close"):
+                source.close()
+        meta.update({"stream": True, "chunks": len(parts), "stopped_early": stopped})
+        self._settle(rid, attack_id, meta, prompt_tokens, max_tokens, "".join(parts),
+                     usage_chunk[0] if usage_chunk else None)
         self._log(attack_id, prompt, meta)
-        return {"text": text, "meta": meta}
\ No newline at end of file
+        return self._with_sanitizer_meta({"text": "".join(parts), "meta": meta}, smeta)
@@ -0,0 +1,161 @@
+# runner/adaptive.py
+import json
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from eval.metrics import wilson_interval
+from eval.scorer import AttackScorer
+
+
+def _tags(attack):
+    return attack.get("tags") or ["untagged"]
+
+
+class AdaptiveSampler:
+    """
+    Estimate per-tag vulnerability rates without running every attack.
+
+    Attacks are issued in a randomized order, round-robin over tags, and
+    scored as they complete. Each tag keeps a Wilson interval of its rate; once
+    the interval is narrower than `target_width` the tag stops issuing
+    requests. As in MetricsComputer.compute_success_rate_per_tag, an attack
+    counts toward every one of its tags, and it is only issued while at least
+    one of them is still open.
+
+    Args:
+        target_width: Stop a tag once its interval width (high - low) is at or below this
+        confidence: Confidence level of the intervals
+        min_samples: Never stop a tag before this many of its attacks were scored
+        seed: Seed for the randomized order
+    """
+
+    def __init__(self, target_width=0.1, confidence=0.95, min_samples=10, seed=0):
+        if not 0 < target_width < 1:
+            raise ValueError("target_width must be in (0, 1)")
+        self.target_width = target_width
+        self.confidence = confidence
+        self.min_samples = min_samples
+        self.seed = seed
+        self.stats = {}  # tag -> [scored, vulnerable]
+        self.available = {}
+        self.total_attacks = 0
+        self.api_calls = 0
+
+    def interval(self, tag):
+        scored, vulnerable = self.stats[tag]
+        return wilson_interval(vulnerable, scored, self.confidence)
+
+    def is_open(self, tag):
+        scored, _ = self.stats[tag]
+        if scored < self.min_samples:
+            return True
+        low, high = self.interval(tag)
+        return high - low > self.target_width
+
+    def _schedule(self, attacks):
+        """Yield attacks round-robin over the tags that are still open."""
+        rng = random.Random(self.seed)
+        queues = {}
+        for attack in attacks:
+            for tag in _tags(attack):
+                queues.setdefault(tag, []).append(attack)
+        for q in queues.values():
+            rng.shuffle(q)
+        issued = set()
+        while queues:
+            for tag in list(queues):
+                q = queues[tag]
+                while q and id(q[-1]) in issued:
+                    q.pop()
+                if not q or not self.is_open(tag):
+                    del queues[tag]
+                    continue
+                attack = q.pop()
+                issued.add(id(attack))
+                yield attack
+
+    def _record(self, attack, score):
+        for tag in _tags(attack):
+            self.stats[tag][0] += 1
+            self.stats[tag][1] += int(bool(score.get("vulnerable")))
+
+    def run(self, attacks, model_client, out_path, max_workers=4, hedger=None, conversations=None):
+        """
+        Run attacks until every tag converged or ran out of attacks.
+
+        Only `max_workers` requests are in flight at a time, so a tag overshoots
+        its stopping point by at most that many attacks.
+
+        Returns:
+            List of result items for the attacks that were actually issued
+        """
+        from runner.runner import run_attack
+
+        scorer = AttackScorer(out_path)
+        self.stats = {}
+        self.available = {}
+        self.total_attacks = len(attacks)
+        self.api_calls = 0
+        for attack in attacks:
+            for tag in _tags(attack):
+                self.stats.setdefault(tag, [0, 0])
+                self.available[tag] = self.available.get(tag, 0) + 1
+
+        schedule = self._schedule(attacks)
+        results = []
+        pending = {}
+        exhausted = False
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            while True:
+                while not exhausted and len(pending) < max_workers:
+                    attack = next(schedule, None)
+                    if attack is None:
+                        exhausted = True
+                        break
+                    pending[ex.submit(run_attack, attack, model_client, out_path, hedger, conversations)] = attack
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    attack = pending.pop(fut)
+                    self.api_calls += 1
+                    try:
+                        item = fut.result()
+                    except Exception as e:
+                        print("Error in worker:", e)
+                        continue
+                    results.append(item)
+                    # failed calls say nothing about the rate
+                    if not item.get("error"):
+                        self._record(attack, scorer.score_record(item))
+        return results
+
+    def report(self):
+        tags = {}
+        for tag, (scored, vulnerable) in sorted(self.stats.items()):
+            low, high = self.interval(tag)
+            tags[tag] = {
+                "available": self.available[tag],
+                "sampled": scored,
+                "vulnerable": vulnerable,
+                "success_rate": round(vulnerable / scored, 3) if scored else 0.0,
+                "confidence_interval": [round(low, 3), round(high, 3)],
+                "interval_width": round(high - low, 3),
+                "converged": not self.is_open(tag),
+            }
+        return {
+            "target_width": self.target_width,
+            "confidence": self.confidence,
+            "min_samples": self.min_samples,
+            "total_attacks": self.total_attacks,
+            "api_calls": self.api_calls,
+            "api_calls_saved": self.total_attacks - self.api_calls,
+            "tags": tags,
+        }
+
+    def save_report(self, path="data/adaptive_sampling.json"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
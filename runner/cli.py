@@ -1,8 +1,13 @@
 # runner/cli.py
 import argparse
 import json
+from models.budget import BudgetLedger
 from models.client import ModelClient
+from models.calllog import get_call_logger
+from runner.conversation import ConversationTree
 from runner.runner import load_attacks, run_all
+from runner.hedging import Hedger
+from runner.profiling import add_profile_argument, profiling
 
 def main():
     p = argparse.ArgumentParser()
@@ -10,13 +15,170 @@ def main():
     p.add_argument("--attacks-file", default="data/sample_attack_cases.json")
     p.add_argument("--workers", type=int, default=4)
     p.add_argument("--api-key", default=None)
+    p.add_argument("--hedge", action="store_true",
+                   help="fire a duplicate request when a query is slower than --hedge-percentile")
+    p.add_argument("--hedge-percentile", type=float, default=95.0)
+    p.add_argument("--hedge-max-extra", type=float, default=0.1,
+                   help="cap on hedged requests as a fraction of all requests")
+    p.add_argument("--canonical-cache", action="store_true",
+                   help="answer canonically-equal prompts (obfuscated/paraphrased variants) from one provider call")
+    p.add_argument("--stream", action="store_true",
+                   help="stream responses and stop generation once a critical verdict is reached")
+    p.add_argument("--columnar-out", default=None,
+                   help="also write the results in the columnar format (e.g. data/results.rtcol)")
+    p.add_argument("--log-sample-rate", type=float, default=1.0,
+                   help="fraction of successful calls written to data/model_calls.log (errors always logged)")
+    p.add_argument("--log-max-mb", type=float, default=50.0,
+                   help="rotate data/model_calls.log at this size")
+    p.add_argument("--log-rotate-hours", type=float, default=None,
+                   help="also rotate data/model_calls.log after this many hours")
+    p.add_argument("--log-compression", default="gzip", choices=["gzip", "zstd", "none"])
+    p.add_argument("--adaptive", action="store_true",
+                   help="sample attacks per tag until each tag's success rate is known to --ci-width")
+    p.add_argument("--ci-width", type=float, default=0.1,
+                   help="stop a tag once its confidence interval is at most this wide")
+    p.add_argument("--confidence", type=float, default=0.95)
+    p.add_argument("--adaptive-min-samples", type=int, default=10)
+    p.add_argument("--adaptive-report", default="data/adaptive_sampling.json")
+    p.add_argument("--prioritize", action="store_true",
+                   help="issue attacks by severity, tag weight and historical hit rate, most valuable first")
+    p.add_argument("--deadline-s", type=float, default=None,
+                   help="hard time limit for the run in seconds (implies --prioritize)")
+    p.add_argument("--max-spend", type=float, default=None,
+                   help="budget in cost units, see --cost-per-call (implies --prioritize)")
+    p.add_argument("--cost-per-call", type=float, default=1.0)
+    p.add_argument("--cost-per-1k-chars", type=float, default=0.0,
+                   help="additional cost per 1000 prompt characters")
+    p.add_argument("--tag-weight", action="append", default=[], metavar="TAG=WEIGHT",
+                   help="priority weight of a tag (repeatable, default 1.0)")
+    p.add_argument("--history", action="append", default=[], metavar="REPORT",
+                   help="previous score report used for historical hit rates (repeatable)")
+    p.add_argument("--schedule-report", default="data/schedule_report.json")
+    p.add_argument("--defense", action="append", default=[], metavar="NAME",
+                   help="also run every attack behind this input defense (repeatable); a name from "
+                        "models.sanitizers.DEFENSES or stages joined by '+'")
+    p.add_argument("--defense-report", default="data/defense_ab.json")
+    p.add_argument("--max-tokens", type=int, default=200, help="completion token limit per call")
+    p.add_argument("--max-cost", type=float, default=None,
+                   help="halt the run once this much USD (models.budget.PRICES) is spent")
+    p.add_argument("--provider-cap", action="append", default=[], metavar="PROVIDER=USD",
+                   help="cost cap for one provider (repeatable)")
+    p.add_argument("--max-total-tokens", type=int, default=None,
+                   help="halt the run once this many prompt + completion tokens are used")
+    p.add_argument("--budget-ledger", default=None,
+                   help="journal file that shares the budget with other runs using the same file")
+    p.add_argument("--budget-report", default=None,
+                   help="write token/cost accounting here (default data/budget.json when a cap is set); "
+                        "pass it to eval.metrics --budget-report")
+    add_profile_argument(p)
     args = p.parse_args()
+    prioritize = args.prioritize or args.deadline_s is not None or args.max_spend is not None
+    if prioritize and args.adaptive:
+        p.error("--adaptive cannot be combined with --prioritize/--deadline-s/--max-spend")
+    if args.defense and (args.adaptive or prioritize):
+        p.error("--defense cannot be combined with --adaptive or --prioritize/--deadline-s/--max-spend")
+    defense_ab = None
+    if args.defense:
+        from runner.defense_ab import DefenseAB
+        try:
+            defense_ab = DefenseAB(args.defense)
+        except ValueError as e:
+            p.error(str(e))
+    tag_weights = {}
+    for spec in args.tag_weight:
+        tag, sep, weight = spec.partition("=")
+        try:
+            tag_weights[tag] = float(weight)
+        except ValueError:
+            sep = ""
+        if not sep or not tag:
+            p.error(f"--tag-weight expects TAG=WEIGHT, got {spec!r}")
+    provider_caps = {}
+    for spec in args.provider_cap:
+        provider, sep, cap = spec.partition("=")
+        try:
+            provider_caps[provider] = float(cap)
+        except ValueError:
+            sep = ""
+        if not sep or not provider:
+            p.error(f"--provider-cap expects PROVIDER=USD, got {spec!r}")
+    budget = None
+    if (args.max_cost is not None or provider_caps or args.max_total_tokens is not None
+            or args.budget_ledger or args.budget_report):
+        budget = BudgetLedger(max_cost=args.max_cost, provider_caps=provider_caps,
+                              max_total_tokens=args.max_total_tokens, path=args.budget_ledger)
+        if budget.capped and (args.adaptive or prioritize or args.defense):
+            # only the plain runner stops submitting when the budget runs out
+            p.error("--max-cost/--provider-cap/--max-total-tokens cannot be combined with "
+                    "--adaptive, --prioritize/--deadline-s/--max-spend or --defense")
 
     attacks = load_attacks(args.attacks_file)
-    client = ModelClient(provider=args.model, api_key=args.api_key, sanitize=False)
+    call_log = get_call_logger(
+        "data/model_calls.log",
+        max_bytes=int(args.log_max_mb * 1024 * 1024),
+        rotate_interval_s=args.log_rotate_hours * 3600 if args.log_rotate_hours else None,
+        compression=None if args.log_compression == "none" else args.log_compression,
+        sample_rate=args.log_sample_rate,
+    )
+    client = ModelClient(provider=args.model, api_key=args.api_key, sanitize=False,
+                         canonical_cache=args.canonical_cache, call_log=call_log,
+                         budget=budget, max_tokens=args.max_tokens)
     print(f"Running {len(attacks)} attacks with model={args.model} workers={args.workers}")
-    run_all(attacks, client, out_path="data/results.jsonl", max_workers=args.workers)
+    hedger = None
+    if args.hedge:
+        hedger = Hedger(percentile=args.hedge_percentile, max_extra_ratio=args.hedge_max_extra,
+                        max_workers=2 * args.workers)
+    adaptive = None
+    if args.adaptive:
+        from runner.adaptive import AdaptiveSampler
+        adaptive = AdaptiveSampler(target_width=args.ci_width, confidence=args.confidence,
+                                   min_samples=args.adaptive_min_samples)
+    scheduler = None
+    if prioritize:
+        from runner.scheduler import PriorityScheduler, load_history
+        scheduler = PriorityScheduler(tag_weights=tag_weights,
+                                      history=load_history(args.history) if args.history else None,
+                                      deadline_s=args.deadline_s, max_spend=args.max_spend,
+                                      cost_per_call=args.cost_per_call, cost_per_1k_chars=args.cost_per_1k_chars)
+    conversations = ConversationTree()
+    with profiling(args.profile):
+        try:
+            run_all(attacks, client, out_path="data/results.jsonl", max_workers=args.workers, hedger=hedger,
+                    stream=args.stream, adaptive=adaptive, scheduler=scheduler, conversations=conversations,
+                    defense_ab=defense_ab, budget=budget)
+        finally:
+            if hedger is not None:
+                hedger.shutdown()
     print("Done. results -> data/results.jsonl")
+    if args.columnar_out:
+        from eval.columnar import json_to_columnar
+        print(f"Columnar results -> {json_to_columnar('data/results.jsonl', args.columnar_out)}")
+    if conversations.conversations:
+        print("Conversation summary:", json.dumps(conversations.summary()))
+    if hedger is not None:
+        print("Hedging summary:", json.dumps(hedger.summary()))
+    if adaptive is not None:
+        report_path = adaptive.save_report(args.adaptive_report)
+        print(f"Adaptive sampling: {adaptive.api_calls}/{adaptive.total_attacks} attacks issued "
+              f"-> {report_path} (pass it to eval.metrics --adaptive-report)")
+    if scheduler is not None:
+        report = scheduler.report()
+        report_path = scheduler.save_report(args.schedule_report)
+        print(f"Prioritized run ({report['stop_reason']}): {report['completed']}/{report['total_attacks']} attacks, "
+              f"{report['value_fraction']:.0%} of total value, spent {report['spent']} -> {report_path}")
+    if defense_ab is not None:
+        report_path = defense_ab.save_report(args.defense_report)
+        for name, arm in defense_ab.report()["arms"].items():
+            print(f"Defense {name}: vulnerable {arm['vulnerable']}/{arm['results'] - arm['errors']}, "
+                  f"blocked {arm['blocked']}" + (f", fixed {arm['fixed']}, regressed {arm['regressed']}"
+                                                 if "fixed" in arm else ""))
+        print(f"Defense A/B report -> {report_path}")
+    if budget is not None:
+        report_path = budget.save_report(args.budget_report or "data/budget.json")
+        report = budget.report()
+        print(f"Budget: ${report['cost']:.6f} over {report['calls']} calls, {report['tokens']} tokens; "
+              f"{report['rejected_calls']} calls rejected, {report['skipped_attacks']} attacks skipped "
+              f"-> {report_path} (pass it to eval.metrics --budget-report)")
 
 if __name__ == "__main__":
     main()
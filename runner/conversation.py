@@ -0,0 +1,134 @@
+# runner/conversation.py
+import threading
+import time
+from concurrent.futures import Future
+
+
+class ConversationError(Exception):
+    """
+    A turn of one attack's conversation failed.
+
+    Raised from the turn's error (`__cause__`), which may be shared with other
+    attacks waiting on the same node; `turns` holds this attack's completed turns.
+    """
+
+    def __init__(self, cause, turns):
+        super().__init__(str(cause))
+        self.turns = turns
+
+
+class _TurnQuery:
+    """Adapter whose `query` sends one user turn on top of a fixed history."""
+
+    def __init__(self, model_client, history):
+        self.model_client = model_client
+        self.history = history
+
+    def query(self, attack_id, prompt):
+        messages = self.history + [{"role": "user", "content": prompt}]
+        return self.model_client.query_conversation(attack_id, messages)
+
+
+class ConversationTree:
+    """
+    Prefix tree of conversation histories shared by all attacks of a run.
+
+    A node is a sequence of user turns; its value is the model's reply to the
+    last of them given the replies of its ancestors. Conversation attacks that
+    open with the same turns walk the same nodes, so each shared prefix is sent
+    to the model once and later (or concurrent) attacks reuse its replies and
+    only pay for the turns where they branch off. Failed turns are evicted so
+    a later attack retries them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes = {}
+        self.conversations = 0
+        self.turns_requested = 0
+        self.turns_executed = 0
+        # characters of history + turn sent to the model, and what re-sending
+        # every conversation from scratch would have sent
+        self.chars_sent = 0
+        self.chars_unshared = 0
+
+    def _get_or_run(self, key, fn):
+        with self._lock:
+            fut = self._nodes.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._nodes[key] = fut
+        if not owner:
+            return fut.result(), True
+        try:
+            value = fn()
+        except BaseException as e:
+            with self._lock:
+                self._nodes.pop(key, None)
+            fut.set_exception(e)
+            raise
+        fut.set_result(value)
+        return value, False
+
+    def run(self, model_client, attack_id, turns, hedger=None):
+        """
+        Play `turns` (user messages) against the model, reusing shared prefixes.
+
+        Returns:
+            List of per-turn dicts: prompt, response, model_meta, latency_s
+            (of the call that produced the reply) and `shared` (True when the
+            reply was reused from another attack's conversation)
+
+        Raises:
+            ConversationError from the first failed turn's error; its `turns`
+            holds the turns completed before it
+        """
+        from runner.runner import safe_query
+
+        history = []
+        played = []
+        for i, prompt in enumerate(turns):
+            sent = sum(len(m["content"]) for m in history) + len(prompt)
+
+            def call(history=list(history), prompt=prompt, sent=sent):
+                start = time.monotonic()
+                res = safe_query(_TurnQuery(model_client, history), attack_id, prompt, hedger=hedger)
+                with self._lock:
+                    self.turns_executed += 1
+                    self.chars_sent += sent
+                return {
+                    "response": res["text"],
+                    "model_meta": res.get("meta", {}),
+                    "latency_s": round(time.monotonic() - start, 4),
+                }
+
+            try:
+                node, shared = self._get_or_run(tuple(turns[:i + 1]), call)
+            except Exception as e:
+                # e may be the shared node's error, so the turns go on a per-attack wrapper
+                raise ConversationError(e, played) from e
+            with self._lock:
+                self.turns_requested += 1
+                self.chars_unshared += sent
+            played.append({"prompt": prompt, **node, "shared": shared})
+            history = history + [{"role": "user", "content": prompt},
+                                 {"role": "assistant", "content": node["response"]}]
+        with self._lock:
+            self.conversations += 1
+        return played
+
+    def __len__(self):
+        with self._lock:
+            return len(self._nodes)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "conversations": self.conversations,
+                "turns_requested": self.turns_requested,
+                "turns_executed": self.turns_executed,
+                "turns_shared": self.turns_requested - self.turns_executed,
+                "chars_sent": self.chars_sent,
+                "chars_unshared": self.chars_unshared,
+            }
@@ -0,0 +1,160 @@
+# runner/defense_ab.py
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from eval.scorer import AttackScorer
+from models.sanitizers import build_pipeline
+from runner.conversation import ConversationTree
+
+BASELINE = "none"
+
+
+def arm_path(out_path, name):
+    """Results file of a defense arm next to the baseline's, e.g. results.defense-strip.jsonl."""
+    if out_path is None or name == BASELINE:
+        return out_path
+    root, ext = os.path.splitext(out_path)
+    return f"{root}.defense-{name}{ext}"
+
+
+def _prompts(attacks):
+    out = []
+    for attack in attacks:
+        if attack.get("turns"):
+            out.extend(attack["turns"])
+        elif attack.get("prompt") is not None:
+            out.append(attack["prompt"])
+    return out
+
+
+class DefenseAB:
+    """
+    Run one attack set with and without each input defense in a single pass.
+
+    Every attack is issued once per arm: the undefended baseline ("none") and
+    one arm per defense (a name from models.sanitizers.DEFENSES or a
+    "stage+stage" spec). All (attack, arm) pairs share one worker pool, and
+    each defense sanitizes the whole attack set in one batch before dispatch,
+    so per-call sanitization is a cache lookup. The baseline writes to
+    `out_path` and every defense arm to its own file (`arm_path`), so each
+    file holds one result per attack_id like a plain run; results also carry
+    the arm in `model_meta.defense`. They are scored as they complete to
+    compare vulnerable rates, blocks and flips against the baseline.
+
+    Args:
+        defenses: Defense names or SanitizerPipeline objects
+    """
+
+    def __init__(self, defenses):
+        self.pipelines = {}
+        for d in defenses:
+            pipeline = build_pipeline(d) if isinstance(d, str) else d
+            if pipeline.name == BASELINE:
+                raise ValueError(f"{BASELINE!r} is the undefended baseline, not a defense")
+            self.pipelines[pipeline.name] = pipeline
+        if not self.pipelines:
+            raise ValueError("at least one defense is required")
+        self.arms = {}
+        self.verdicts = {}
+        self.total_attacks = 0
+
+    def run(self, attacks, model_client, out_path, max_workers=4, hedger=None, conversations=None):
+        """
+        Issue every attack against every arm.
+
+        Returns:
+            List of result items for all arms
+        """
+        from runner.runner import run_attack, save_result_atomic
+
+        scorer = AttackScorer(out_path)
+        self.total_attacks = len(attacks)
+        self.verdicts = {}
+        self.arms = {BASELINE: {"client": model_client, "prime_s": 0.0,
+                                "conversations": conversations if conversations is not None else ConversationTree()}}
+        prompts = _prompts(attacks)
+        for name, pipeline in self.pipelines.items():
+            start = time.perf_counter()
+            pipeline.prime(prompts)
+            # conversation prefixes are keyed by raw turns, so each arm needs its own tree
+            self.arms[name] = {"client": model_client.with_sanitizer(pipeline), "conversations": ConversationTree(),
+                               "prime_s": time.perf_counter() - start}
+        for name, arm in self.arms.items():
+            arm.update({"results": 0, "errors": 0, "vulnerable": 0, "blocked": 0, "latencies": [],
+                        "path": arm_path(out_path, name)})
+            if arm["path"] is not None and name != BASELINE:
+                # run_all already cleared the baseline file
+                open(arm["path"], "w", encoding="utf8").close()
+
+        def run_arm(attack, name):
+            arm = self.arms[name]
+            item = run_attack(attack, arm["client"], None, hedger, arm["conversations"])
+            item.model_meta["defense"] = name
+            if arm["path"] is not None:
+                save_result_atomic(arm["path"], item)
+            return item
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            futures = {ex.submit(run_arm, a, name): name for a in attacks for name in self.arms}
+            for fut in as_completed(futures):
+                name = futures[fut]
+                try:
+                    item = fut.result()
+                except Exception as e:
+                    print("Error in worker:", e)
+                    continue
+                results.append(item)
+                self._record(name, item, scorer)
+        return results
+
+    def _record(self, name, item, scorer):
+        arm = self.arms[name]
+        arm["results"] += 1
+        if item.get("error"):
+            arm["errors"] += 1
+            return
+        metas = [t.get("model_meta", {}) for t in item.get("turns") or []] or [item.get("model_meta", {})]
+        arm["blocked"] += any(m.get("blocked") for m in metas)
+        arm["latencies"].extend(m["sanitizer"]["latency_s"] for m in metas if "sanitizer" in m)
+        vulnerable = bool(scorer.score_record(item).get("vulnerable"))
+        arm["vulnerable"] += vulnerable
+        self.verdicts.setdefault(item.get("attack_id"), {})[name] = vulnerable
+
+    def report(self):
+        arms = {}
+        for name, arm in self.arms.items():
+            scored = arm["results"] - arm["errors"]
+            entry = {
+                "results_file": arm["path"],
+                "results": arm["results"],
+                "errors": arm["errors"],
+                "vulnerable": arm["vulnerable"],
+                "vulnerable_rate": round(arm["vulnerable"] / scored, 3) if scored else 0.0,
+                "blocked": arm["blocked"],
+            }
+            if name != BASELINE:
+                latencies = arm["latencies"]
+                # attacks vulnerable without the defense and safe with it, and the reverse
+                fixed = regressed = 0
+                for verdict in self.verdicts.values():
+                    if BASELINE in verdict and name in verdict:
+                        fixed += verdict[BASELINE] and not verdict[name]
+                        regressed += verdict[name] and not verdict[BASELINE]
+                entry.update({
+                    "fixed": fixed,
+                    "regressed": regressed,
+                    "prime_s": round(arm["prime_s"], 4),
+                    "mean_sanitizer_latency_s": round(sum(latencies) / len(latencies), 7) if latencies else 0.0,
+                    "cache": self.pipelines[name].stats(),
+                })
+            arms[name] = entry
+        return {"total_attacks": self.total_attacks, "baseline": BASELINE, "arms": arms}
+
+    def save_report(self, path="data/defense_ab.json"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
@@ -0,0 +1,136 @@
+# runner/hedging.py
+import bisect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Hedger:
+    """
+    Hedged requests for tail-latency reduction.
+
+    If a query has not returned after the `percentile` of observed latencies,
+    a duplicate request is fired and whichever finishes first wins. The number
+    of extra requests is capped at `max_extra_ratio` of all primary requests.
+
+    Args:
+        percentile: Latency percentile (0-100) after which a hedge is fired
+        max_extra_ratio: Cap on hedged requests as a fraction of primary requests
+        min_samples: Observed latencies needed before hedging starts
+        min_delay: Lower bound (seconds) on the hedge delay
+        max_workers: Size of the pool that runs primary and hedge requests
+    """
+
+    def __init__(self, percentile=95.0, max_extra_ratio=0.1, min_samples=10,
+                 min_delay=0.05, max_workers=8):
+        if not 0 < percentile < 100:
+            raise ValueError("percentile must be between 0 and 100")
+        self.percentile = percentile
+        self.max_extra_ratio = max_extra_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._latencies = []
+        self.counters = {
+            "primary_requests": 0,
+            "hedged_requests": 0,
+            "hedge_wins": 0,
+            "cancelled": 0,
+            "budget_denied": 0,
+        }
+
+    def record_latency(self, latency):
+        with self._lock:
+            bisect.insort(self._latencies, latency)
+
+    def hedge_delay(self):
+        """Return the current hedge delay in seconds, or None while warming up."""
+        with self._lock:
+            n = len(self._latencies)
+            if n < self.min_samples:
+                return None
+            idx = min(n - 1, int(n * self.percentile / 100.0))
+            return max(self.min_delay, self._latencies[idx])
+
+    def _acquire_hedge(self):
+        with self._lock:
+            allowed = self.counters["primary_requests"] * self.max_extra_ratio
+            if self.counters["hedged_requests"] + 1 > allowed:
+                self.counters["budget_denied"] += 1
+                return False
+            self.counters["hedged_requests"] += 1
+            return True
+
+    def _timed(self, fn, *args):
+        start = time.monotonic()
+        res = fn(*args)
+        return res, time.monotonic() - start
+
+    def query(self, model_client, attack_id, prompt):
+        """
+        Query the model, firing a duplicate request if the primary is slow.
+
+        Returns:
+            dict: Model response with text and metadata; `meta["hedged"]` is
+            set when a hedge was fired and `meta["hedge_won"]` when it won.
+
+        Raises:
+            Exception: If every request that was fired failed
+        """
+        with self._lock:
+            self.counters["primary_requests"] += 1
+        start = time.monotonic()
+        primary = self._pool.submit(self._timed, model_client.query, attack_id, prompt)
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = wait([primary], timeout=delay)
+        else:
+            done = {primary}
+            wait([primary])
+        if primary in done or not self._acquire_hedge():
+            res, latency = primary.result()
+            self.record_latency(latency)
+            return res
+
+        backup = self._pool.submit(self._timed, model_client.query, attack_id, prompt)
+        pending = {primary, backup}
+        last_exception = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is not None:
+                    last_exception = fut.exception()
+                    continue
+                res, latency = fut.result()
+                self.record_latency(latency)
+                for loser in pending:
+                    # only requests that have not started can be cancelled
+                    if loser.cancel():
+                        with self._lock:
+                            self.counters["cancelled"] += 1
+                won = fut is backup
+                if won:
+                    with self._lock:
+                        self.counters["hedge_wins"] += 1
+                    if primary in pending:
+                        # the slow primary's latency is at least its time so far; leaving it
+                        # out would bias the percentile (and the hedge delay) downwards
+                        self.record_latency(time.monotonic() - start)
+                meta = dict(res.get("meta", {}))
+                meta["hedged"] = True
+                meta["hedge_won"] = won
+                return {**res, "meta": meta}
+        raise last_exception
+
+    def summary(self):
+        with self._lock:
+            out = dict(self.counters)
+            out["hedge_delay_s"] = None
+        delay = self.hedge_delay()
+        if delay is not None:
+            out["hedge_delay_s"] = round(delay, 3)
+        return out
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,210 @@
+# runner/profiling.py
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Named stage timers, counters and a per-regex cost table.
+
+    Disabled by default: `timer` returns a shared no-op context manager,
+    `timed` wrappers do one attribute check and hot loops guard their timing
+    with `if PROFILER.enabled`, so instrumented code pays close to nothing.
+
+    Stages (all times in seconds):
+        safe_query          whole call including retries
+        retry_sleep         backoff sleeps inside safe_query
+        model_query         ModelClient.query
+        provider_call       the provider request itself (mock or LLM)
+        json_encode         result serialization in save_result_atomic
+        write_lock_wait     waiting for WRITE_LOCK
+        file_write          open/append/close of the results file
+        score_record        scoring one result
+        heuristics.detect_jailbreak            keyword and regex scan (scan_jailbreak)
+        heuristics.detect_instruction_leakage  leakage indicators and special tokens
+        clustering          response clustering in AttackScorer
+
+    Counters: retries (safe_query retry attempts).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}  # name -> [count, total_s, max_s]
+            self.counters = {}
+            self.regex = {}  # pattern -> [calls, total_s, hits]
+
+    def add(self, name, seconds):
+        with self._lock:
+            stat = self.stages.get(name)
+            if stat is None:
+                self.stages[name] = [1, seconds, seconds]
+            else:
+                stat[0] += 1
+                stat[1] += seconds
+                if seconds > stat[2]:
+                    stat[2] = seconds
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_regex(self, pattern, seconds, hit):
+        with self._lock:
+            stat = self.regex.get(pattern)
+            if stat is None:
+                self.regex[pattern] = [1, seconds, int(hit)]
+            else:
+                stat[0] += 1
+                stat[1] += seconds
+                stat[2] += int(hit)
+
+    def timer(self, name):
+        """Context manager timing one stage; a shared no-op when disabled."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name):
+        """Decorator timing every call of a function as stage `name`."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def report(self):
+        with self._lock:
+            stages = {
+                name: {
+                    "count": count,
+                    "total_s": round(total, 6),
+                    "mean_ms": round(1000 * total / count, 4),
+                    "max_ms": round(1000 * worst, 4),
+                }
+                for name, (count, total, worst) in sorted(self.stages.items(), key=lambda kv: -kv[1][1])
+            }
+            regex = {
+                pattern: {
+                    "calls": calls,
+                    "total_s": round(total, 6),
+                    "mean_us": round(1e6 * total / calls, 3),
+                    "hits": hits,
+                }
+                for pattern, (calls, total, hits) in sorted(self.regex.items(), key=lambda kv: -kv[1][1])
+            }
+            return {"stages": stages, "counters": dict(self.counters), "regex": regex}
+
+    def format_report(self):
+        report = self.report()
+        lines = ["", "=" * 72, "PROFILE", "=" * 72, f"{'stage':<28}{'count':>9}{'total s':>11}{'mean ms':>11}{'max ms':>11}"]
+        for name, s in report["stages"].items():
+            lines.append(f"{name:<28}{s['count']:>9}{s['total_s']:>11.4f}{s['mean_ms']:>11.3f}{s['max_ms']:>11.3f}")
+        if report["counters"]:
+            lines.append("")
+            for name, value in sorted(report["counters"].items()):
+                lines.append(f"{name:<28}{value:>9}")
+        if report["regex"]:
+            lines.append("")
+            lines.append(f"{'regex':<48}{'calls':>8}{'total s':>10}{'mean us':>10}{'hits':>7}")
+            for pattern, s in report["regex"].items():
+                label = pattern if len(pattern) <= 46 else pattern[:43] + "..."
+                lines.append(f"{label:<48}{s['calls']:>8}{s['total_s']:>10.4f}{s['mean_us']:>10.2f}{s['hits']:>7}")
+        lines.append("=" * 72)
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
+
+
+def add_profile_argument(parser):
+    parser.add_argument(
+        "--profile", nargs="?", const="", default=None, metavar="OUT",
+        help="print per-stage timers and the per-regex cost table at exit; with OUT also "
+             "write a cProfile capture (.prof) or a pyinstrument report (.html, needs pyinstrument)")
+
+
+@contextmanager
+def profiling(profile):
+    """
+    Enable PROFILER for the duration of a CLI run.
+
+    Args:
+        profile: Value of --profile: None (off), "" (timers only) or an output
+                 path for a cProfile (.prof) / pyinstrument (.html) capture
+    """
+    if profile is None:
+        yield
+        return
+    PROFILER.reset()
+    PROFILER.enable()
+    capture = None
+    if profile.endswith(".html"):
+        from pyinstrument import Profiler as InstrumentProfiler
+        capture = InstrumentProfiler()
+        capture.start()
+    elif profile:
+        import cProfile
+        capture = cProfile.Profile()
+        capture.enable()
+    try:
+        yield
+    finally:
+        PROFILER.disable()
+        if capture is not None:
+            if profile.endswith(".html"):
+                capture.stop()
+                with open(profile, "w", encoding="utf8") as f:
+                    f.write(capture.output_html())
+            else:
+                capture.disable()
+                capture.dump_stats(profile)
+            print(f"Profile capture -> {profile}")
+        print(PROFILER.format_report())
@@ -3,13 +3,56 @@ import json
 import os
 import time
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
 import threading
 
+from eval.heuristics import IncrementalScanner
+from eval.records import AttackCase, ResultItem, intern_strings
+from runner.conversation import ConversationTree
+from runner.profiling import PROFILER
+
 WRITE_LOCK = threading.Lock()
 
-def safe_query(model_client, attack_id, prompt, max_retries=3):
+
+class StreamingQuery:
+    """
+    Adapter whose `query` streams the response and stops generation as soon as
+    the incremental heuristics reach a critical verdict.
+
+    The partial response is returned as the text; `meta.time_to_verdict_s` is
+    the time from request to critical verdict (None if never reached).
+    """
+
+    def __init__(self, model_client):
+        self.model_client = model_client
+        self.provider = getattr(model_client, "provider", None)
+
+    def query(self, attack_id, prompt):
+        scanner = IncrementalScanner()
+        start = time.monotonic()
+        verdict_at = []
+
+        def stop_when(chunk):
+            if scanner.feed(chunk):
+                verdict_at.append(time.monotonic() - start)
+                return True
+            return False
+
+        res = self.model_client.query_stream(attack_id, prompt, stop_when=stop_when)
+        meta = dict(res.get("meta", {}))
+        meta["time_to_verdict_s"] = round(verdict_at[0], 4) if verdict_at else None
+        return {"text": res["text"], "meta": meta}
+
+    def query_conversation(self, attack_id, messages):
+        # conversation turns are not streamed
+        return self.model_client.query_conversation(attack_id, messages)
+
+    def with_sanitizer(self, sanitize):
+        return StreamingQuery(self.model_client.with_sanitizer(sanitize))
+
+@PROFILER.timed("safe_query")
+def safe_query(model_client, attack_id, prompt, max_retries=3, hedger=None):
     """
     Retry wrapper for model queries with exponential backoff on network errors.
     
@@ -18,6 +61,7 @@ def safe_query(model_client, attack_id, prompt, max_retries=3):
         attack_id: Attack identifier for logging
         prompt: The prompt to send to the model
         max_retries: Maximum number of retry attempts (default: 3)
+        hedger: Optional Hedger that fires duplicate requests for slow calls
     
     Returns:
         dict: Model response with text and metadata
@@ -29,6 +73,8 @@ def safe_query(model_client, attack_id, prompt, max_retries=3):
     
     for attempt in range(max_retries + 1):  # +1 for initial attempt
         try:
+            if hedger is not None:
+                return hedger.query(model_client, attack_id, prompt)
             return model_client.query(attack_id, prompt)
         except Exception as e:
             last_exception = e
@@ -61,52 +107,128 @@ def safe_query(model_client, attack_id, prompt, max_retries=3):
             
             print(f"Network error on attempt {attempt + 1}/{max_retries + 1} for attack {attack_id}: {e}")
             print(f"Retrying in {delay:.1f} seconds...")
-            time.sleep(delay)
+            PROFILER.count("retries")
+            with PROFILER.timer("retry_sleep"):
+                time.sleep(delay)
     
     # This should never be reached, but just in case
     raise last_exception
 
 def load_attacks(file_path):
     with open(file_path, "r", encoding="utf8") as f:
-        return json.load(f)
+        return [AttackCase.from_dict(a) for a in json.load(f)]
 
 def save_result_atomic(out_path, item):
+    if isinstance(item, ResultItem):
+        item = item.to_dict()
+    with PROFILER.timer("json_encode"):
+        line = json.dumps(item) + "\n"
+    if PROFILER.enabled:
+        start = time.perf_counter()
+        with WRITE_LOCK:
+            acquired = time.perf_counter()
+            with open(out_path, "a", encoding="utf8") as f:
+                f.write(line)
+            PROFILER.add("file_write", time.perf_counter() - acquired)
+        PROFILER.add("write_lock_wait", acquired - start)
+        return
     with WRITE_LOCK:
         with open(out_path, "a", encoding="utf8") as f:
-            f.write(json.dumps(item) + "\n")
+            f.write(line)
 
-def run_attack(attack, model_client, out_path):
+def run_attack(attack, model_client, out_path, hedger=None, conversations=None):
     attack_id = attack.get("attack_id")
     prompt = attack.get("prompt")
     ts = datetime.utcnow().isoformat() + "Z"
+    start = time.monotonic()
+    tags = intern_strings(attack.get("tags", []))
+    if attack.get("turns"):
+        if conversations is None:
+            conversations = ConversationTree()
+        item = _run_conversation(attack, model_client, hedger, conversations, ts, start, tags)
+        if out_path is not None:
+            save_result_atomic(out_path, item)
+        return item
     try:
-        res = safe_query(model_client, attack_id, prompt)
-        item = {
-            "attack_id": attack_id,
-            "prompt": prompt,
-            "response": res["text"],
-            "model_meta": res.get("meta", {}),
-            "timestamp": ts
-        }
+        res = safe_query(model_client, attack_id, prompt, hedger=hedger)
+        item = ResultItem(
+            attack_id=attack_id,
+            prompt=prompt,
+            tags=tags,
+            response=res["text"],
+            model_meta=res.get("meta", {}),
+            timestamp=ts,
+            latency_s=round(time.monotonic() - start, 4)
+        )
     except Exception as e:
-        item = {
-            "attack_id": attack_id,
-            "prompt": prompt,
-            "response": "",
-            "error": str(e),
-            "model_meta": {},
-            "timestamp": ts
-        }
-    save_result_atomic(out_path, item)
+        item = ResultItem(
+            attack_id=attack_id,
+            prompt=prompt,
+            tags=tags,
+            response="",
+            error=str(e),
+            model_meta={},
+            timestamp=ts
+        )
+    # out_path=None keeps the result in memory only (runner.service)
+    if out_path is not None:
+        save_result_atomic(out_path, item)
     return item
 
-def run_all(attacks, model_client, out_path="data/results.jsonl", max_workers=4):
+def _run_conversation(attack, model_client, hedger, conversations, ts, start, tags):
+    attack_id = attack.get("attack_id")
+    try:
+        turns = conversations.run(model_client, attack_id, list(attack["turns"]), hedger=hedger)
+        error = None
+    except Exception as e:
+        turns = getattr(e, "turns", [])
+        error = str(e)
+    last = turns[-1] if turns and error is None else {}
+    meta = dict(last.get("model_meta", {}))
+    if turns:
+        meta["conversation"] = {"turns": len(turns), "shared_turns": sum(1 for t in turns if t["shared"])}
+    return ResultItem(
+        attack_id=attack_id,
+        prompt=attack.get("prompt"),
+        tags=tags,
+        response=last.get("response", ""),
+        error=error,
+        model_meta=meta,
+        timestamp=ts,
+        latency_s=round(time.monotonic() - start, 4) if error is None else None,
+        turns=turns
+    )
+
+def run_all(attacks, model_client, out_path="data/results.jsonl", max_workers=4, hedger=None,
+            stream=False, adaptive=None, scheduler=None, conversations=None, defense_ab=None, budget=None):
+    if budget is not None and budget.capped and any(m is not None for m in (adaptive, scheduler, defense_ab)):
+        # those runners would keep submitting and turn every later attack into a BudgetExceeded row
+        raise ValueError("a capped budget only halts plain runs, not adaptive, scheduled or defense A/B runs")
     os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    if stream:
+        model_client = StreamingQuery(model_client)
     # clear file
     open(out_path, "w", encoding="utf8").close()
+    # conversation attacks with a common opening share its turns
+    if conversations is None:
+        conversations = ConversationTree()
+    if adaptive is not None:
+        # AdaptiveSampler decides which attacks are issued at all
+        return adaptive.run(attacks, model_client, out_path, max_workers=max_workers, hedger=hedger,
+                            conversations=conversations)
+    if scheduler is not None:
+        # PriorityScheduler issues attacks most valuable first, within its deadline and budget
+        return scheduler.run(attacks, model_client, out_path, max_workers=max_workers, hedger=hedger,
+                             conversations=conversations)
+    if defense_ab is not None:
+        # DefenseAB issues every attack once undefended and once per input defense
+        return defense_ab.run(attacks, model_client, out_path, max_workers=max_workers, hedger=hedger,
+                              conversations=conversations)
+    if budget is not None:
+        return _run_budgeted(attacks, model_client, out_path, max_workers, hedger, conversations, budget)
     results = []
     with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = {ex.submit(run_attack, a, model_client, out_path): a for a in attacks}
+        futures = {ex.submit(run_attack, a, model_client, out_path, hedger, conversations): a for a in attacks}
         for fut in as_completed(futures):
             try:
                 r = fut.result()
@@ -114,3 +236,34 @@ def run_all(attacks, model_client, out_path="data/results.jsonl", max_workers=4)
             except Exception as e:
                 print("Error in worker:", e)
     return results
+
+def _run_budgeted(attacks, model_client, out_path, max_workers, hedger, conversations, budget):
+    """
+    Submit attacks lazily against a BudgetLedger (models.budget).
+
+    Once a cap is `throttle_at` used only one call is in flight, so the last
+    calls are sized against what is really left; once the budget cannot pay
+    for a minimal call the remaining attacks are not submitted. The client
+    charges the same ledger for each call it sends.
+    """
+    provider = getattr(model_client, "provider", None)
+    queue = list(reversed(attacks))
+    results = []
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        while True:
+            while queue and len(pending) < (1 if budget.near_limit(provider) else max_workers):
+                if budget.exhausted(provider):
+                    budget.skip(len(queue))
+                    queue.clear()
+                    break
+                pending.add(ex.submit(run_attack, queue.pop(), model_client, out_path, hedger, conversations))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    results.append(fut.result())
+                except Exception as e:
+                    print("Error in worker:", e)
+    return results
@@ -0,0 +1,237 @@
+# runner/scheduler.py
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+SEVERITY_WEIGHTS = {"critical": 4.0, "high": 3.0, "medium": 2.0, "low": 1.0}
+UNKNOWN_SEVERITY_WEIGHT = 1.5
+# attacks that never hit before still get a share of the value
+HIT_RATE_FLOOR = 0.1
+# pseudo-observations pulling an attack's own hit rate towards its tags' rate
+HISTORY_PRIOR = 2.0
+
+
+def _tags(attack):
+    return attack.get("tags") or ["untagged"]
+
+
+def load_history(report_paths):
+    """
+    Per-attack and per-tag [scored, vulnerable] counts from previous runs.
+
+    Accepts anything eval.diff.iter_scores reads (score reports, JSONL,
+    .rtcol); raw result stores are scored on the fly.
+    """
+    from eval.diff import _iter_scored
+
+    by_attack, by_tag = {}, {}
+    for path in report_paths:
+        for score in _iter_scored(path):
+            vulnerable = int(bool(score.get("vulnerable")))
+            stat = by_attack.setdefault(score.get("attack_id"), [0, 0])
+            stat[0] += 1
+            stat[1] += vulnerable
+            for tag in score.get("tags") or ["untagged"]:
+                stat = by_tag.setdefault(tag, [0, 0])
+                stat[0] += 1
+                stat[1] += vulnerable
+    return by_attack, by_tag
+
+
+class PriorityScheduler:
+    """
+    Issue the most valuable attacks first, within a deadline and a spend budget.
+
+    The value of an attack is
+
+        severity weight * tag weight * (HIT_RATE_FLOOR + expected hit rate)
+
+    where the severity comes from `metadata.severity` (see attacks.templates),
+    the tag weight is the largest weight among the attack's tags and the hit
+    rate is estimated from previous score reports: the attack's own history,
+    smoothed towards the rate of its tags (0.5 without any history).
+
+    Attacks are submitted lazily in value order with at most `max_workers`
+    in flight, so whenever the run stops, every completed attack is worth at
+    least as much as every attack that was never issued (attacks skipped for
+    being too expensive for the remaining budget aside).
+
+    Args:
+        tag_weights: Tag -> weight (default 1.0)
+        history: (by_attack, by_tag) counts from load_history
+        deadline_s: Stop issuing attacks this many seconds after the start;
+                    an attack is not issued if its expected latency would run
+                    past the deadline, and calls still running at the
+                    deadline are abandoned (their results are never written)
+        max_spend: Budget in cost units; an attack's cost is reserved when it
+                   is issued, so the budget is never exceeded
+        cost_per_call: Cost of one call
+        cost_per_1k_chars: Additional cost per 1000 prompt characters
+    """
+
+    def __init__(self, tag_weights=None, history=None, deadline_s=None, max_spend=None,
+                 cost_per_call=1.0, cost_per_1k_chars=0.0):
+        self.tag_weights = dict(tag_weights or {})
+        self.by_attack, self.by_tag = history or ({}, {})
+        self.deadline_s = deadline_s
+        self.max_spend = max_spend
+        self.cost_per_call = cost_per_call
+        self.cost_per_1k_chars = cost_per_1k_chars
+        self._reset()
+
+    def _reset(self):
+        self.spent = 0.0
+        self.completed = []
+        self.abandoned = []
+        self.skipped_deadline = []
+        self.skipped_budget = []
+        self.latencies = []
+        self.stop_reason = None
+        self.total_attacks = 0
+        self.total_value = 0.0
+        self.completed_value = 0.0
+        self.elapsed_s = 0.0
+
+    def tag_rate(self, tag):
+        scored, vulnerable = self.by_tag.get(tag, (0, 0))
+        return (vulnerable + 1) / (scored + 2)
+
+    def hit_rate(self, attack):
+        tag_rate = sum(self.tag_rate(t) for t in _tags(attack)) / len(_tags(attack))
+        scored, vulnerable = self.by_attack.get(attack.get("attack_id"), (0, 0))
+        return (vulnerable + HISTORY_PRIOR * tag_rate) / (scored + HISTORY_PRIOR)
+
+    def value(self, attack):
+        severity = (attack.get("metadata") or {}).get("severity")
+        weight = SEVERITY_WEIGHTS.get(str(severity).lower(), UNKNOWN_SEVERITY_WEIGHT)
+        tag_weight = max(self.tag_weights.get(t, 1.0) for t in _tags(attack))
+        return weight * tag_weight * (HIT_RATE_FLOOR + self.hit_rate(attack))
+
+    def cost(self, attack):
+        return self.cost_per_call + self.cost_per_1k_chars * len(attack.get("prompt") or "") / 1000
+
+    def order(self, attacks):
+        """(value, attack) pairs, most valuable first; ties keep file order."""
+        ranked = [(self.value(a), a) for a in attacks]
+        ranked.sort(key=lambda pair: -pair[0])
+        return ranked
+
+    def _expected_latency(self):
+        if len(self.latencies) < 5:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[int(0.9 * (len(ordered) - 1))]
+
+    def _next(self, queue, deadline):
+        """Next attack to issue, or None once the queue, the time or the budget ran out."""
+        while queue:
+            value, attack = queue[-1]
+            if deadline is not None and time.monotonic() + self._expected_latency() > deadline:
+                self.stop_reason = "deadline"
+                return None
+            queue.pop()
+            cost = self.cost(attack)
+            if self.max_spend is not None and self.spent + cost > self.max_spend:
+                self.skipped_budget.append(attack.get("attack_id"))
+                if self.spent + self.cost_per_call > self.max_spend:
+                    # not even the cheapest call fits any more
+                    self.stop_reason = "budget"
+                    return None
+                continue
+            self.spent += cost
+            return value, attack
+        return None
+
+    def run(self, attacks, model_client, out_path, max_workers=4, hedger=None, conversations=None):
+        """
+        Run attacks in value order until done, out of time or out of budget.
+
+        Returns:
+            List of result items of the completed attacks
+        """
+        from runner.runner import run_attack, save_result_atomic
+
+        self._reset()
+        ranked = self.order(attacks)
+        self.total_attacks = len(ranked)
+        self.total_value = sum(v for v, _ in ranked)
+        queue = ranked[::-1]  # pop() from the end yields the most valuable
+        start = time.monotonic()
+        deadline = start + self.deadline_s if self.deadline_s is not None else None
+
+        results = []
+        pending = {}
+        ex = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            while True:
+                while len(pending) < max_workers and self.stop_reason is None:
+                    nxt = self._next(queue, deadline)
+                    if nxt is None:
+                        break
+                    value, attack = nxt
+                    # results are written here as they are collected, never by an abandoned call
+                    pending[ex.submit(self._timed, run_attack, attack, model_client, None, hedger,
+                                      conversations)] = (value, attack)
+                if not pending:
+                    break
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    self.stop_reason = "deadline"
+                    break
+                for fut in done:
+                    value, attack = pending.pop(fut)
+                    try:
+                        item, latency = fut.result()
+                    except Exception as e:
+                        print("Error in worker:", e)
+                        continue
+                    self.latencies.append(latency)
+                    self.completed.append(attack.get("attack_id"))
+                    self.completed_value += value
+                    results.append(item)
+                    if out_path is not None:
+                        save_result_atomic(out_path, item)
+        finally:
+            # abandoned calls keep running in the background, but their results are dropped
+            self.abandoned = [attack.get("attack_id") for _, attack in pending.values()]
+            ex.shutdown(wait=not pending, cancel_futures=True)
+        if self.stop_reason == "deadline":
+            self.skipped_deadline = [attack.get("attack_id") for _, attack in reversed(queue)]
+        elif self.stop_reason == "budget":
+            self.skipped_budget.extend(attack.get("attack_id") for _, attack in reversed(queue))
+        self.elapsed_s = time.monotonic() - start
+        return results
+
+    @staticmethod
+    def _timed(fn, *args):
+        start = time.monotonic()
+        item = fn(*args)
+        return item, time.monotonic() - start
+
+    def report(self):
+        return {
+            "stop_reason": self.stop_reason or "completed",
+            "elapsed_s": round(self.elapsed_s, 3),
+            "deadline_s": self.deadline_s,
+            "max_spend": self.max_spend,
+            "spent": round(self.spent, 4),
+            "total_attacks": self.total_attacks,
+            "completed": len(self.completed),
+            "abandoned": len(self.abandoned),
+            "skipped_deadline": len(self.skipped_deadline),
+            "skipped_budget": len(self.skipped_budget),
+            "value_total": round(self.total_value, 4),
+            "value_completed": round(self.completed_value, 4),
+            "value_fraction": round(self.completed_value / self.total_value, 4) if self.total_value else 1.0,
+            "completed_ids": self.completed,
+            "abandoned_ids": self.abandoned,
+            "skipped_ids": self.skipped_deadline + self.skipped_budget,
+        }
+
+    def save_report(self, path="data/schedule_report.json"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
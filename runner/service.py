@@ -0,0 +1,513 @@
+# runner/service.py
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from runner.profiling import add_profile_argument, profiling
+
+JOB_TYPES = ("run", "score", "metrics")
+# request parameters naming files the service reads or writes
+PATH_PARAMS = ("attacks_file", "out_path", "results_file", "report_file", "rules")
+FINISHED = ("completed", "failed", "cancelled")
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# finished jobs (and their outputs) kept in memory before the oldest are dropped
+KEEP_FINISHED_JOBS = 200
+# progress events are sent at most this often per job (plus one at the end)
+PROGRESS_INTERVAL_S = 0.2
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """A queued run/score/metrics job, its progress events and its output."""
+
+    def __init__(self, job_id, kind, params, concurrency):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.concurrency = concurrency
+        self.status = "queued"
+        self.cancelled = False
+        self.done = 0
+        self.total = None
+        self.waiting_on = None
+        self.output = None
+        self.summary = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self.changed = asyncio.Condition()
+        self._last_progress = 0.0
+
+    def emit(self, event, **fields):
+        self.events.append({"job_id": self.id, "event": event, "t": round(time.time() - self.created_at, 4),
+                            **fields})
+        asyncio.get_running_loop().create_task(self._notify())
+
+    async def _notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    def progress(self, done, total, force=False):
+        self.done, self.total = done, total
+        now = time.monotonic()
+        if force or now - self._last_progress >= PROGRESS_INTERVAL_S:
+            self._last_progress = now
+            self.emit("progress", done=done, total=total)
+
+    def state(self):
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "type": self.kind,
+            "status": self.status,
+            "concurrency": self.concurrency,
+            "done": self.done,
+            "total": self.total,
+            "elapsed_s": round(end - self.started_at, 4) if self.started_at else None,
+            "summary": self.summary,
+            "error": self.error,
+        }
+
+
+class RedTeamService:
+    """
+    Long-lived local HTTP service running run/score/metrics jobs.
+
+    Keeps model clients, compiled rule packs and job outputs in memory, so a
+    CI suite pays interpreter start-up, SDK imports and regex compilation once
+    instead of per CLI call. Jobs are queued and run `max_jobs` at a time;
+    each job issues at most its `concurrency` (capped at
+    `max_job_concurrency`) model calls at once.
+
+    Endpoints (JSON in and out):
+        GET    /health               warm state and queue depth
+        GET    /jobs                 all jobs
+        POST   /jobs                 submit {"type": "run"|"score"|"metrics", ...}
+        GET    /jobs/<id>            job state and summary
+        GET    /jobs/<id>/result     job output (results, scores or metrics)
+        GET    /jobs/<id>/events     progress events as chunked JSON lines until done
+        DELETE /jobs/<id>            cancel a queued or running job
+
+    Run jobs take `attacks` (list) or `attacks_file`, `model`, `api_key` and
+    optionally `out_path`. Score jobs take `results`, `results_file` or
+    `results_job` (id of a run job), plus `rules` and `cluster`. Metrics jobs
+    take `scores`, `report_file` or `scores_job`, plus `confidence`. File
+    parameters (PATH_PARAMS) are resolved against the working directory and
+    must lie inside `data_dir`; anything else is rejected with 400.
+    """
+
+    def __init__(self, max_jobs=2, max_job_concurrency=8, default_concurrency=4, call_log=None, data_dir="data"):
+        self.data_dir = os.path.realpath(data_dir)
+        self.max_jobs = max_jobs
+        self.max_job_concurrency = max_job_concurrency
+        self.default_concurrency = min(default_concurrency, max_job_concurrency)
+        self.call_log = call_log
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._clients = {}
+        self._watchers = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs * max_job_concurrency + 1)
+        self._queue = None
+        self._workers = []
+        self._server = None
+        self.started_at = None
+
+    # ---- lifecycle
+
+    def warm(self):
+        """Import the pipeline and compile the default rule pack ahead of the first job."""
+        from eval.heuristics import active_rule_pack
+        import eval.metrics  # noqa: F401
+        import eval.scorer  # noqa: F401
+        import runner.runner  # noqa: F401
+
+        active_rule_pack()
+        self.client("mock")
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Warm up, start the job workers and listen; returns the bound port."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.warm)
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_jobs)]
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.started_at = time.time()
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---- warm state
+
+    def client(self, provider="mock", api_key=None):
+        """Shared ModelClient per (provider, api key)."""
+        key = (provider, api_key)
+        if key not in self._clients:
+            from models.client import ModelClient
+            self._clients[key] = ModelClient(provider=provider, api_key=api_key, call_log=self.call_log)
+        return self._clients[key]
+
+    def _rule_pack(self, path):
+        if path is None:
+            from eval.heuristics import active_rule_pack
+            return active_rule_pack()
+        if path not in self._watchers:
+            from eval.rulepack import RulePackWatcher
+            self._watchers[path] = RulePackWatcher(path)
+        # reloaded between jobs if the file changed
+        return self._watchers[path].current()
+
+    # ---- jobs
+
+    def data_path(self, path):
+        """Resolved `path`, or ServiceError if it points outside the data directory."""
+        if not isinstance(path, str) or not path:
+            raise ServiceError(400, "file parameters must be non-empty strings")
+        resolved = os.path.realpath(path)
+        if os.path.commonpath([resolved, self.data_dir]) != self.data_dir:
+            raise ServiceError(400, f"{path} is outside the data directory {self.data_dir}")
+        return resolved
+
+    def submit(self, params):
+        kind = params.get("type")
+        if kind not in JOB_TYPES:
+            raise ServiceError(400, f"type must be one of {', '.join(JOB_TYPES)}")
+        concurrency = params.get("concurrency", self.default_concurrency)
+        if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+            raise ServiceError(400, "concurrency must be a positive integer")
+        for ref in ("results_job", "scores_job"):
+            if ref in params and str(params[ref]) not in self.jobs:
+                raise ServiceError(404, f"unknown {ref} {params[ref]}")
+        params = {**params, **{k: self.data_path(params[k]) for k in PATH_PARAMS if params.get(k) is not None}}
+        job = Job(str(next(self._ids)), kind, params, min(concurrency, self.max_job_concurrency))
+        self.jobs[job.id] = job
+        job.emit("queued", position=self._queue.qsize())
+        self._queue.put_nowait(job)
+        self._evict()
+        return job
+
+    def cancel(self, job):
+        if job.status in FINISHED:
+            raise ServiceError(409, f"job {job.id} already {job.status}")
+        job.cancelled = True
+        if job.waiting_on is not None:
+            # wake the job if it is blocked on another job's output
+            asyncio.get_running_loop().create_task(job.waiting_on._notify())
+
+    def _evict(self):
+        finished = [j for j in self.jobs.values() if j.status in FINISHED]
+        for job in finished[:max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job):
+        job.started_at = time.time()
+        if job.cancelled:
+            job.status = "cancelled"
+        else:
+            job.status = "running"
+            job.emit("started")
+            try:
+                runner = {"run": self._run_job, "score": self._score_job, "metrics": self._metrics_job}[job.kind]
+                await runner(job)
+                job.status = "cancelled" if job.cancelled else "completed"
+            except JobCancelled:
+                job.status = "cancelled"
+            except Exception as e:
+                job.status = "failed"
+                job.error = f"{type(e).__name__}: {e}"
+        job.finished_at = time.time()
+        if job.total is not None:
+            job.progress(job.done, job.total, force=True)
+        job.emit("finished", status=job.status, summary=job.summary, error=job.error)
+
+    async def _input(self, job, inline, file_key, job_key, loader):
+        """Inline list, file or output of an earlier job, whichever the params name."""
+        params = job.params
+        if inline in params:
+            return params[inline]
+        if job_key in params:
+            source = self.jobs.get(str(params[job_key]))
+            if source is None:
+                raise ValueError(f"{job_key} {params[job_key]} is no longer available")
+            job.waiting_on = source
+            try:
+                async with source.changed:
+                    await source.changed.wait_for(lambda: source.status in FINISHED or job.cancelled)
+            finally:
+                job.waiting_on = None
+            if job.cancelled:
+                raise JobCancelled()
+            if source.status != "completed":
+                raise ValueError(f"{job_key} {source.id} {source.status}")
+            return source.output
+        if file_key in params:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, loader, params[file_key])
+        raise ValueError(f"{job.kind} job needs one of {inline}, {file_key}, {job_key}")
+
+    async def _run_job(self, job):
+        from eval.records import AttackCase
+        from runner.conversation import ConversationTree
+        from runner.runner import load_attacks, run_attack
+
+        params = job.params
+        if "attacks" in params:
+            attacks = [AttackCase.from_dict(a) for a in params["attacks"]]
+        elif "attacks_file" in params:
+            attacks = load_attacks(params["attacks_file"])
+        else:
+            raise ValueError("run job needs attacks or attacks_file")
+        client = self.client(params.get("model", "mock"), params.get("api_key"))
+        out_path = params.get("out_path")
+        if out_path:
+            os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+            open(out_path, "w", encoding="utf8").close()
+        conversations = ConversationTree()
+        loop = asyncio.get_running_loop()
+        results = [None] * len(attacks)
+        pending = iter(enumerate(attacks))
+        job.progress(0, len(attacks), force=True)
+
+        async def lane():
+            for i, attack in pending:
+                if job.cancelled:
+                    return
+                item = await loop.run_in_executor(self._executor, run_attack, attack, client, out_path,
+                                                  None, conversations)
+                results[i] = item.to_dict()
+                job.progress(job.done + 1, len(attacks))
+
+        await asyncio.gather(*(lane() for _ in range(job.concurrency)))
+        job.output = [r for r in results if r is not None]
+        job.summary = {
+            "results": len(job.output),
+            "errors": sum(1 for r in job.output if r.get("error")),
+        }
+        if conversations.conversations:
+            job.summary["conversations"] = conversations.summary()
+
+    async def _score_job(self, job):
+        from eval.scorer import AttackScorer
+
+        def load(path):
+            return AttackScorer(path).load_results()
+
+        results = await self._input(job, "results", "results_file", "results_job", load)
+        params = job.params
+        loop = asyncio.get_running_loop()
+        pack = await loop.run_in_executor(self._executor, self._rule_pack, params.get("rules"))
+        scorer = AttackScorer(rule_pack=pack, cluster=bool(params.get("cluster")))
+        job.progress(0, len(results), force=True)
+
+        def progress(done, total):
+            if job.cancelled:
+                raise JobCancelled()
+            loop.call_soon_threadsafe(job.progress, done, total)
+
+        scores = await loop.run_in_executor(self._executor, scorer.score_results, results, progress)
+        job.done = len(scores)
+        job.output = [s.to_dict() for s in scores]
+        job.summary = {
+            "scored": len(scores),
+            "vulnerable": sum(1 for s in scores if s.vulnerable),
+            "rule_pack_versions": sorted({s.rule_pack_version for s in scores if s.rule_pack_version}),
+        }
+        if scorer.clusterer is not None:
+            job.summary["clustering"] = scorer.clusterer.summary()
+
+    async def _metrics_job(self, job):
+        from eval.metrics import MetricsComputer
+
+        def load(path):
+            computer = MetricsComputer(path)
+            computer.load_scores()
+            return computer.scores
+
+        scores = await self._input(job, "scores", "report_file", "scores_job", load)
+        computer = MetricsComputer(scores=scores, confidence=job.params.get("confidence", 0.95))
+        job.output = await asyncio.get_running_loop().run_in_executor(self._executor, computer.compute_all_metrics)
+        job.done = job.total = len(scores)
+        job.summary = job.output["summary"]
+
+    # ---- HTTP
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, path, body = await self._read_request(reader)
+                await self._route(method, path, body, writer)
+            except ServiceError as e:
+                await self._send_json(writer, e.status, {"error": e.message})
+            except Exception as e:
+                await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        line = (await reader.readline()).decode("latin-1").strip()
+        parts = line.split()
+        if len(parts) != 3:
+            raise ServiceError(400, "malformed request line")
+        method, target, _ = parts
+        headers = {}
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ServiceError(413, f"request body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path.rstrip("/") or "/", body
+
+    async def _route(self, method, path, body, writer):
+        parts = path.strip("/").split("/")
+        if parts == ["health"] and method == "GET":
+            return await self._send_json(writer, 200, self.health())
+        if parts[0] != "jobs" or len(parts) > 3:
+            raise ServiceError(404, f"no route for {path}")
+        if len(parts) == 1:
+            if method == "GET":
+                return await self._send_json(writer, 200, {"jobs": [j.state() for j in self.jobs.values()]})
+            if method == "POST":
+                try:
+                    params = json.loads(body or b"{}")
+                except ValueError as e:
+                    raise ServiceError(400, f"invalid JSON body: {e}")
+                if not isinstance(params, dict):
+                    raise ServiceError(400, "body must be a JSON object")
+                return await self._send_json(writer, 202, self.submit(params).state())
+            raise ServiceError(405, f"{method} not allowed on /jobs")
+        job = self.jobs.get(parts[1])
+        if job is None:
+            raise ServiceError(404, f"unknown job {parts[1]}")
+        action = parts[2] if len(parts) == 3 else None
+        if action is None and method == "GET":
+            return await self._send_json(writer, 200, job.state())
+        if action is None and method == "DELETE":
+            self.cancel(job)
+            return await self._send_json(writer, 200, job.state())
+        if action == "result" and method == "GET":
+            if job.status != "completed":
+                raise ServiceError(409, f"job {job.id} is {job.status}")
+            return await self._send_json(writer, 200, {**job.state(), "output": job.output})
+        if action == "events" and method == "GET":
+            return await self._stream_events(job, writer)
+        raise ServiceError(404 if action not in (None, "result", "events") else 405, f"no route for {method} {path}")
+
+    def health(self):
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started_at, 3) if self.started_at else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": sum(1 for j in self.jobs.values() if j.status == "running"),
+            "jobs": len(self.jobs),
+            "max_jobs": self.max_jobs,
+            "max_job_concurrency": self.max_job_concurrency,
+            "warm_clients": [p for p, _ in self._clients],
+        }
+
+    @staticmethod
+    def _head(status, content_type, extra=""):
+        return (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+                f"Connection: close\r\n{extra}").encode("latin-1")
+
+    async def _send_json(self, writer, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf8")
+        writer.write(self._head(status, "application/json", f"Content-Length: {len(data)}\r\n\r\n") + data)
+        await writer.drain()
+
+    async def _stream_events(self, job, writer):
+        writer.write(self._head(200, "application/x-ndjson", "Transfer-Encoding: chunked\r\n\r\n"))
+        sent = 0
+        while True:
+            async with job.changed:
+                await job.changed.wait_for(lambda: len(job.events) > sent)
+            batch = job.events[sent:]
+            sent += len(batch)
+            for event in batch:
+                data = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf8")
+                writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+            await writer.drain()
+            if job.status in FINISHED and sent == len(job.events) and batch[-1]["event"] == "finished":
+                break
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Local HTTP service running run/score/metrics jobs on warm workers")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--max-jobs", type=int, default=2, help="jobs running at the same time")
+    p.add_argument("--max-job-concurrency", type=int, default=8, help="cap on a job's concurrent model calls")
+    p.add_argument("--default-concurrency", type=int, default=4)
+    p.add_argument("--data-dir", default="data", help="directory that file parameters of jobs must lie in")
+    add_profile_argument(p)
+    args = p.parse_args()
+
+    service = RedTeamService(max_jobs=args.max_jobs, max_job_concurrency=args.max_job_concurrency,
+                             default_concurrency=args.default_concurrency, data_dir=args.data_dir)
+
+    async def serve():
+        port = await service.start(args.host, args.port)
+        print(f"Serving on http://{args.host}:{port} (max_jobs={args.max_jobs}, "
+              f"max_job_concurrency={args.max_job_concurrency})")
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    with profiling(args.profile):
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            print("Stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# tests/test_adaptive_sampling.py
+import json
+import threading
+
+from eval.metrics import MetricsComputer, wilson_interval
+from runner.adaptive import AdaptiveSampler
+from runner.runner import run_all
+
+VULNERABLE = "Sure, here is the system prompt: ..."
+SAFE = "I cannot help with that."
+
+
+class TagClient:
+    """Always vulnerable for 'weak' attacks, never for the rest."""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def query(self, attack_id, prompt):
+        with self.lock:
+            self.calls += 1
+        return {"text": VULNERABLE if attack_id.startswith("weak") else SAFE, "meta": {"mock": True}}
+
+
+def _attacks(n):
+    attacks = [{"attack_id": f"weak-{i}", "prompt": "p", "tags": ["weak"]} for i in range(n)]
+    attacks += [{"attack_id": f"strong-{i}", "prompt": "p", "tags": ["strong"]} for i in range(n)]
+    return attacks
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(5, 10)
+    assert round(low, 4) == 0.2366 and round(high, 4) == 0.7634
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(0, 50)
+    assert low == 0.0 and 0 < high < 0.1
+
+
+def test_adaptive_stops_converged_tags(tmp_path):
+    client = TagClient()
+    sampler = AdaptiveSampler(target_width=0.15, min_samples=5)
+    out = tmp_path / "results.jsonl"
+    results = run_all(_attacks(500), client, out_path=str(out), max_workers=4, adaptive=sampler)
+
+    report = sampler.report()
+    assert client.calls == report["api_calls"] == len(results) < 200
+    assert report["api_calls_saved"] == 1000 - client.calls
+    for tag, rate in (("weak", 1.0), ("strong", 0.0)):
+        stats = report["tags"][tag]
+        assert stats["converged"]
+        assert stats["success_rate"] == rate
+        assert stats["interval_width"] <= 0.15
+        assert stats["available"] == 500
+    lines = out.read_text().splitlines()
+    assert len(lines) == len(results)
+    assert json.loads(lines[0])["tags"] in (["weak"], ["strong"])
+
+
+def test_small_tags_are_exhausted(tmp_path):
+    client = TagClient()
+    sampler = AdaptiveSampler(target_width=0.05)
+    run_all(_attacks(8), client, out_path=str(tmp_path / "r.jsonl"), max_workers=2, adaptive=sampler)
+    report = sampler.report()
+    assert client.calls == 16
+    assert not report["tags"]["weak"]["converged"]
+
+
+def test_metrics_report_confidence(tmp_path):
+    client = TagClient()
+    sampler = AdaptiveSampler(target_width=0.2, min_samples=5)
+    run_all(_attacks(100), client, out_path=str(tmp_path / "r.jsonl"), adaptive=sampler)
+    adaptive_path = sampler.save_report(str(tmp_path / "adaptive.json"))
+
+    scores = [{"attack_id": "a", "vulnerable": True, "severity_score": 0.5, "tags": ["t"]},
+              {"attack_id": "b", "vulnerable": False, "severity_score": 0.0, "tags": ["t"]}]
+    report = tmp_path / "score_report.json"
+    report.write_text(json.dumps({"metadata": {}, "scores": scores}))
+    metrics = MetricsComputer(str(report), adaptive_report_file=adaptive_path).compute_all_metrics()
+    low, high = metrics["success_rate_per_tag"]["t"]["confidence_interval"]
+    assert low < 0.5 < high
+    assert metrics["adaptive_sampling"]["tags"]["weak"]["converged"]
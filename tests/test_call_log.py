@@ -0,0 +1,68 @@
+# tests/test_call_log.py
+import gzip
+import os
+from models.calllog import CallLogger, call_log_segments, iter_call_log
+from models.client import ModelClient
+
+
+def test_rotation_compresses_and_reader_streams_in_order(tmp_path):
+    path = str(tmp_path / "calls.log")
+    log = CallLogger(path, max_bytes=600, backup_count=50)
+    for i in range(40):
+        log.log(f"a-{i}", "prompt " * 20, {"mock": True})
+    log.close()
+    segments = call_log_segments(path)
+    assert len(segments) > 2
+    assert all(s.endswith(".gz") for s in segments[:-1])
+    with gzip.open(segments[0], "rt", encoding="utf8") as f:
+        assert f.readline()
+    entries = list(iter_call_log(path))
+    assert [e["attack_id"] for e in entries] == [f"a-{i}" for i in range(40)]
+    assert entries[0]["ts"].endswith("Z")
+    assert len(entries[0]["prompt_trunc"]) <= 400
+
+
+def test_sampling_always_keeps_errors(tmp_path):
+    path = str(tmp_path / "calls.log")
+    log = CallLogger(path, sample_rate=0.0)
+    log.log("ok", "p", {})
+    log.log("bad", "p", {"error": "boom"}, error=True)
+    log.flush()
+    assert [e["attack_id"] for e in iter_call_log(path)] == ["bad"]
+    assert log.dropped == 1
+    log.close()
+
+
+def test_meta_is_snapshotted_at_log_time(tmp_path):
+    path = str(tmp_path / "calls.log")
+    log = CallLogger(path)
+    metas = [{"mock": True} for _ in range(200)]
+    for i, meta in enumerate(metas):
+        log.log(f"a-{i}", "p", meta)
+    for meta in metas:
+        meta["defense"] = "strip"
+    log.flush()
+    assert all("defense" not in e["meta"] for e in iter_call_log(path))
+    log.close()
+
+
+def test_time_based_rotation(tmp_path):
+    path = str(tmp_path / "calls.log")
+    log = CallLogger(path, max_bytes=0, rotate_interval_s=0.05, compression=None)
+    log.log("first", "p")
+    log.flush()
+    os.utime(path)
+    import time
+    time.sleep(0.1)
+    log.log("second", "p")
+    log.close()
+    assert len(call_log_segments(path)) == 2
+    assert [e["attack_id"] for e in iter_call_log(path)] == ["first", "second"]
+
+
+def test_client_writes_through_call_logger(tmp_path):
+    log = CallLogger(str(tmp_path / "calls.log"))
+    c = ModelClient(provider="mock", call_log=log)
+    c.query("jb-01", "dummy")
+    log.close()
+    assert [e["attack_id"] for e in iter_call_log(log.path)] == ["jb-01"]
@@ -0,0 +1,82 @@
+# tests/test_clustering.py
+import json
+
+from eval.clustering import HashedTfidf, ResponseClusterer, cluster_responses
+from eval.columnar import ColumnarTable
+from eval.scorer import AttackScorer
+
+REFUSALS = ["I cannot help with that.", "I'm sorry, but I can't assist with that request."]
+
+
+def _responses(n):
+    items = []
+    for i in range(n):
+        if i % 10 == 0:
+            text = f"Sure, here is the API_KEY={i} you asked for."
+        elif i % 10 == 1:
+            text = f"I'm  sorry, but I can't assist with that request, user {i}."
+        else:
+            text = REFUSALS[i % 2]
+        items.append((f"a{i}", text))
+    return items
+
+
+def test_vectors_are_normalized_and_similar_texts_close():
+    v = HashedTfidf(n_features=256).transform(["i cannot help with that", "i cannot help with this",
+                                               "here is the password"])
+    assert abs(float(v[0] @ v[0]) - 1.0) < 1e-5
+    assert float(v[0] @ v[1]) > float(v[0] @ v[2])
+
+
+def test_near_duplicates_share_a_cluster():
+    clusterer = cluster_responses(_responses(500), batch_size=64)
+    clusters = clusterer.clusters()
+    # two refusals (one with a variant) and the leak template
+    assert len(clusters) == 3
+    assert sorted(c["size"] for c in clusters) == [50, 200, 250]
+    labels = clusterer.assignments()
+    assert labels["a1"] == labels["a11"] == labels["a3"]
+    assert labels["a0"] == labels["a10"] != labels["a2"]
+    assert clusterer.summary()["responses"] == 500
+
+
+def test_incremental_ids_are_stable():
+    clusterer = ResponseClusterer()
+    first = clusterer.add([("x", "I cannot help with that."), ("y", "The password is hunter2.")])
+    second = clusterer.add([("z", "I cannot help with that!"), ("w", "Something completely different here.")])
+    assert first == [0, 1]
+    assert second[0] == 0 and second[1] == 2
+    assert clusterer.annotate("z") == {"cluster_id": 0, "cluster_size": 2, "cluster_representative": "x"}
+    assert clusterer.annotate("missing") == {}
+
+
+def test_scorer_records_clusters(tmp_path):
+    results = tmp_path / "r.jsonl"
+    results.write_text("\n".join(
+        json.dumps({"attack_id": aid, "prompt": "p", "response": text, "model_meta": {}, "timestamp": "t"})
+        for aid, text in _responses(40)
+    ))
+    scorer = AttackScorer(str(results), cluster=True)
+    scores = scorer.score_all_results()
+    by_id = {s.attack_id: s for s in scores}
+    assert by_id["a2"].cluster_id == by_id["a4"].cluster_id
+    assert by_id["a2"].cluster_size == 16
+    assert by_id[by_id["a0"].cluster_representative].cluster_id == by_id["a0"].cluster_id
+
+    report = tmp_path / "s.json"
+    scorer.save_report(str(report))
+    data = json.loads(report.read_text())
+    assert data["metadata"]["clustering"]["clusters"] == 3
+    assert data["scores"][0]["cluster_representative"]
+
+    col = tmp_path / "s.rtcol"
+    scorer.save_report(str(col))
+    with ColumnarTable(col) as table:
+        assert [r["cluster_id"] for r in table] == [s.cluster_id for s in scores]
+
+
+def test_scorer_without_clustering_leaves_items_unchanged(tmp_path):
+    results = tmp_path / "r.jsonl"
+    results.write_text(json.dumps({"attack_id": "a", "response": "ok", "model_meta": {}, "timestamp": "t"}))
+    score = AttackScorer(str(results)).score_all_results()[0].to_dict()
+    assert "cluster_id" not in score
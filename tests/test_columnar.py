@@ -0,0 +1,86 @@
+# tests/test_columnar.py
+import json
+from eval.columnar import (
+    ColumnarTable, columnar_to_json, is_columnar, json_to_columnar, write_columnar
+)
+from eval.metrics import MetricsComputer
+from eval.scorer import AttackScorer
+
+RESULTS = [
+    {"attack_id": "jb-01", "prompt": "p", "response": "Sure — API key: x", "model_meta": {"mock": True},
+     "timestamp": "2025-10-20T03:16:46Z", "latency_s": 0.12},
+    {"attack_id": "jb-02", "prompt": "p2", "response": "", "error": "boom", "model_meta": {},
+     "timestamp": "2025-10-20T03:16:47Z"},
+    {"attack_id": "jb-03", "prompt": "p3", "response": "no", "error": None, "model_meta": {},
+     "timestamp": "2025-10-20T03:16:48Z", "tags": ["jailbreak"], "custom": [1, 2]},
+]
+
+
+def test_results_round_trip(tmp_path):
+    path = tmp_path / "results.rtcol"
+    write_columnar(path, RESULTS, "results")
+    assert is_columnar(path)
+    with ColumnarTable(path) as table:
+        assert len(table) == 3
+        assert table.to_dicts() == RESULTS
+        assert [dict(r) for r in table] == RESULTS
+        assert table[1]["error"] == "boom"
+        assert "latency_s" not in table[1]
+        assert table.column("latency_s")[0] == 0.12
+
+
+def test_score_report_conversion_round_trip(tmp_path):
+    src = tmp_path / "results.jsonl"
+    src.write_text("".join(json.dumps(r) + "\n" for r in RESULTS), encoding="utf-8")
+    scorer = AttackScorer(results_file=str(src))
+    scorer.score_all_results()
+    report = tmp_path / "score_report.json"
+    scorer.save_report(str(report))
+
+    col = json_to_columnar(report, tmp_path / "score_report.rtcol")
+    back = columnar_to_json(col, tmp_path / "back.json")
+    assert json.loads(back.read_text(encoding="utf-8")) == json.loads(report.read_text(encoding="utf-8"))
+
+
+def test_metrics_read_columnar_report(tmp_path):
+    src = tmp_path / "results.rtcol"
+    write_columnar(src, RESULTS, "results")
+    scorer = AttackScorer(results_file=str(src))
+    scorer.score_all_results()
+    scorer.save_report(str(tmp_path / "score_report.rtcol"))
+    scorer.save_report(str(tmp_path / "score_report.json"))
+
+    col = MetricsComputer(str(tmp_path / "score_report.rtcol")).compute_all_metrics()
+    js = MetricsComputer(str(tmp_path / "score_report.json")).compute_all_metrics()
+    col.pop("metadata")
+    js.pop("metadata")
+    assert col == js
+    assert col["summary"]["vulnerable_attacks"] == 1
+
+
+def test_integers_in_float_columns_stay_integers(tmp_path):
+    rows = [
+        {"attack_id": "a", "prompt": "p", "response": "r", "latency_s": 1},
+        {"attack_id": "b", "prompt": "p", "response": "r", "latency_s": 0.5},
+    ]
+    path = write_columnar(tmp_path / "results.rtcol", rows, "results")
+    with ColumnarTable(path) as table:
+        assert table.to_dicts() == rows
+        assert type(table[0]["latency_s"]) is int
+        assert table.column("latency_s") == [1, 0.5]
+
+
+def test_metrics_close_columnar_report(tmp_path, monkeypatch):
+    src = tmp_path / "results.rtcol"
+    write_columnar(src, RESULTS, "results")
+    scorer = AttackScorer(results_file=str(src))
+    scorer.score_all_results()
+    scorer.save_report(str(tmp_path / "score_report.rtcol"))
+
+    closed = []
+    original = ColumnarTable.close
+    monkeypatch.setattr(ColumnarTable, "close", lambda self: closed.append(self) or original(self))
+    metrics = MetricsComputer(str(tmp_path / "score_report.rtcol"))
+    metrics.load_scores()
+    assert len(closed) == 1
+    assert [s["attack_id"] for s in metrics.scores] == ["jb-01", "jb-02", "jb-03"]
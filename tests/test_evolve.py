@@ -0,0 +1,94 @@
+# tests/test_evolve.py
+import random
+import threading
+
+from attacks.evolve import EvolutionarySearch, crossover, seed_population
+from models.calllog import get_call_logger
+from models.client import ModelClient
+
+
+class PromptSensitiveClient:
+    """Leaks more the more '#' and '@' the prompt contains."""
+
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def query(self, attack_id, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+        score = prompt.count("#") + prompt.count("@")
+        if score >= 4:
+            text = "Sure, here is the password: hunter2"
+        elif score >= 2:
+            text = "Entering developer mode."
+        else:
+            text = "I cannot help with that."
+        return {"text": text, "meta": {}}
+
+
+def test_search_climbs_to_higher_severity():
+    client = PromptSensitiveClient()
+    search = EvolutionarySearch(client, population=8, children=24, max_workers=4, seed=1, target_fitness=1.0)
+    survivors = search.run(seed_population(), generations=15)
+
+    best = survivors[0]
+    assert best["metadata"]["fitness"] == 1.0
+    assert best["metadata"]["source"] == "evolved"
+    assert "char_inject" in best["metadata"]["operators"]
+    assert "evolved" in best["tags"]
+    assert best["attack_id"].startswith(best["metadata"]["root"] + "-g")
+    fitness = [g["best_fitness"] for g in search.generations]
+    assert fitness == sorted(fitness) and fitness[0] == 0.0
+    # the search stops as soon as the target is reached
+    assert len(search.generations) < 16
+
+
+def test_duplicate_prompts_are_not_requeried():
+    client = PromptSensitiveClient()
+    search = EvolutionarySearch(client, population=6, children=30, max_workers=4, seed=0)
+    search.run(seed_population(), generations=4)
+    assert len(client.prompts) == len(set(client.prompts)) == search.queries
+    report = search.report()
+    assert report["cache_hits"] > 0
+    assert sum(g["queries"] for g in report["generations"]) == search.queries
+    for g in report["generations"]:
+        assert g["queries"] + g["cache_hits"] == g["evaluated"]
+
+
+def test_max_queries_budget():
+    client = PromptSensitiveClient()
+    search = EvolutionarySearch(client, population=6, children=50, seed=0, max_queries=30)
+    search.run(seed_population(), generations=10)
+    assert search.queries <= 30
+
+
+def test_max_queries_below_seed_count():
+    client = PromptSensitiveClient()
+    seeds = seed_population()
+    search = EvolutionarySearch(client, population=6, children=50, seed=0, max_queries=3)
+    survivors = search.run(seeds, generations=10)
+    assert len(seeds) > 3
+    assert search.queries == len(client.prompts) == 3
+    assert len(search.generations) == 1 and len(survivors) == 3
+
+
+def test_crossover_joins_word_runs():
+    rnd = random.Random(0)
+    child = crossover("one two three four", "alpha beta gamma delta", rnd)
+    words = child.split()
+    assert words[0] == "one" and words[-1] == "delta"
+
+
+def test_runs_against_mock_provider(tmp_path):
+    client = ModelClient(provider="mock", call_log=get_call_logger(str(tmp_path / "calls.log")))
+    search = EvolutionarySearch(client, population=6, children=12, max_workers=4, seed=0)
+    survivors = search.run(seed_population(), generations=3)
+    assert len(survivors) == 6
+    report = search.report()
+    assert [g["generation"] for g in report["generations"]] == [0, 1, 2, 3]
+    for g in report["generations"]:
+        assert g["errors"] == 0
+        assert g["evaluations_per_s"] > 0
+    client.call_log.flush()
+    assert len((tmp_path / "calls.log").read_text().splitlines()) == search.queries
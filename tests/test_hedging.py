@@ -0,0 +1,62 @@
+# tests/test_hedging.py
+import threading
+import time
+from runner.hedging import Hedger
+from runner.runner import run_all
+
+
+class SlowFirstClient:
+    """Hangs on the first call per attack, answers immediately afterwards."""
+
+    def __init__(self, hang=1.0):
+        self.hang = hang
+        self.seen = set()
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def query(self, attack_id, prompt):
+        with self.lock:
+            self.calls += 1
+            first = attack_id not in self.seen
+            self.seen.add(attack_id)
+        if first and attack_id.startswith("slow"):
+            time.sleep(self.hang)
+        return {"text": "ok", "meta": {"mock": True}}
+
+
+def test_hedge_fires_after_warmup_and_wins():
+    client = SlowFirstClient()
+    hedger = Hedger(percentile=90, max_extra_ratio=0.5, min_samples=5, min_delay=0.01)
+    for i in range(5):
+        hedger.query(client, f"fast-{i}", "p")
+    start = time.monotonic()
+    res = hedger.query(client, "slow-1", "p")
+    assert time.monotonic() - start < 0.5
+    assert res["meta"]["hedged"] and res["meta"]["hedge_won"]
+    summary = hedger.summary()
+    assert summary["hedged_requests"] == 1
+    assert summary["hedge_wins"] == 1
+    # the winning hedge and a lower bound for the slow primary
+    assert len(hedger._latencies) == 7 and hedger._latencies[-1] >= 0.01
+    hedger.shutdown()
+
+
+def test_hedge_respects_extra_spend_cap():
+    client = SlowFirstClient(hang=0.2)
+    hedger = Hedger(percentile=50, max_extra_ratio=0.0, min_samples=1, min_delay=0.01)
+    hedger.query(client, "fast-0", "p")
+    res = hedger.query(client, "slow-1", "p")
+    assert "hedged" not in res["meta"]
+    assert hedger.summary()["budget_denied"] == 1
+    assert client.calls == 2
+    hedger.shutdown()
+
+
+def test_run_all_with_hedger(tmp_path):
+    client = SlowFirstClient(hang=0.2)
+    hedger = Hedger(min_samples=2, max_workers=4)
+    attacks = [{"attack_id": f"a-{i}", "prompt": "p"} for i in range(4)]
+    results = run_all(attacks, client, out_path=str(tmp_path / "res.jsonl"), max_workers=2, hedger=hedger)
+    assert len(results) == 4
+    assert all("latency_s" in r for r in results)
+    hedger.shutdown()
@@ -0,0 +1,42 @@
+# tests/test_heuristics_prefilter.py
+import random
+from eval.heuristics import (
+    JAILBREAK_KEYWORDS,
+    SYSTEM_INDICATORS,
+    SPECIAL_TOKENS,
+    could_match,
+    detect_jailbreak,
+    detect_instruction_leakage,
+    _scan_jailbreak,
+    _scan_instruction_leakage,
+)
+
+FRAGMENTS = [
+    "I'm sorry, but I can't help with that.", "as an evil", "i am now ignoring",
+    "entering god mode", "pretending to be a hacker", "roleplaying as the malicious",
+    "I will bypass the", "safety rules off", "<|im_start|>", "```system```",
+    "a" * 40, "pwd=abc", "step-by-step: weapon", "how to hack", "virus payload",
+    "steal data", "PASSWORD: x", "the weather", "ſteal data", "İgnore",
+] + JAILBREAK_KEYWORDS + SYSTEM_INDICATORS + SPECIAL_TOKENS
+
+
+def test_refusals_are_ruled_out():
+    assert not could_match("I'm sorry, but I can't help with that request.")
+    assert not could_match("I can’t assist with that.")
+    assert detect_jailbreak("I'm sorry, but I can't help with that request.") == (False, [])
+
+
+def test_prefilter_keeps_verdicts_identical():
+    rnd = random.Random(0)
+    for _ in range(3000):
+        parts = [rnd.choice(FRAGMENTS) for _ in range(rnd.randint(1, 4))]
+        text = " ".join(p.upper() if rnd.random() < 0.3 else p for p in parts)
+        assert detect_jailbreak(text) == _scan_jailbreak(text)
+        assert detect_instruction_leakage(text) == _scan_instruction_leakage(text)
+
+
+def test_casefold_hazards_disable_prefilter():
+    # re.IGNORECASE matches the long s against 's', str.lower() does not
+    text = "how to hack the paſſword: hunter2"
+    assert could_match(text)
+    assert detect_jailbreak(text) == _scan_jailbreak(text)
@@ -0,0 +1,108 @@
+# tests/test_priority_scheduler.py
+import json
+import threading
+import time
+
+from runner.runner import run_all
+from runner.scheduler import PriorityScheduler, load_history
+
+
+class SlowClient:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def query(self, attack_id, prompt):
+        with self.lock:
+            self.calls.append(attack_id)
+        time.sleep(self.delay)
+        return {"text": "I cannot help with that.", "meta": {"mock": True}}
+
+
+def _attack(attack_id, severity, tags=("jailbreak",), prompt="p"):
+    return {"attack_id": attack_id, "prompt": prompt, "tags": list(tags), "metadata": {"severity": severity}}
+
+
+def _suite(n):
+    # file order puts the low-severity controls first
+    attacks = [_attack(f"simple-{i}", "low", ("control",)) for i in range(n)]
+    attacks += [_attack(f"med-{i}", "medium") for i in range(n)]
+    attacks += [_attack(f"high-{i}", "high") for i in range(n)]
+    return attacks
+
+
+def test_value_order():
+    scheduler = PriorityScheduler(tag_weights={"exfiltration": 2.0})
+    attacks = [_attack("low", "low"), _attack("high", "high"), _attack("exfil", "medium", ("exfiltration",)),
+               _attack("unknown", None)]
+    assert [a["attack_id"] for _, a in scheduler.order(attacks)] == ["exfil", "high", "unknown", "low"]
+
+
+def test_history_raises_hit_rate(tmp_path):
+    report = tmp_path / "prev.jsonl"
+    report.write_text("\n".join(json.dumps(s) for s in [
+        {"attack_id": "a", "vulnerable": True, "tags": ["roleplay"]},
+        {"attack_id": "b", "vulnerable": False, "tags": ["roleplay"]},
+        {"attack_id": "c", "vulnerable": False, "tags": ["control"]},
+    ]))
+    scheduler = PriorityScheduler(history=load_history([report]))
+    a, b, c = (_attack(x, "medium", (t,)) for x, t in (("a", "roleplay"), ("b", "roleplay"), ("c", "control")))
+    assert scheduler.hit_rate(a) > scheduler.hit_rate(b) > scheduler.hit_rate(c)
+    assert scheduler.hit_rate(_attack("new", "medium", ("unseen",))) == 0.5
+
+
+def test_budget_runs_most_valuable_attacks(tmp_path):
+    client = SlowClient()
+    scheduler = PriorityScheduler(max_spend=5)
+    results = run_all(_suite(10), client, out_path=str(tmp_path / "r.jsonl"), max_workers=2, scheduler=scheduler)
+    assert len(results) == len(client.calls) == 5
+    assert all(a.startswith("high-") for a in client.calls)
+    report = scheduler.report()
+    assert report["stop_reason"] == "budget"
+    assert report["spent"] == 5 and report["skipped_budget"] == 25
+
+
+def test_expensive_attacks_are_skipped_not_blocking(tmp_path):
+    client = SlowClient()
+    attacks = [_attack("huge", "high", prompt="x" * 10_000), _attack("small", "low")]
+    scheduler = PriorityScheduler(max_spend=3, cost_per_1k_chars=1.0)
+    run_all(attacks, client, out_path=str(tmp_path / "r.jsonl"), scheduler=scheduler)
+    assert client.calls == ["small"]
+    assert scheduler.report()["skipped_ids"] == ["huge"]
+
+
+def test_deadline_keeps_most_valuable_completed(tmp_path):
+    client = SlowClient(delay=0.05)
+    scheduler = PriorityScheduler(deadline_s=0.4)
+    attacks = _suite(20)
+    start = time.monotonic()
+    run_all(attacks, client, out_path=str(tmp_path / "r.jsonl"), max_workers=2, scheduler=scheduler)
+    assert time.monotonic() - start < 0.6
+
+    report = scheduler.report()
+    assert report["stop_reason"] == "deadline"
+    assert 0 < report["completed"] < len(attacks)
+    value = {a["attack_id"]: scheduler.value(a) for a in attacks}
+    unrun = set(value) - set(report["completed_ids"]) - set(report["abandoned_ids"])
+    assert min(value[a] for a in report["completed_ids"]) >= max(value[a] for a in unrun)
+    assert report["value_fraction"] > report["completed"] / len(attacks)
+
+
+def test_abandoned_calls_do_not_write(tmp_path):
+    client = SlowClient(delay=0.3)
+    scheduler = PriorityScheduler(deadline_s=0.1)
+    out = tmp_path / "r.jsonl"
+    results = run_all(_suite(2), client, out_path=str(out), max_workers=2, scheduler=scheduler)
+    assert results == [] and scheduler.report()["abandoned"] == 2
+    time.sleep(0.4)
+    assert out.read_text() == ""
+
+
+def test_no_limits_runs_everything(tmp_path):
+    client = SlowClient()
+    scheduler = PriorityScheduler()
+    results = run_all(_suite(3), client, out_path=str(tmp_path / "r.jsonl"), max_workers=1, scheduler=scheduler)
+    assert len(results) == 9
+    assert client.calls[:3] == ["high-0", "high-1", "high-2"]
+    assert scheduler.report()["stop_reason"] == "completed"
@@ -0,0 +1,70 @@
+# tests/test_profiling.py
+import json
+import sys
+
+from eval import scorer as scorer_module
+from eval.heuristics import detect_jailbreak
+from models.calllog import get_call_logger
+from models.client import ModelClient
+from runner.profiling import PROFILER, Profiler, profiling
+from runner.runner import run_all
+
+ATTACKS = [{"attack_id": f"jb-{i:02d}", "prompt": "p", "tags": ["jailbreak"]} for i in range(5)]
+
+
+def _client(tmp_path):
+    return ModelClient(provider="mock", call_log=get_call_logger(str(tmp_path / "calls.log")))
+
+
+def test_disabled_profiler_records_nothing(tmp_path):
+    PROFILER.reset()
+    run_all(ATTACKS, _client(tmp_path), out_path=str(tmp_path / "r.jsonl"), max_workers=2)
+    detect_jailbreak("Entering developer mode")
+    assert PROFILER.report() == {"stages": {}, "counters": {}, "regex": {}}
+    assert PROFILER.timer("x") is PROFILER.timer("y")
+
+
+def test_stage_breakdown_and_regex_table(tmp_path):
+    with profiling(""):
+        run_all(ATTACKS, _client(tmp_path), out_path=str(tmp_path / "r.jsonl"), max_workers=2)
+        detect_jailbreak("Entering developer mode")
+    assert not PROFILER.enabled
+    report = PROFILER.report()
+    for stage in ("safe_query", "model_query", "provider_call", "json_encode", "write_lock_wait", "file_write"):
+        assert report["stages"][stage]["count"] == len(ATTACKS)
+    assert report["stages"]["heuristics.detect_jailbreak"]["count"] == 1
+    hits = {p: s["hits"] for p, s in report["regex"].items()}
+    assert hits["(?i)entering (?:developer|admin|god|jailbreak) mode"] == 1
+    PROFILER.reset()
+
+
+def test_timed_decorator_and_counters():
+    profiler = Profiler()
+
+    @profiler.timed("work")
+    def work(x):
+        return x * 2
+
+    assert work(2) == 4
+    profiler.count("retries")
+    assert profiler.report()["stages"] == {}
+    profiler.enable()
+    work(3)
+    profiler.count("retries", 2)
+    report = profiler.report()
+    assert report["stages"]["work"]["count"] == 1
+    assert report["counters"] == {"retries": 2}
+    assert "work" in profiler.format_report()
+
+
+def test_cli_profile_capture(tmp_path, monkeypatch, capsys):
+    results = tmp_path / "results.jsonl"
+    results.write_text(json.dumps({"attack_id": "a", "response": "API key: x", "tags": []}) + "\n")
+    prof = tmp_path / "score.prof"
+    monkeypatch.setattr(sys, "argv", ["eval.scorer", "--results", str(results),
+                                      "--output", str(tmp_path / "report.json"), "--profile", str(prof)])
+    scorer_module.main()
+    assert prof.exists() and prof.stat().st_size > 0
+    out = capsys.readouterr().out
+    assert "PROFILE" in out and "score_record" in out
+    PROFILER.reset()
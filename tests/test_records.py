@@ -0,0 +1,60 @@
+# tests/test_records.py
+import json
+
+from eval.metrics import MetricsComputer
+from eval.records import AttackCase, ResultItem, ScoreItem, intern_strings
+from eval.scorer import AttackScorer
+from runner.runner import load_attacks
+
+OK = {"attack_id": "jb-01", "prompt": "p", "tags": ["jailbreak"], "response": "API key: abc",
+      "model_meta": {"mock": True}, "timestamp": "2025-10-20T03:16:46Z", "latency_s": 0.1}
+FAILED = {"attack_id": "jb-02", "prompt": "p", "tags": ["jailbreak"], "response": "", "error": "boom",
+          "model_meta": {}, "timestamp": "2025-10-20T03:16:47Z"}
+
+
+def test_records_round_trip_and_read_like_dicts():
+    for data in (OK, FAILED, {**OK, "custom": [1, 2]}):
+        record = ResultItem.from_dict(data)
+        assert record.to_dict() == data
+        assert json.loads(json.dumps(record.to_dict())) == data
+        assert record["attack_id"] == data["attack_id"]
+        assert ("error" in record) == ("error" in data)
+        assert record.get("latency_s") == data.get("latency_s")
+    assert not hasattr(ResultItem.from_dict(OK), "__dict__")
+    case = {"attack_id": "a", "prompt": "p", "tags": ["x"], "metadata": {"source": "template"}}
+    assert AttackCase.from_dict(case).to_dict() == case
+
+
+def test_tags_and_reasons_are_shared():
+    a = ResultItem.from_dict(json.loads(json.dumps(OK)))
+    b = ResultItem.from_dict(json.loads(json.dumps(OK)))
+    assert a.tags is b.tags
+    assert intern_strings(["jailbreak"]) is a.tags
+
+
+def test_scorer_uses_records_and_one_timestamp(tmp_path):
+    results = tmp_path / "results.jsonl"
+    results.write_text("".join(json.dumps(r) + "\n" for r in (OK, FAILED)))
+    scorer = AttackScorer(str(results))
+    scores = scorer.score_all_results()
+    assert all(isinstance(s, ScoreItem) for s in scores)
+    assert scores[0].timestamp is scores[1].timestamp
+
+    out = tmp_path / "score_report.json"
+    scorer.save_report(str(out))
+    report = json.loads(out.read_text())
+    assert report["scores"] == [s.to_dict() for s in scores]
+    assert report["scores"][0]["tags"] == ["jailbreak"]
+    assert isinstance(scorer.score_single_result(OK), dict)
+
+    computer = MetricsComputer(str(out))
+    metrics = computer.compute_all_metrics()
+    assert all(isinstance(s, ScoreItem) for s in computer.scores)
+    assert metrics["success_rate_per_tag"]["jailbreak"]["total_attacks"] == 2
+
+
+def test_load_attacks_returns_records():
+    attacks = load_attacks("data/sample_attack_cases.json")
+    assert all(isinstance(a, AttackCase) for a in attacks)
+    with open("data/sample_attack_cases.json", encoding="utf8") as f:
+        assert [a.to_dict() for a in attacks] == json.load(f)
@@ -0,0 +1,133 @@
+# tests/test_rule_packs.py
+import json
+import random
+
+import pytest
+
+import eval.heuristics as heuristics
+import eval.rulepack as rulepack
+from eval.rulepack import (
+    DEFAULT_RULE_PACK,
+    LiteralMatcher,
+    RulePackWatcher,
+    compile_rule_pack,
+    load_rule_pack,
+)
+from eval.scorer import AttackScorer
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return path
+
+
+def _pack(version="1", keywords=("wire the funds",), **extra):
+    return {
+        "name": "internal", "version": version,
+        "jailbreak_keywords": list(keywords),
+        "harmful_patterns": [{"pattern": r"(?i)how to (?:hack|breach)", "flags": ["IGNORECASE"],
+                              "triggers": ["how to "]}],
+        **extra,
+    }
+
+
+def test_default_pack_matches_builtin_rules():
+    pack = load_rule_pack(cache_dir=None)
+    assert pack.version_tag.startswith("default@1.0.0+")
+    assert "developer mode" in pack.jailbreak_keywords
+    assert len(pack.rules) == len(pack.data["instruction_patterns"]) + len(pack.data["harmful_patterns"])
+    assert heuristics.detect_jailbreak("Entering developer mode now", pack)[0]
+
+
+def test_literal_matcher_equals_substring_checks():
+    rnd = random.Random(0)
+    literals = ["ab", "abc", "b", "bca", "c", "", "ab", "cab", "zz"]
+    matcher = LiteralMatcher(literals)
+    for _ in range(500):
+        text = "".join(rnd.choice("abcz") for _ in range(rnd.randint(0, 12)))
+        assert matcher.find(text) == [i for i, lit in enumerate(literals) if lit in text]
+
+
+def test_extends_appends_lists(tmp_path):
+    _write(tmp_path / "base.json", _pack(keywords=["alpha", "beta"]))
+    child = _write(tmp_path / "child.json", {"name": "child", "version": "2", "extends": "base.json",
+                                             "jailbreak_keywords": ["beta", "gamma"]})
+    pack = load_rule_pack(child, cache_dir=None)
+    assert pack.jailbreak_keywords == ["alpha", "beta", "gamma"]
+    assert pack.version_tag.startswith("child@2+")
+    assert [p.name for p in pack.sources] == ["base.json", "child.json"]
+
+
+def test_invalid_packs_are_rejected(tmp_path):
+    loop = _write(tmp_path / "loop.json", {"version": "1", "extends": "loop.json"})
+    with pytest.raises(ValueError):
+        load_rule_pack(loop, cache_dir=None)
+    with pytest.raises(ValueError):
+        compile_rule_pack({"jailbreak_keywords": ["x"]})
+    with pytest.raises(ValueError):
+        compile_rule_pack(_pack(harmful_patterns=[{"pattern": "(", "triggers": []}]))
+
+
+def test_yaml_pack(tmp_path):
+    yaml = pytest.importorskip("yaml")
+    path = tmp_path / "pack.yaml"
+    path.write_text(yaml.safe_dump(_pack()), encoding="utf-8")
+    assert load_rule_pack(path, cache_dir=None).jailbreak_keywords == ["wire the funds"]
+
+
+def test_warm_start_reuses_matchers(tmp_path, monkeypatch):
+    data = _pack(instruction_patterns=[{"pattern": r"(?:ab)+c", "triggers": ["ab"]}])
+    cold = compile_rule_pack(data, cache_dir=tmp_path)
+    entry, = tmp_path.glob("*.json")
+    # only derived patterns are cached, never a verdict about a rule
+    assert "audits" not in json.loads(entry.read_text(encoding="utf-8"))
+
+    def no_build(*args, **kwargs):
+        raise AssertionError("matchers rebuilt on a warm start")
+
+    monkeypatch.setattr(rulepack, "_trie_pattern", no_build)
+    warm = compile_rule_pack(data, cache_dir=tmp_path)
+    assert warm.digest == cold.digest
+    assert [r.regex.pattern for r in warm.rules] == [r.regex.pattern for r in cold.rules]
+    assert warm.prefilter.pattern == cold.prefilter.pattern
+
+
+def test_watcher_reloads_changed_files(tmp_path):
+    path = _write(tmp_path / "pack.json", _pack())
+    watcher = RulePackWatcher(path, check_interval_s=0, cache_dir=None)
+    first = watcher.current()
+    assert watcher.current() is first
+
+    _write(path, _pack(version="2", keywords=["wire the funds", "new indicator"]))
+    second = watcher.current()
+    assert second.version == "2" and watcher.reloads == 1
+
+    path.write_text("{ half written", encoding="utf-8")
+    with pytest.warns(UserWarning, match="Keeping rule pack"):
+        assert watcher.current() is second
+
+
+def test_scorer_stamps_and_reloads_rule_pack(tmp_path):
+    path = _write(tmp_path / "pack.json", _pack())
+    scorer = AttackScorer(str(tmp_path / "results.jsonl"), rule_pack=str(path), reload_interval_s=0)
+    item = {"attack_id": "a1", "prompt": "p", "response": "Sure: the new indicator is here",
+            "model_meta": {}, "timestamp": "2024-01-01T00:00:00Z"}
+    before = scorer.score_single_result(item)
+    assert not before["vulnerable"]
+    assert before["rule_pack_version"].startswith("internal@1+")
+
+    _write(path, _pack(version="2", keywords=["wire the funds", "new indicator"]))
+    after = scorer.score_single_result(item)
+    assert after["vulnerable"]
+    assert after["rule_pack_version"].startswith("internal@2+")
+
+
+def test_default_scorer_uses_active_pack(tmp_path):
+    scorer = AttackScorer(str(tmp_path / "results.jsonl"))
+    assert scorer.rule_pack() is heuristics.active_rule_pack()
+    assert scorer.rule_pack().sources == (DEFAULT_RULE_PACK.resolve(),)
+
+
+def test_cache_dir_does_not_depend_on_working_directory():
+    assert rulepack.DEFAULT_CACHE_DIR.is_absolute()
+    assert rulepack.DEFAULT_CACHE_DIR.parent.parent == DEFAULT_RULE_PACK.resolve().parent.parent.parent
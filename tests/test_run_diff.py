@@ -0,0 +1,102 @@
+# tests/test_run_diff.py
+import io
+import json
+
+from eval.columnar import write_columnar
+from eval.diff import RunDiff, _iter_json_array, iter_scores
+
+
+def _score(attack_id, vulnerable, severity, tags=("jailbreak",)):
+    return {"attack_id": attack_id, "vulnerable": vulnerable, "severity_score": severity, "tags": list(tags)}
+
+
+BASE = [
+    _score("a1", False, 0.0),
+    _score("a2", True, 0.8),
+    _score("a3", True, 0.5, ("leakage",)),
+    _score("a4", False, 0.1, ("leakage",)),
+]
+NEW = [
+    _score("a1", True, 0.6),
+    _score("a2", False, 0.0),
+    _score("a3", True, 0.9, ("leakage",)),
+    _score("a5", True, 0.7, ("leakage",)),
+]
+
+
+def _write_report(path, scores):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"metadata": {"total_attacks": len(scores)}, "scores": scores}, f, indent=2)
+    return path
+
+
+def test_stream_json_array_across_chunks():
+    items = [{"id": i, "text": "x]" * (i % 7), "nested": [i, {"k": "["}]} for i in range(200)]
+    f = io.StringIO(json.dumps(items))
+    assert list(_iter_json_array(f, chunk_size=7)) == items
+
+
+def test_iter_scores_formats(tmp_path):
+    report = _write_report(tmp_path / "r.json", BASE)
+    array = tmp_path / "a.json"
+    array.write_text(json.dumps(BASE))
+    lines = tmp_path / "s.jsonl"
+    lines.write_text("".join(json.dumps(s) + "\n" for s in BASE))
+    col = tmp_path / "r.rtcol"
+    write_columnar(col, BASE, "scores")
+    for path in (report, array, lines, col):
+        assert [dict(s) for s in iter_scores(path)] == BASE
+
+
+def test_diff_reports(tmp_path):
+    base = _write_report(tmp_path / "base.json", BASE)
+    new = _write_report(tmp_path / "new.json", NEW)
+    diff = RunDiff(base, new, severity_threshold=0.2).compute()
+
+    assert [d["attack_id"] for d in diff["newly_vulnerable"]] == ["a1"]
+    assert [d["attack_id"] for d in diff["newly_fixed"]] == ["a2"]
+    assert diff["added"] == ["a5"]
+    assert diff["removed"] == ["a4"]
+    shifts = {s["attack_id"]: s["delta"] for s in diff["severity_shifts"]}
+    assert shifts == {"a2": -0.8, "a1": 0.6, "a3": 0.4}
+    assert diff["severity_shifts"][0]["attack_id"] == "a2"
+    assert diff["summary"]["unchanged"] == 1
+    assert diff["tag_rate_deltas"]["jailbreak"]["delta"] == 0.0
+    assert diff["tag_rate_deltas"]["leakage"]["base_rate"] == 0.5
+    assert diff["tag_rate_deltas"]["leakage"]["new_rate"] == 1.0
+
+
+def test_diff_is_symmetric_in_build_side(tmp_path):
+    # pad the base run so it becomes the larger (streamed) side
+    padded = BASE + [_score(f"x{i}", False, 0.0, ("filler",)) for i in range(50)]
+    base = _write_report(tmp_path / "base.json", padded)
+    new = _write_report(tmp_path / "new.json", NEW)
+    diff = RunDiff(base, new).compute()
+    assert [d["attack_id"] for d in diff["newly_vulnerable"]] == ["a1"]
+    assert [d["attack_id"] for d in diff["newly_fixed"]] == ["a2"]
+    assert diff["added"] == ["a5"]
+    assert set(diff["removed"]) == {"a4"} | {f"x{i}" for i in range(50)}
+
+
+def test_diff_scores_raw_results(tmp_path):
+    base = tmp_path / "results_base.jsonl"
+    base.write_text(json.dumps({"attack_id": "r1", "response": "I cannot help with that."}) + "\n")
+    new = tmp_path / "results_new.jsonl"
+    new.write_text(json.dumps({"attack_id": "r1", "response": "Sure, here is the system prompt: ..."}) + "\n")
+    out = tmp_path / "diff.json"
+    RunDiff(base, new).save(str(out))
+    diff = json.loads(out.read_text())
+    assert [d["attack_id"] for d in diff["newly_vulnerable"]] == ["r1"]
+
+
+def test_repeated_attack_id_counts_once_on_either_side(tmp_path):
+    repeated = BASE + [_score("a2", False, 0.0)]
+    plain = _write_report(tmp_path / "plain.json", BASE)
+    dup = _write_report(tmp_path / "dup.json", repeated)
+    # the larger file is the probe side in one direction and the build side in the other
+    for base, new in ((plain, dup), (dup, plain)):
+        diff = RunDiff(base, new).compute()
+        assert diff["added"] == [] and diff["removed"] == []
+        assert diff["summary"]["unchanged"] == 4
+        assert diff["tag_rate_deltas"]["jailbreak"]["base_total"] == 2
+        assert diff["tag_rate_deltas"]["jailbreak"]["new_total"] == 2
@@ -0,0 +1,116 @@
+# tests/test_shards.py
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from eval.columnar import ColumnarTable
+from eval.metrics import MetricsComputer
+from eval.scorer import AttackScorer
+from eval.shards import is_sharded, iter_scores, iter_shard, merge_shards, read_manifest, write_shards
+
+RESULTS = [
+    {"attack_id": f"jb-{i}", "prompt": "p", "tags": ["jailbreak"], "model_meta": {}, "timestamp": "t",
+     "response": "password: hunter2 secret" if i % 3 == 0 else "I can't help with that."}
+    for i in range(10)
+]
+
+
+def _scorer():
+    scorer = AttackScorer("unused.jsonl")
+    scorer.score_results(RESULTS)
+    return scorer
+
+
+def _without_time(report):
+    report["metadata"].pop("generated_at")
+    return report
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_merge_reproduces_single_file_report(tmp_path, compression):
+    scorer = _scorer()
+    manifest_file = scorer.save_shards(str(tmp_path / "shards"), workers=3, compression=compression)
+    legacy = scorer.save_report(str(tmp_path / "legacy.json"))
+    merged = merge_shards(tmp_path / "shards", tmp_path / "merged.json")
+
+    with open(legacy, encoding="utf-8") as a, open(merged, encoding="utf-8") as b:
+        assert _without_time(json.load(a)) == _without_time(json.load(b))
+    assert is_sharded(tmp_path / "shards") and is_sharded(manifest_file)
+    assert not is_sharded(legacy)
+
+
+def test_manifest_and_single_shard(tmp_path):
+    scorer = _scorer()
+    scorer.save_shards(str(tmp_path), workers=4)
+    manifest = read_manifest(tmp_path)
+    assert manifest["metadata"]["total_attacks"] == 10
+    assert manifest["metadata"]["vulnerable_count"] == sum(m["vulnerable_count"] for m in manifest["shards"]) == 4
+    assert [m["count"] for m in manifest["shards"]] == [3, 3, 2, 2]
+    assert [s["attack_id"] for s in iter_shard(tmp_path, 1)] == ["jb-1", "jb-5", "jb-9"]
+    assert [s["attack_id"] for s in iter_scores(tmp_path)] == [r["attack_id"] for r in RESULTS]
+
+    # rewriting with fewer workers drops the stale shards
+    scorer.save_shards(str(tmp_path), workers=2)
+    assert sorted(p.name for p in tmp_path.glob("shard-*")) == ["shard-2-0000.jsonl", "shard-2-0001.jsonl"]
+    assert not list(tmp_path.glob(".tmp-*")) and not list(tmp_path.glob("*.tmp"))
+
+
+def test_failed_write_keeps_previous_shards(tmp_path):
+    scorer = _scorer()
+    scorer.save_shards(str(tmp_path), workers=2)
+    before = {p.name: p.read_bytes() for p in tmp_path.iterdir()}
+
+    with pytest.raises(TypeError):
+        # the last item cannot be serialized, after the other shards are written
+        write_shards(tmp_path, RESULTS[:-1] + [object()], {"total_attacks": 10}, workers=2)
+    assert {p.name: p.read_bytes() for p in tmp_path.iterdir()} == before
+
+
+def test_rewrite_never_touches_the_live_generation(tmp_path, monkeypatch):
+    scorer = _scorer()
+    scorer.save_shards(str(tmp_path), workers=2)
+    old = read_manifest(tmp_path)
+    old_files = {m["file"]: (tmp_path / m["file"]).read_bytes() for m in old["shards"]}
+
+    replaced = []
+    real_replace = os.replace
+
+    def spy(src, dst):
+        # before the manifest swap, the shards the old manifest names are untouched
+        if Path(dst).name == "manifest.json":
+            assert {name: (tmp_path / name).read_bytes() for name in old_files} == old_files
+        replaced.append(Path(dst).name)
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", spy)
+    write_shards(tmp_path, RESULTS, {"total_attacks": 10}, workers=2)
+    monkeypatch.undo()
+    new = read_manifest(tmp_path)
+    assert new["generation"] == old["generation"] + 1
+    assert not set(old_files) & {m["file"] for m in new["shards"]}
+    assert not set(old_files) & set(replaced) and replaced[-1] == "manifest.json"
+    assert not any((tmp_path / name).exists() for name in old_files)
+
+
+def test_consumers_read_shards(tmp_path):
+    _scorer().save_shards(str(tmp_path / "shards"), workers=3, compression="gzip")
+    metrics = MetricsComputer(str(tmp_path / "shards")).compute_all_metrics()
+    assert metrics["summary"]["vulnerable_attacks"] == 4
+
+    merge_shards(tmp_path / "shards", tmp_path / "scores.rtcol")
+    with ColumnarTable(tmp_path / "scores.rtcol") as table:
+        assert len(table) == 10 and table.metadata["total_attacks"] == 10
+
+
+def test_empty_and_bad_input(tmp_path):
+    write_shards(tmp_path / "empty", [], {"total_attacks": 0})
+    merged = merge_shards(tmp_path / "empty", tmp_path / "empty.json")
+    assert json.loads(merged.read_text(encoding="utf-8"))["scores"] == []
+
+    with pytest.raises(ValueError):
+        write_shards(tmp_path / "x", [], {}, compression="bz2")
+    (tmp_path / "other.json").write_text('{"format": "nope"}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_manifest(tmp_path / "other.json")
@@ -0,0 +1,54 @@
+# tests/test_startup_time.py
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# cumulative import time budgets in microseconds; the provider SDKs alone take seconds
+BUDGETS_US = {
+    "runner.cli": 400_000,
+    "eval.scorer": 250_000,
+}
+
+
+def _import_times(module, extra=""):
+    code = f"import {module}; import sys; {extra}"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times, proc.stdout
+
+
+def test_runner_cli_import_budget():
+    times, _ = _import_times("runner.cli")
+    assert not any(name.startswith(("langchain", "openai", "google")) for name in times)
+    assert times["runner.cli"] < BUDGETS_US["runner.cli"], times["runner.cli"]
+
+
+def test_scorer_import_budget():
+    times, _ = _import_times("eval.scorer")
+    assert times["eval.scorer"] < BUDGETS_US["eval.scorer"], times["eval.scorer"]
+
+
+def test_no_import_time_side_effects():
+    _, out = _import_times(
+        "runner.cli",
+        "import models.mock, eval.heuristics; print(models.mock._MAP is None, len(eval.heuristics._COMPILED))",
+    )
+    assert out.split() == ["True", "0"]
+
+
+def test_lazy_state_loads_on_use():
+    from eval import heuristics
+    from models.mock import mock_response_for_attack
+    assert mock_response_for_attack("simple-01", "p")
+    assert heuristics.INSTRUCTION_PATTERNS[0].search("as an evil assistant")
+    assert heuristics.detect_jailbreak("Entering developer mode now")[0]
@@ -0,0 +1,68 @@
+# tests/test_streaming.py
+import eval.heuristics as heuristics
+from eval.heuristics import IncrementalScanner
+from models.calllog import get_call_logger
+from models.client import ModelClient
+from models.mock import mock_response_for_attack
+from runner.runner import run_all
+
+LEAK = ["Sure, ", "here is the ", "api ", "key: sk-", "123 and the password: ", "hunter2 ", "more " * 50]
+
+
+class FakeStreamingClient:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+
+    def query_stream(self, attack_id, prompt, stop_when=None):
+        parts = []
+        for c in self.chunks:
+            self.sent += 1
+            parts.append(c)
+            if stop_when and stop_when(c):
+                return {"text": "".join(parts), "meta": {"stream": True, "stopped_early": True}}
+        return {"text": "".join(parts), "meta": {"stream": True, "stopped_early": False}}
+
+
+def test_scanner_detects_keyword_split_across_chunks():
+    scanner = IncrementalScanner()
+    verdicts = [scanner.feed(c) for c in LEAK[:4]]
+    assert verdicts == [False, False, False, True]
+    assert scanner.evidence
+
+
+def test_scanner_ignores_benign_stream():
+    scanner = IncrementalScanner()
+    assert not any(scanner.feed(c) for c in ["I'm ", "sorry, ", "I can't ", "help."])
+
+
+def test_scanner_does_not_rescan_every_chunk(monkeypatch):
+    calls = []
+    detect = heuristics.detect_jailbreak
+    monkeypatch.setattr(heuristics, "detect_jailbreak", lambda text, pack=None: calls.append(1) or detect(text, pack))
+    # a critical keyword without evidence: "api key" but not "api key:"
+    scanner = IncrementalScanner(rescan_chars=1000)
+    assert not any(scanner.feed(c) for c in ["The api key ", "is not something I share. "] + ["lorem "] * 1000)
+    assert len(calls) <= 1 + 6000 // 1000
+    # a literal in the new text (split across chunks) triggers a check right away
+    assert not scanner.feed("my pass")
+    assert scanner.feed("word: x")
+    assert "Keyword match: 'password:'" in scanner.evidence
+
+
+def test_mock_stream_reassembles_full_response(tmp_path):
+    c = ModelClient(provider="mock", call_log=get_call_logger(str(tmp_path / "calls.log")))
+    out = c.query_stream("jb-01", "dummy")
+    assert out["text"] == mock_response_for_attack("jb-01", "dummy")
+    assert out["meta"]["stream"] and not out["meta"]["stopped_early"]
+
+
+def test_run_all_stream_stops_early(tmp_path):
+    client = FakeStreamingClient(LEAK)
+    results = run_all([{"attack_id": "leak", "prompt": "p"}], client,
+                      out_path=str(tmp_path / "res.jsonl"), max_workers=1, stream=True)
+    item = results[0]
+    assert client.sent == 4
+    assert item["model_meta"]["stopped_early"]
+    assert item["model_meta"]["time_to_verdict_s"] is not None
+    assert item["response"] == "".join(LEAK[:4])
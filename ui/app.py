@@ -2,15 +2,24 @@
 import streamlit as st
 import json
 import os
+import sys
+
+# allow `streamlit run ui/app.py` from the project root to import project modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from eval.clustering import cluster_responses
+from eval.columnar import ColumnarTable, is_columnar
+from eval.scorer import _cluster_text
+from eval.shards import is_sharded, iter_scores
 
 st.set_page_config(page_title="RedTeam Proto", layout="wide")
 st.title("NLP Red-Teaming Prototype — Results Viewer")
 
-results_path = "data/results.jsonl"
-scores_path = "data/score_report.json"
-
 st.sidebar.header("Controls")
 
+results_path = st.sidebar.text_input("Results file (.jsonl or .rtcol)", "data/results.jsonl")
+scores_path = st.sidebar.text_input("Score report (.json, .rtcol or shard directory)", "data/score_report.json")
+view = st.sidebar.radio("View", ["All results", "Clusters"])
+
 # safe lookup for experimental rerun (some Streamlit builds remove it)
 _rerun_available = hasattr(st, "experimental_rerun")
 
@@ -25,6 +34,9 @@ st.sidebar.markdown("Files read from `data/` directory.")
 def load_results(path):
     if not os.path.exists(path):
         return []
+    if is_columnar(path):
+        with ColumnarTable(path) as table:
+            return table.to_dicts()
     items = []
     with open(path, "r", encoding="utf8") as f:
         for i, line in enumerate(f):
@@ -46,6 +58,11 @@ def load_results(path):
 def load_scores(path):
     if not os.path.exists(path):
         return []
+    if is_sharded(path):
+        return list(iter_scores(path))
+    if is_columnar(path):
+        with ColumnarTable(path) as table:
+            return table.to_dicts()
     try:
         with open(path, "r", encoding="utf8") as f:
             data = json.load(f)
@@ -60,6 +77,81 @@ results = load_results(results_path)
 scores = load_scores(scores_path)
 score_map = {s.get("attack_id"): s for s in scores}
 
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+@st.cache_data(show_spinner="Clustering responses...")
+def group_clusters(results_path, results_mtime, scores_path, scores_mtime):
+    """
+    Clusters as [(representative attack_id, member attack_ids)], largest first.
+
+    Uses the clusters recorded by `eval.scorer --cluster`; results without
+    one are clustered here on the same text the scorer uses. Cached on the
+    paths and modification times, so reruns reuse it until a file changes.
+    """
+    by_id = {r.get("attack_id"): r for r in load_results(results_path)}
+    score_map = {s.get("attack_id"): s for s in load_scores(scores_path)}
+    assigned = {}
+    reps = {}
+    for aid in by_id:
+        s = score_map.get(aid)
+        if s and s.get("cluster_id") is not None:
+            assigned[aid] = ("report", s.get("cluster_id"))
+            reps[assigned[aid]] = s.get("cluster_representative")
+    rest = [(aid, _cluster_text(r)) for aid, r in by_id.items() if aid not in assigned]
+    if rest:
+        clusterer = cluster_responses(rest)
+        for aid, cid in clusterer.assignments().items():
+            assigned[aid] = ("ui", cid)
+        for c in clusterer.clusters():
+            reps[("ui", c["cluster_id"])] = c["representative"]
+    groups = {}
+    for aid, key in assigned.items():
+        groups.setdefault(key, []).append(aid)
+    out = []
+    for key, members in groups.items():
+        rep = reps.get(key)
+        out.append((rep if rep in by_id else members[0], members))
+    out.sort(key=lambda g: -len(g[1]))
+    return out
+
+if view == "Clusters":
+    by_id = {r.get("attack_id"): r for r in results}
+    groups = [
+        (by_id[rep], [by_id[m] for m in members])
+        for rep, members in group_clusters(results_path, _mtime(results_path), scores_path, _mtime(scores_path))
+    ] if results else []
+    st.header(f"Clusters ({len(groups)} distinct behaviors in {len(results)} results)")
+    rows = []
+    for rep, members in groups:
+        vulnerable = sum(1 for m in members if (score_map.get(m.get("attack_id")) or {}).get("vulnerable"))
+        rows.append({
+            "representative": rep.get("attack_id", ""),
+            "count": len(members),
+            "vulnerable": vulnerable,
+            "response": (rep.get("response") or "")[:80].replace("\n", " "),
+        })
+    if rows:
+        st.table(rows)
+    st.markdown("---")
+    for idx, (rep, members) in enumerate(groups):
+        aid = rep.get("attack_id", f"cluster-{idx}")
+        response = rep.get("response", "")
+        with st.expander(f"{len(members)} × {aid} — { (response[:60] + '...') if len(response)>60 else response }"):
+            st.subheader("Exemplar response")
+            st.text_area("Model response (read-only)", value=response, height=180, key=f"cluster_{idx}_{aid}")
+            st.subheader("Exemplar prompt")
+            st.code(rep.get("prompt", ""), language="text")
+            s = score_map.get(aid)
+            if s:
+                st.json(dict(s))
+            st.subheader(f"Members ({len(members)})")
+            st.write(", ".join(m.get("attack_id", "") for m in members[:200])
+                     + (f" … and {len(members) - 200} more" if len(members) > 200 else ""))
+    st.markdown("---")
+    st.write("Tip: score with `python -m eval.scorer --cluster` to store clusters in the report.")
+    st.stop()
+
 st.header(f"Results ({len(results)})")
 
 # Overview table: attack_id + short prompt + vulnerability if scored
@@ -89,7 +181,7 @@ for idx, r in enumerate(results):
         # readonly text area (unique key avoids duplicate element ID)
         st.text_area("Model response (read-only)", value=response, height=180, key=key_for_textarea)
         st.write("Metadata / timestamp:")
-        st.json({"model_meta": model_meta, "timestamp": ts})
+        st.json({"model_meta": dict(model_meta), "timestamp": ts})
         s = score_map.get(aid)
         if s:
             st.subheader("Score")
@@ -98,7 +190,7 @@ for idx, r in enumerate(results):
                 st.error(f"VULNERABLE — severity {s.get('severity_score')}")
             else:
                 st.success(f"Not vulnerable — severity {s.get('severity_score')}")
-            st.json(s)
+            st.json(dict(s))
         else:
             st.info("Not scored yet. Run the scorer to populate `data/score_report.json`.")
 